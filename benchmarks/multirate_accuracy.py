@@ -0,0 +1,134 @@
+"""
+Speed vs. accuracy of the multirate engine against uniform-dt Euler.
+
+Accuracy: noise-free single nodes of the six standard activity types,
+relative RMS error of the output signal against a tight-tolerance dopri5
+reference (networks are chaotic, trajectories diverge whatever the scheme).
+Speed: best-of-repeat runtime of a network scenario from ``scenarios.py``.
+
+Rows are the multirate engine with ``multirate_substeps`` M at dt = 0.1 ms
+and Euler with dt = 0.1 ms * M (same number of coupling evaluations).
+
+Usage:
+    python benchmarks/multirate_accuracy.py
+    python benchmarks/multirate_accuracy.py --quick
+    python benchmarks/multirate_accuracy.py --scenario net400_delay --substeps 2 5 10
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+
+# Make the package importable without installation
+for path in (str(REPO_DIR), str(BENCH_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+DT = 0.1  # ms, micro step of the multirate engine and reference Euler step
+
+
+def _configurations(substeps):
+    """(label, parameter overrides) of the compared integrators."""
+    configs = [("euler dt=0.1", {})]
+    for M in substeps:
+        configs.append((f"multirate M={M}", {"integration_method": "multirate", "multirate_substeps": M}))
+        configs.append((f"euler dt={DT * M:g}", {"dt": DT * M}))
+    return configs
+
+
+def single_node_errors(configs, duration):
+    """
+    Relative RMS error of every configuration for each standard activity type.
+
+    :param configs: Labels and parameter overrides, see :func:`_configurations`
+    :type configs: list
+    :param duration: Simulated time in ms
+    :type duration: float
+    :return: Mapping from activity type to the errors of the configurations
+    :rtype: dict
+    """
+    from neurolib_wendling.models.wendling import WendlingModel
+    from neurolib_wendling.models.wendling.STANDARD_PARAMETERS import WENDLING_STANDARD_PARAMS
+
+    def signal(type_name, overrides):
+        model = WendlingModel(seed=0)
+        model.params.update(WENDLING_STANDARD_PARAMS[type_name]["params"])
+        model.params.update(dict(p_sigma=0.0, duration=duration, dt=DT), **overrides)
+        model.run()
+        return model.get_output_signal()[0]
+
+    errors = {}
+    for type_name in WENDLING_STANDARD_PARAMS:
+        ref = signal(type_name, {"integration_method": "dopri5", "dopri_rtol": 1e-10, "dopri_atol": 1e-10})
+        row = []
+        for _, overrides in configs:
+            v = signal(type_name, overrides)
+            every = int(round(overrides.get("dt", DT) / DT))
+            row.append(np.sqrt(np.mean((v - ref[every - 1::every]) ** 2)) / np.std(ref))
+        errors[type_name] = row
+    return errors
+
+
+def network_runtimes(configs, scenario_name, quick=False, repeat=3):
+    """
+    Best runtime of ``model.run()`` of every configuration in a network scenario.
+
+    :param configs: Labels and parameter overrides, see :func:`_configurations`
+    :type configs: list
+    :param scenario_name: Scenario from :func:`scenarios.get_scenarios`
+    :type scenario_name: str
+    :param quick: Use the shortened scenario duration, defaults to False
+    :type quick: bool, optional
+    :param repeat: Timed runs per configuration, defaults to 3
+    :type repeat: int, optional
+    :return: Runtimes in seconds
+    :rtype: list
+    """
+    from scenarios import build_model, get_scenarios
+
+    scenario = get_scenarios(quick=quick)[scenario_name]
+    runtimes = []
+    for _, overrides in configs:
+        model = build_model(scenario)
+        model.params.update(overrides)
+        model.run()  # compile / load the kernel
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.run()
+            best = min(best, time.perf_counter() - start)
+        runtimes.append(best)
+    return runtimes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multirate engine: speed vs. accuracy against Euler")
+    parser.add_argument("--substeps", type=int, nargs="+", default=[2, 5, 10], help="multirate_substeps to compare")
+    parser.add_argument("--scenario", default="net80_delay", help="network scenario of the timing")
+    parser.add_argument("--quick", action="store_true", help="shortened durations")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration (best is reported)")
+    args = parser.parse_args(argv)
+
+    configs = _configurations(args.substeps)
+    errors = single_node_errors(configs, duration=500.0 if args.quick else 2000.0)
+    runtimes = network_runtimes(configs, args.scenario, quick=args.quick, repeat=args.repeat)
+
+    types = list(errors)
+    print(f"{'integrator':<16} {args.scenario + ' s':>16} {'speed-up':>9} " + " ".join(f"{t:>8}" for t in types))
+    for i, (label, _) in enumerate(configs):
+        print(
+            f"{label:<16} {runtimes[i]:>16.3f} {runtimes[0] / runtimes[i]:>9.2f} "
+            + " ".join(f"{errors[t][i]:>8.4f}" for t in types)
+        )
+    print("\nErrors: relative RMS error of the noise-free single-node output against dopri5 (rtol = atol = 1e-10).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
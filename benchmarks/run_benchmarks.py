@@ -0,0 +1,314 @@
+"""
+Benchmark runner for the Wendling integration kernel.
+
+Every scenario runs in a fresh Python process with an empty numba cache, so
+JIT compile time and peak memory are measured independently of other
+scenarios. Results are written to ``benchmarks/results/<commit>.json`` and
+can be compared across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py                    # run all scenarios
+    python benchmarks/run_benchmarks.py --quick            # short durations
+    python benchmarks/run_benchmarks.py -k net80           # only matching scenarios
+    python benchmarks/run_benchmarks.py --list             # list scenarios
+    python benchmarks/run_benchmarks.py --compare A B      # compare two result files / commits
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Make the package importable without installation
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+
+# ==================== Worker (one scenario per process) ====================
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS reports bytes
+    return rss / 1024.0 ** 2 if sys.platform == "darwin" else rss / 1024.0
+
+
+def run_scenario(name, quick=False, repeat=3):
+    """
+    Run a single scenario and return its measurements.
+
+    Should be called in a fresh process (see :func:`run_in_subprocess`),
+    otherwise the JIT compile time is not measured.
+
+    :param name: Scenario name
+    :type name: str
+    :param quick: Use shortened durations, defaults to False
+    :type quick: bool, optional
+    :param repeat: Number of timed runs (best is reported), defaults to 3
+    :type repeat: int, optional
+    :return: Measurements of the scenario
+    :rtype: dict
+    """
+    import tracemalloc
+
+    import numpy as np
+
+    from scenarios import build_model, get_scenarios
+
+    scenario = get_scenarios(quick=quick)[name]
+
+    t0 = time.perf_counter()
+    model = build_model(scenario)
+    setup_s = time.perf_counter() - t0
+
+    dt = model.params["dt"]
+    duration = model.params["duration"]
+    N = model.params["N"]
+    n_steps = int(round(duration / dt))
+
+    # JIT compile time: first (compiling) tiny run minus a second (compiled) tiny run
+    model.params["duration"] = 10 * dt
+    t0 = time.perf_counter()
+    model.run()
+    first_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    model.run()
+    jit_s = max(first_s - (time.perf_counter() - t0), 0.0)
+    model.params["duration"] = duration
+
+    # Timed runs (best of `repeat`)
+    run_times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        model.run()
+        run_times.append(time.perf_counter() - t0)
+    run_s = min(run_times)
+
+    # Peak memory of a separate, traced run (tracing slows the run down)
+    tracemalloc.start()
+    model.run()
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "N": N,
+        "duration_ms": duration,
+        "dt_ms": dt,
+        "n_steps": n_steps,
+        "edges": int(np.count_nonzero(model.params["Cmat"])),
+        "max_delay_steps": int(model.getMaxDelay()),
+        "setup_s": setup_s,
+        "jit_s": jit_s,
+        "run_s": run_s,
+        "run_s_all": run_times,
+        "steps_per_s": n_steps / run_s,
+        "node_steps_per_s": N * n_steps / run_s,
+        "peak_alloc_mb": peak_traced / 1024.0 ** 2,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_in_subprocess(name, quick=False, repeat=3, keep_cache=False):
+    """
+    Run one scenario in a fresh interpreter with an empty numba cache.
+
+    :param name: Scenario name
+    :type name: str
+    :param quick: Use shortened durations, defaults to False
+    :type quick: bool, optional
+    :param repeat: Number of timed runs, defaults to 3
+    :type repeat: int, optional
+    :param keep_cache: Reuse the on-disk numba cache (measures cache loading instead of compilation), defaults to False
+    :type keep_cache: bool, optional
+    :return: Measurements of the scenario
+    :rtype: dict
+    """
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", name, "--repeat", str(repeat)]
+    if quick:
+        cmd.append("--quick")
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(BENCH_DIR), str(REPO_DIR), env.get("PYTHONPATH", "")])
+    with tempfile.TemporaryDirectory(prefix="wendling_bench_") as cache_dir:
+        if not keep_cache:
+            env["NUMBA_CACHE_DIR"] = cache_dir
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scenario {name} failed:\n{proc.stderr}")
+    # The worker prints its JSON result as the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ==================== Result storage and comparison ====================
+
+def _git(*args):
+    try:
+        out = subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True)
+    except OSError:
+        return ""
+    return out.stdout.strip() if out.returncode == 0 else ""
+
+
+def collect_metadata():
+    """Commit, library versions and machine information for a result file."""
+    import numba
+    import numpy as np
+
+    try:
+        import neurolib
+        neurolib_version = getattr(neurolib, "__version__", "unknown")
+    except ImportError:
+        neurolib_version = "not installed"
+    if neurolib_version == "unknown":
+        try:
+            from importlib.metadata import version
+            neurolib_version = version("neurolib")
+        except Exception:
+            pass
+
+    return {
+        "commit": _git("rev-parse", "HEAD") or "unknown",
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "neurolib": neurolib_version,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def result_path(metadata):
+    """Default result file for the current commit."""
+    name = metadata["commit"][:10]
+    if metadata["dirty"]:
+        name += "-dirty"
+    return RESULTS_DIR / f"{name}.json"
+
+
+def load_results(ref):
+    """
+    Load a result file by path or by (prefix of a) commit hash.
+
+    :param ref: Path to a result file or commit hash prefix
+    :type ref: str
+    :return: Result dictionary
+    :rtype: dict
+    """
+    path = Path(ref)
+    if not path.exists():
+        matches = sorted(RESULTS_DIR.glob(f"{ref}*.json"))
+        if not matches:
+            raise FileNotFoundError(f"No benchmark result found for '{ref}' in {RESULTS_DIR}")
+        path = matches[-1]
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Print a throughput comparison between two result sets.
+
+    :param old: Baseline results
+    :type old: dict
+    :param new: New results
+    :type new: dict
+    :param threshold: Relative slowdown that is flagged as regression, defaults to 0.1
+    :type threshold: float, optional
+    :return: Names of regressed scenarios
+    :rtype: list
+    """
+    print(f"old: {old['metadata']['commit'][:10]} (numba {old['metadata']['numba']}, neurolib {old['metadata']['neurolib']})")
+    print(f"new: {new['metadata']['commit'][:10]} (numba {new['metadata']['numba']}, neurolib {new['metadata']['neurolib']})")
+    header = f"{'scenario':<22} {'steps/s old':>12} {'steps/s new':>12} {'ratio':>7} {'jit old':>8} {'jit new':>8} {'MB old':>8} {'MB new':>8}"
+    print(header)
+    print("-" * len(header))
+
+    regressions = []
+    for name, res_new in new["scenarios"].items():
+        res_old = old["scenarios"].get(name)
+        if res_old is None:
+            continue
+        ratio = res_new["steps_per_s"] / res_old["steps_per_s"]
+        flag = ""
+        if ratio < 1.0 - threshold:
+            flag = "  <-- slower"
+            regressions.append(name)
+        print(
+            f"{name:<22} {res_old['steps_per_s']:>12.0f} {res_new['steps_per_s']:>12.0f} {ratio:>7.2f} "
+            f"{res_old['jit_s']:>8.2f} {res_new['jit_s']:>8.2f} "
+            f"{res_old['peak_alloc_mb']:>8.1f} {res_new['peak_alloc_mb']:>8.1f}{flag}"
+        )
+    return regressions
+
+
+# ==================== Command line ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wendling kernel benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="only run scenarios containing this string")
+    parser.add_argument("--quick", action="store_true", help="shortened durations")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario (best is reported)")
+    parser.add_argument("--keep-cache", action="store_true", help="use the on-disk numba cache")
+    parser.add_argument("--output", default=None, help="result file (default: results/<commit>.json)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files or commits")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold for --compare")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker, quick=args.quick, repeat=args.repeat)))
+        return 0
+
+    if args.compare:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]), args.threshold)
+        return 1 if regressions else 0
+
+    sys.path.insert(0, str(BENCH_DIR))
+    from scenarios import get_scenarios
+
+    names = [n for n in get_scenarios(quick=args.quick) if args.filter in n]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    metadata = collect_metadata()
+    metadata["quick"] = args.quick
+    results = {"metadata": metadata, "scenarios": {}}
+
+    print(f"{'scenario':<22} {'N':>4} {'steps':>8} {'steps/s':>10} {'node-steps/s':>13} {'jit s':>7} {'alloc MB':>9}")
+    for name in names:
+        res = run_in_subprocess(name, quick=args.quick, repeat=args.repeat, keep_cache=args.keep_cache)
+        results["scenarios"][name] = res
+        print(
+            f"{name:<22} {res['N']:>4} {res['n_steps']:>8} {res['steps_per_s']:>10.0f} "
+            f"{res['node_steps_per_s']:>13.3g} {res['jit_s']:>7.2f} {res['peak_alloc_mb']:>9.1f}"
+        )
+
+    out = Path(args.output) if args.output else result_path(metadata)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
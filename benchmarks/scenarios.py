@@ -0,0 +1,163 @@
+"""
+Standard benchmark scenarios for the Wendling integration kernel.
+
+Each scenario describes one simulation (network size, duration, delays,
+connection density, local parameters). The scenarios are deliberately
+synthetic and seeded so that results are comparable across commits and
+machines without shipping connectome data.
+
+Scenario axes:
+- node count: 1, 80, 400
+- delays: with / without conduction delays (``lengthMat`` / ``signalV``)
+- density: sparse vs. dense ``Cmat``
+- delay distribution: uniform random wiring vs. realistic distance-dependent
+  wiring (exponential distance rule) with slow and fast conduction
+- duration: short runs and one long-duration single-node run
+"""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling.STANDARD_PARAMETERS import WENDLING_STANDARD_PARAMS
+
+
+def make_connectome(N, density=0.3, delays=True, seed=0, extent_mm=150.0, edr_lambda_mm=None):
+    """
+    Build a reproducible synthetic connectome.
+
+    Nodes are placed uniformly in a cube of side ``extent_mm``; fiber lengths
+    are the Euclidean distances between nodes, which with the default
+    ``signalV = 20 m/s`` gives delays of roughly 0-13 ms.
+
+    With ``edr_lambda_mm`` the wiring follows the exponential distance rule of
+    cortical connectomes: the connection probability decays as
+    ``exp(-distance / edr_lambda_mm)``, weights are log-normal and fiber
+    lengths include a tortuosity factor of 1.3. This gives the skewed delay
+    distribution (many short, few long tracts) of empirical connectomes.
+
+    :param N: Number of nodes
+    :type N: int
+    :param density: Fraction of non-zero off-diagonal connections, defaults to 0.3
+    :type density: float, optional
+    :param delays: Return a non-zero length matrix, defaults to True
+    :type delays: bool, optional
+    :param seed: Seed of the connectome generator, defaults to 0
+    :type seed: int, optional
+    :param extent_mm: Side length of the cube nodes are placed in (mm), defaults to 150.0
+    :type extent_mm: float, optional
+    :param edr_lambda_mm: Length constant of the exponential distance rule (mm), defaults to None (uniform wiring)
+    :type edr_lambda_mm: float, optional
+    :return: Cmat (N, N), lengthMat (N, N)
+    :rtype: tuple of numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+
+    if edr_lambda_mm is not None:
+        pos = rng.uniform(0.0, extent_mm, (N, 3))
+        dist = np.sqrt(((pos[:, None, :] - pos[None, :, :]) ** 2).sum(axis=-1))
+        prob = np.exp(-dist / edr_lambda_mm)
+        np.fill_diagonal(prob, 0)
+        prob = np.minimum(prob * density * N * (N - 1) / prob.sum(), 1.0)
+        Cmat = rng.lognormal(0.0, 1.0, (N, N)) * (rng.random((N, N)) < prob)
+        lengthMat = 1.3 * dist if delays else np.zeros((N, N))
+        return Cmat, lengthMat
+    Cmat = rng.random((N, N)) * (rng.random((N, N)) < density)
+    np.fill_diagonal(Cmat, 0)
+
+    if delays:
+        pos = rng.uniform(0.0, extent_mm, (N, 3))
+        lengthMat = np.sqrt(((pos[:, None, :] - pos[None, :, :]) ** 2).sum(axis=-1))
+    else:
+        lengthMat = np.zeros((N, N))
+    return Cmat, lengthMat
+
+
+def _single_node(type_name, duration):
+    return {
+        "N": 1,
+        "duration": duration,
+        "density": 0.0,
+        "delays": False,
+        "params": dict(WENDLING_STANDARD_PARAMS[type_name]["params"]),
+    }
+
+
+def _network(N, duration, delays, density=0.3, edr_lambda_mm=None, signalV=20.0):
+    return {
+        "N": N,
+        "duration": duration,
+        "density": density,
+        "delays": delays,
+        "edr_lambda_mm": edr_lambda_mm,
+        "params": {"K_gl": 0.15, "signalV": signalV},
+    }
+
+
+def get_scenarios(quick=False):
+    """
+    Return the standard benchmark scenarios.
+
+    :param quick: Use shortened durations (smoke test of the suite), defaults to False
+    :type quick: bool, optional
+    :return: Mapping from scenario name to scenario description
+    :rtype: dict
+    """
+    # durations in ms: (full, quick)
+    single_dur = 2000.0 if quick else 10000.0
+    net80_dur = 500.0 if quick else 2000.0
+    net400_dur = 100.0 if quick else 500.0
+    net1000_dur = 20.0 if quick else 100.0
+    long_dur = 20000.0 if quick else 120000.0
+
+    scenarios = {}
+
+    # Single node, each of the six standard activity types
+    for type_name in WENDLING_STANDARD_PARAMS:
+        scenarios[f"single_{type_name.lower()}"] = _single_node(type_name, single_dur)
+
+    # Whole-brain sized networks, with and without delays
+    scenarios["net80"] = _network(80, net80_dur, delays=False)
+    scenarios["net80_delay"] = _network(80, net80_dur, delays=True)
+    scenarios["net400"] = _network(400, net400_dur, delays=False)
+    scenarios["net400_delay"] = _network(400, net400_dur, delays=True)
+
+    # Connection density
+    scenarios["net80_delay_sparse"] = _network(80, net80_dur, delays=True, density=0.05)
+    scenarios["net80_delay_dense"] = _network(80, net80_dur, delays=True, density=1.0)
+
+    # Realistic delay distributions (exponential distance rule), fast and slow conduction
+    scenarios["net200_edr"] = _network(200, net80_dur / 2, delays=True, density=0.1, edr_lambda_mm=40.0)
+    scenarios["net400_edr_slow"] = _network(400, net400_dur, delays=True, density=0.1, edr_lambda_mm=40.0, signalV=5.0)
+    scenarios["net1000_edr"] = _network(1000, net1000_dur, delays=True, density=0.05, edr_lambda_mm=40.0)
+
+    # Long-duration run
+    scenarios["long_single_type4"] = _single_node("Type4", long_dur)
+
+    return scenarios
+
+
+def build_model(scenario, seed=42):
+    """
+    Instantiate a WendlingModel for a scenario.
+
+    :param scenario: Scenario description from :func:`get_scenarios`
+    :type scenario: dict
+    :param seed: Model seed, defaults to 42
+    :type seed: int, optional
+    :return: Configured model (not yet run)
+    :rtype: WendlingModel
+    """
+    from neurolib_wendling.models.wendling import WendlingModel
+
+    N = scenario["N"]
+    if N == 1:
+        model = WendlingModel(seed=seed)
+    else:
+        Cmat, lengthMat = make_connectome(
+            N, density=scenario["density"], delays=scenario["delays"], edr_lambda_mm=scenario.get("edr_lambda_mm")
+        )
+        model = WendlingModel(Cmat=Cmat, Dmat=lengthMat, seed=seed, heterogeneity=0.1)
+
+    for key, value in scenario["params"].items():
+        model.params[key] = value
+    model.params["duration"] = scenario["duration"]
+    return model
@@ -1 +1,10 @@
-from .model import WendlingModel   
\ No newline at end of file
+from .model import WendlingModel
+from .profiling import IntegrationProfiler
+from .ensemble import MeanPSD, ThresholdCrossings
+from .events import EVENT_DTYPE, EVENT_SPIKE, EVENT_SEIZURE
+from .service import SimulationServer, SimulationClient
+from .result import WendlingResult
+from .atlas import ResponseAtlas
+from .burnin import BurnInCache
+from .checkpoint import Checkpoint
+from .analysis import SignalFeatures, FitLoss
@@ -0,0 +1,315 @@
+"""
+Batched, blockwise signal features for fitting simulations to empirical data.
+
+``SignalFeatures`` computes, for all nodes and any number of runs at once:
+
+- ``psd``: Welch power spectral density per node (Hann window, 50% overlap,
+  same scaling as ``scipy.signal.welch``)
+- ``fc``: functional connectivity, Pearson correlation of the signals (N, N)
+- ``band_fc``: correlation of the band-limited signals, per frequency band
+- ``envelope_fc``: correlation of the amplitude envelopes, per band
+- ``coherence``: magnitude-squared coherence averaged over the band, per band
+
+Signals are fed block by block (``update``) with shape (..., N, T): leading
+axes are runs (trials, parameter points), so e.g. the v_pyr of an ensemble or
+of a fork is analysed in one call. Only running sums, Welch segments that
+straddle blocks and filter states are kept, so streamed or chunked output never
+has to be stored:
+
+    features = SignalFeatures(dt=1.0, bands={"alpha": (8, 13)}, transient=1000)
+    for chunk in range(10):
+        model.run(continue_run=True)
+        features.update(model.result.v_pyr)
+    result = features.result()        # {"freqs", "psd", "fc", "band_fc", ...}
+
+Band signals come from complex demodulation: the signal is shifted by the band
+centre and low-pass filtered (causal Butterworth, state carried across blocks),
+which gives the band-limited signal and its envelope in one pass.
+
+``FitLoss`` compares the features with empirical targets and can be used as
+the evaluation of neurolib's evolutionary optimisation (see ``FitLoss.fitness``).
+"""
+
+import numpy as np
+from scipy import signal
+
+# Default frequency bands (Hz)
+BANDS = {"delta": (1.0, 4.0), "theta": (4.0, 8.0), "alpha": (8.0, 13.0), "beta": (13.0, 30.0)}
+
+
+class _Correlation:
+    """Running sums for the Pearson correlation of the last-but-one axis."""
+
+    __slots__ = ("n", "sum", "prod")
+
+    def __init__(self):
+        self.n = 0
+        self.sum = None
+        self.prod = None
+
+    def update(self, x):
+        if x.shape[-1] == 0:
+            return
+        s = x.sum(axis=-1)
+        p = np.matmul(x, np.swapaxes(x, -1, -2))
+        if self.sum is None:
+            self.sum, self.prod = s, p
+        else:
+            self.sum += s
+            self.prod += p
+        self.n += x.shape[-1]
+
+    def result(self):
+        if self.n < 2:
+            return None
+        mean = self.sum / self.n
+        cov = self.prod / self.n - mean[..., :, None] * mean[..., None, :]
+        std = np.sqrt(np.maximum(np.diagonal(cov, axis1=-2, axis2=-1), 0.0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cov / (std[..., :, None] * std[..., None, :])
+
+
+class SignalFeatures:
+    """Blockwise PSD, FC, band-limited FC, envelope correlation and coherence of many nodes and runs."""
+
+    def __init__(self, dt, bands=None, nperseg=1024, transient=0.0, filter_order=4):
+        """
+        :param dt: Sampling interval of the signals (ms)
+        :type dt: float
+        :param bands: Frequency bands ``{name: (low, high)}`` in Hz, defaults to None (BANDS)
+        :type bands: dict, optional
+        :param nperseg: Welch segment length in samples, defaults to 1024
+        :type nperseg: int, optional
+        :param transient: Initial time excluded from all features (ms), defaults to 0.0
+        :type transient: float, optional
+        :param filter_order: Order of the Butterworth low-pass of the band demodulation, defaults to 4
+        :type filter_order: int, optional
+        """
+        self.dt = dt
+        self.fs = 1000.0 / dt
+        self.bands = dict(BANDS if bands is None else bands)
+        self.nperseg = int(nperseg)
+        self.step = self.nperseg - self.nperseg // 2
+        self.skip = int(round(transient / dt))
+        self.freqs = np.fft.rfftfreq(self.nperseg, d=1.0 / self.fs)
+        self.window = signal.get_window("hann", self.nperseg)
+        # one-sided density scaling as scipy.signal.welch
+        self._scale = np.full(len(self.freqs), 2.0 / (self.fs * np.sum(self.window ** 2)))
+        self._scale[0] /= 2.0
+        if self.nperseg % 2 == 0:
+            self._scale[-1] /= 2.0
+
+        self._centre = {}
+        self._sos = {}
+        self._bins = {}
+        for name, (low, high) in self.bands.items():
+            if not 0 <= low < high < self.fs / 2:
+                raise ValueError(f"Band '{name}' ({low}, {high}) Hz must lie below the Nyquist frequency {self.fs / 2} Hz.")
+            self._centre[name] = (low + high) / 2.0
+            self._sos[name] = signal.butter(filter_order, (high - low) / 2.0, btype="low", fs=self.fs, output="sos")
+            self._bins[name] = np.nonzero((self.freqs >= low) & (self.freqs <= high))[0]
+        self.reset()
+
+    def reset(self):
+        """Forget all data."""
+        self.n_samples = 0
+        self._carry = None
+        self._n_segments = 0
+        self._psd = None
+        self._cross = {}
+        self._zi = {}
+        self._fc = _Correlation()
+        self._band_fc = {name: _Correlation() for name in self.bands}
+        self._envelope_fc = {name: _Correlation() for name in self.bands}
+
+    def update(self, block):
+        """
+        Add the next block of the signals.
+
+        :param block: Signals (..., N, T), consecutive with the previous block
+        :type block: numpy.ndarray
+        """
+        block = np.asarray(block, dtype=np.float64)
+        T = block.shape[-1]
+        start = self.n_samples
+        first = min(T, max(0, self.skip - start))  # first sample after the transient
+        self.n_samples += T
+
+        # band signals and envelopes: demodulate, low-pass, remodulate
+        phase = np.exp(-2j * np.pi * np.arange(start, start + T) / self.fs * np.array(list(self._centre.values()))[:, None])
+        for b, name in enumerate(self.bands):
+            shifted = block * phase[b]
+            if name not in self._zi:
+                self._zi[name] = np.zeros((self._sos[name].shape[0],) + block.shape[:-1] + (2,), dtype=np.complex128)
+            baseband, self._zi[name] = signal.sosfilt(self._sos[name], shifted, axis=-1, zi=self._zi[name])
+            baseband = baseband[..., first:]
+            self._band_fc[name].update(np.real(baseband * np.conj(phase[b, first:])))
+            self._envelope_fc[name].update(np.abs(baseband))
+
+        block = block[..., first:]
+        self._fc.update(block)
+        self._welch(block)
+
+    def _welch(self, block):
+        """Accumulate the spectra of all complete Welch segments."""
+        data = block if self._carry is None else np.concatenate((self._carry, block), axis=-1)
+        n_segments = (data.shape[-1] - self.nperseg) // self.step + 1 if data.shape[-1] >= self.nperseg else 0
+        if n_segments > 0:
+            segments = np.lib.stride_tricks.sliding_window_view(data, self.nperseg, axis=-1)[..., ::self.step, :]
+            segments = segments[..., :n_segments, :]
+            spectra = np.fft.rfft((segments - segments.mean(axis=-1, keepdims=True)) * self.window, axis=-1)
+            power = np.sum(np.abs(spectra) ** 2, axis=-2)  # (..., N, F)
+            self._psd = power if self._psd is None else self._psd + power
+            for name, bins in self._bins.items():
+                X = spectra[..., bins]  # (..., N, segments, bins)
+                cross = np.einsum("...isf,...jsf->...ijf", X, np.conj(X))
+                self._cross[name] = cross if name not in self._cross else self._cross[name] + cross
+            self._n_segments += n_segments
+        self._carry = data[..., n_segments * self.step:].copy()
+
+    def result(self):
+        """
+        Features of all data added so far (None where there was not enough data).
+
+        :return: ``freqs`` (F,), ``psd`` (..., N, F), ``fc`` (..., N, N) and per band
+            ``band_fc``, ``envelope_fc``, ``coherence`` ({band: (..., N, N)})
+        :rtype: dict
+        """
+        psd = None if self._psd is None else self._psd * self._scale / self._n_segments
+        coherence = {}
+        for name, cross in self._cross.items():
+            auto = np.real(np.diagonal(cross, axis1=-3, axis2=-2))  # (..., bins, N)
+            auto = np.moveaxis(auto, -1, -2)  # (..., N, bins)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                coh = np.abs(cross) ** 2 / (auto[..., :, None, :] * auto[..., None, :, :])
+            coherence[name] = coh.mean(axis=-1) if coh.shape[-1] else None
+        return {
+            "freqs": self.freqs,
+            "psd": psd,
+            "fc": self._fc.result(),
+            "band_fc": {name: c.result() for name, c in self._band_fc.items()},
+            "envelope_fc": {name: c.result() for name, c in self._envelope_fc.items()},
+            "coherence": {name: coherence.get(name) for name in self.bands},
+        }
+
+    def compute(self, signals):
+        """
+        Features of complete signals (resets the accumulated data).
+
+        :param signals: Signals (..., N, T)
+        :type signals: numpy.ndarray
+        :rtype: dict
+        """
+        self.reset()
+        self.update(signals)
+        return self.result()
+
+
+def matrix_distance(sim, emp):
+    """1 - Pearson correlation of the upper triangles of (..., N, N) matrices (0: identical pattern)."""
+    iu = np.triu_indices(sim.shape[-1], k=1)
+    a = sim[..., iu[0], iu[1]]
+    b = np.broadcast_to(emp[iu], a.shape)
+    a = a - a.mean(axis=-1, keepdims=True)
+    b = b - b.mean(axis=-1, keepdims=True)
+    return 1.0 - np.sum(a * b, axis=-1) / np.sqrt(np.sum(a * a, axis=-1) * np.sum(b * b, axis=-1))
+
+
+def psd_distance(freqs, sim, emp, freq_range=(1.0, 40.0)):
+    """
+    Mean squared difference of log10 spectra normalised to unit power in `freq_range`.
+
+    :param freqs: Frequencies of `sim` (F,)
+    :param sim: Simulated spectra (..., N, F)
+    :param emp: Empirical spectra on the same frequencies, (N, F) or (F,) (compared with the node mean),
+        or a tuple (frequencies, spectra) interpolated onto `freqs`
+    :rtype: numpy.ndarray
+    """
+    if isinstance(emp, tuple):
+        emp_freqs, emp_psd = emp
+        emp = np.apply_along_axis(lambda p: np.interp(freqs, emp_freqs, p), -1, np.asarray(emp_psd, dtype=np.float64))
+    emp = np.asarray(emp, dtype=np.float64)
+    if emp.ndim == 1:
+        sim = sim.mean(axis=-2)
+    fit = (freqs >= freq_range[0]) & (freqs <= freq_range[1])
+    sim = sim[..., fit] / sim[..., fit].sum(axis=-1, keepdims=True)
+    emp = emp[..., fit] / emp[..., fit].sum(axis=-1, keepdims=True)
+    diff = np.log10(sim) - np.log10(emp)
+    return np.mean(diff ** 2, axis=tuple(range(-emp.ndim, 0)))
+
+
+class FitLoss:
+    """
+    Distance of simulated features (``SignalFeatures.result``) to empirical targets.
+
+    Targets (any subset): ``fc`` (N, N), ``psd`` (see ``psd_distance``) and
+    ``band_fc`` / ``envelope_fc`` / ``coherence`` as ``{band: (N, N)}``. Matrices
+    are compared by ``matrix_distance``, spectra by ``psd_distance``; the loss is
+    the weighted sum of all terms (0 = perfect fit). Features with leading run
+    axes give one loss per run.
+    """
+
+    def __init__(self, targets, weights=None, freq_range=(1.0, 40.0)):
+        """
+        :param targets: Empirical features, keys as in ``SignalFeatures.result``
+        :type targets: dict
+        :param weights: Weight per target key or per term (e.g. "envelope_fc.alpha"), defaults to None (1.0)
+        :type weights: dict, optional
+        :param freq_range: Frequency range of the spectral distance (Hz), defaults to (1.0, 40.0)
+        :type freq_range: tuple, optional
+        """
+        self.targets = targets
+        self.weights = weights or {}
+        self.freq_range = freq_range
+
+    def terms(self, features):
+        """
+        Distance per target.
+
+        :param features: Simulated features (``SignalFeatures.result``)
+        :type features: dict
+        :return: ``{term: distance}``, band terms named "<key>.<band>"
+        :rtype: dict
+        """
+        terms = {}
+        for key, target in self.targets.items():
+            if key == "psd":
+                terms[key] = psd_distance(features["freqs"], features["psd"], target, self.freq_range)
+            elif key == "fc":
+                terms[key] = matrix_distance(features["fc"], np.asarray(target))
+            elif key in ("band_fc", "envelope_fc", "coherence"):
+                for band, matrix in target.items():
+                    terms[f"{key}.{band}"] = matrix_distance(features[key][band], np.asarray(matrix))
+            else:
+                raise ValueError(f"Unknown target '{key}'.")
+        return terms
+
+    def __call__(self, features):
+        """Weighted sum of the terms (float, or one value per run)."""
+        total = 0.0
+        for term, value in self.terms(features).items():
+            total = total + self.weights.get(term, self.weights.get(term.split(".")[0], 1.0)) * value
+        return total
+
+    def fitness(self, model, features, transient=None):
+        """
+        Evaluation for neurolib's ``Evolution``: loss of the last run of `model`.
+
+        :param model: Model after ``run()``
+        :type model: WendlingModel
+        :param features: Feature pipeline, its sampling interval must match the model's output
+        :type features: SignalFeatures
+        :param transient: Transient (ms) of this evaluation instead of ``features``' own, defaults to None
+        :type transient: float, optional
+        :return: ``((loss,), terms)``: fitness tuple (minimise, ``weightList=[-1.0]``) and the terms
+        :rtype: tuple
+        """
+        skip = features.skip
+        if transient is not None:
+            features.skip = int(round(transient / features.dt))
+        try:
+            result = features.compute(model.result.v_pyr)
+        finally:
+            features.skip = skip
+        terms = self.terms(result)
+        return (float(self(result)),), {name: float(value) for name, value in terms.items()}
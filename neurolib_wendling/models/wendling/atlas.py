@@ -0,0 +1,294 @@
+"""
+Response-surface atlas of a single Wendling node.
+
+Many tools only need to know what one node does at given local parameters
+(dominant frequency, power, regime). ``ResponseAtlas.build`` simulates a dense
+grid of parameter points once, all points as independent nodes of one batched
+kernel call (``_integrate_wendling_ensemble`` without connections), and stores
+the features of every point. Queries interpolate between grid points and take
+microseconds:
+
+    atlas = ResponseAtlas.build({
+        "B": np.linspace(5, 50, 46),
+        "G": np.linspace(0, 30, 31),
+        "p_mean": [60, 90, 120],
+    }, duration=5000)
+    atlas.save("atlas.npz")
+
+    atlas = ResponseAtlas.load("atlas.npz")
+    atlas.query(B=23.5, G=16.2, p_mean=90)   # {"dominant_freq": ..., "regime": "slow", ...}
+
+Features: ``dominant_freq`` (Hz, peak of the Welch spectrum of v_pyr), ``power``
+(variance of v_pyr, mV^2), ``mean`` (mean v_pyr, mV) and ``spike_rate``
+(upward crossings of ``spike_threshold`` per second), averaged over trials. The
+regime label is a coarse heuristic: ``steady`` (std of v_pyr below
+``steady_std``), else ``slow`` (< 8 Hz: background waves, spikes, SWD),
+``alpha`` (8-13 Hz) or ``fast`` (> 13 Hz).
+"""
+
+import json
+
+import numpy as np
+from numba import njit
+from scipy import signal
+
+from .loadDefaultParams import loadDefaultParams
+from .paramtable import LOCAL_PARAMS, pack_local_params
+from .schedules import prepare_schedules
+from .timeIntegration import _integrate_wendling_ensemble, fresh_seed
+
+FEATURES = ["dominant_freq", "power", "mean", "spike_rate"]
+REGIMES = ["steady", "slow", "alpha", "fast"]
+
+# Upper frequency limits (Hz) of the oscillating regimes slow and alpha
+REGIME_BANDS = [8.0, 13.0]
+
+
+def _label_regimes(features, steady_std):
+    """Regime index (see REGIMES) of every point from its features (n_points, n_features)."""
+    freq = features[:, FEATURES.index("dominant_freq")]
+    labels = 1 + np.searchsorted(REGIME_BANDS, freq, side="right")
+    labels[np.sqrt(features[:, FEATURES.index("power")]) < steady_std] = 0
+    return labels.astype(np.int8)
+
+
+class ResponseAtlas:
+    """Features of a single node on a regular grid of local parameters, with interpolated queries."""
+
+    def __init__(self, axes, features, labels, meta=None):
+        """
+        :param axes: Grid values (increasing) of every parameter axis, in grid order
+        :type axes: dict
+        :param features: Features of every grid point (n_points, len(FEATURES)), C order over the axes
+        :type features: numpy.ndarray
+        :param labels: Regime index of every grid point (n_points,)
+        :type labels: numpy.ndarray
+        :param meta: Simulation settings of the atlas, defaults to None
+        :type meta: dict, optional
+        """
+        self.axes = {name: np.asarray(values, dtype=np.float64) for name, values in axes.items()}
+        self.shape = tuple(len(values) for values in self.axes.values())
+        self.features = np.ascontiguousarray(features, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.meta = meta or {}
+        if self.features.shape != (int(np.prod(self.shape)), len(FEATURES)) or len(self.labels) != len(self.features):
+            raise ValueError(f"Features must have shape ({int(np.prod(self.shape))}, {len(FEATURES)}).")
+        # flat axis arrays for the interpolation kernel
+        self._axis_values = np.concatenate(list(self.axes.values()))
+        self._axis_ptr = np.cumsum([0] + list(self.shape)).astype(np.int64)
+
+    @classmethod
+    def build(cls, axes, params=None, duration=5000.0, transient=1000.0, dt=0.1, sampling_dt=1.0, n_trials=1,
+              seed=None, batch_size=4096, spike_threshold=10.0, steady_std=0.05, nperseg=2048):
+        """
+        Simulate every grid point and compute its features.
+
+        :param axes: Grid values of the parameters to vary, e.g. ``{"B": [...], "G": [...]}``
+            (any local parameter, see paramtable.LOCAL_PARAMS)
+        :type axes: dict
+        :param params: Values of the other local parameters, defaults to None (model defaults)
+        :type params: dict, optional
+        :param duration: Simulated time per point (ms), defaults to 5000.0
+        :type duration: float, optional
+        :param transient: Initial time discarded before computing features (ms), defaults to 1000.0
+        :type transient: float, optional
+        :param dt: Integration time step (ms), defaults to 0.1
+        :type dt: float, optional
+        :param sampling_dt: Sampling interval of v_pyr for the features (ms), defaults to 1.0
+        :type sampling_dt: float, optional
+        :param n_trials: Noise realisations per point (features are averaged), defaults to 1
+        :type n_trials: int, optional
+        :param seed: Random seed, defaults to None
+        :type seed: int, optional
+        :param batch_size: Grid points per kernel call (limits memory), defaults to 4096
+        :type batch_size: int, optional
+        :param spike_threshold: v_pyr threshold of spikes (mV), defaults to 10.0
+        :type spike_threshold: float, optional
+        :param steady_std: Points with a smaller std of v_pyr (mV) are labelled steady, defaults to 0.05
+        :type steady_std: float, optional
+        :param nperseg: Welch segment length in samples, defaults to 2048
+        :type nperseg: int, optional
+        :rtype: ResponseAtlas
+        """
+        unknown = set(axes) - set(LOCAL_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)}, choose from {LOCAL_PARAMS}.")
+        axes = {name: np.sort(np.asarray(values, dtype=np.float64).ravel()) for name, values in axes.items()}
+        grid = np.meshgrid(*axes.values(), indexing="ij")
+        n_points = grid[0].size
+
+        base = loadDefaultParams(seed=seed, random_init=False)
+        base.update(params or {})
+        base["dt"] = dt
+        sample_every = max(1, int(round(sampling_dt / dt)))
+        n_steps = int(np.ceil(round(duration, 6) / dt))
+        skip = int(round(transient / (sample_every * dt)))
+        fs = 1000.0 / (sample_every * dt)
+        empty_edges = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+
+        features = np.empty((n_points, len(FEATURES)))
+        kernel_seed = fresh_seed() if seed is None else int(seed)
+        for first in range(0, n_points, batch_size):
+            n = min(batch_size, n_points - first)
+            batch_params = dict(base)
+            for name, values in zip(axes, grid):
+                batch_params[name] = values.ravel()[first:first + n]
+            table = pack_local_params(batch_params, n)
+            ys = np.zeros((10, n, 1))
+            v_pyr = _integrate_wendling_ensemble(
+                ys, n_trials, n_steps, sample_every, kernel_seed, dt / 1000.0, n, table,
+                *empty_edges, 0.0, 0, *prepare_schedules(None, n, n_steps, dt), 0.0
+            )[:, :, skip:]
+            kernel_seed = -1  # later batches continue the random stream
+
+            freqs, psd = signal.welch(v_pyr, fs=fs, nperseg=min(nperseg, v_pyr.shape[-1]), axis=-1)
+            psd = psd.mean(axis=0)
+            band = freqs > 0.5  # ignore the DC component
+            features[first:first + n, 0] = freqs[band][np.argmax(psd[:, band], axis=-1)]
+            features[first:first + n, 1] = v_pyr.var(axis=-1).mean(axis=0)
+            features[first:first + n, 2] = v_pyr.mean(axis=-1).mean(axis=0)
+            above = v_pyr > spike_threshold
+            crossings = np.count_nonzero(above[..., 1:] & ~above[..., :-1], axis=-1).mean(axis=0)
+            features[first:first + n, 3] = crossings / (v_pyr.shape[-1] / fs)
+
+        meta = {
+            "params": {name: float(np.ravel(base[name])[0]) for name in LOCAL_PARAMS if name not in axes},
+            "duration": duration, "transient": transient, "dt": dt, "sampling_dt": sample_every * dt,
+            "n_trials": n_trials, "seed": seed, "spike_threshold": spike_threshold, "steady_std": steady_std,
+        }
+        return cls(axes, features, _label_regimes(features, steady_std), meta=meta)
+
+    def save(self, path):
+        """
+        Store the atlas as a compressed ``.npz`` file (features as float32).
+
+        :param path: File path
+        :type path: str
+        """
+        np.savez_compressed(
+            path,
+            axis_names=np.array(list(self.axes)),
+            features=self.features.astype(np.float32),
+            labels=self.labels,
+            meta=np.array(json.dumps(self.meta)),
+            **{f"axis_{name}": values for name, values in self.axes.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an atlas stored with ``save``.
+
+        :param path: File path
+        :type path: str
+        :rtype: ResponseAtlas
+        """
+        with np.load(path) as data:
+            axes = {str(name): data[f"axis_{name}"] for name in data["axis_names"]}
+            return cls(axes, data["features"], data["labels"], meta=json.loads(str(data["meta"])))
+
+    def _points(self, values):
+        """Query points (n, n_axes) from a mapping of parameter values (scalars or arrays)."""
+        unknown = set(values) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Parameters {sorted(unknown)} are not axes of the atlas {list(self.axes)}.")
+        columns = []
+        for name, grid in self.axes.items():
+            if name in values:
+                columns.append(np.atleast_1d(np.asarray(values[name], dtype=np.float64)))
+            elif len(grid) == 1:
+                columns.append(grid)
+            else:
+                raise ValueError(f"Missing value of parameter '{name}'.")
+        columns = np.broadcast_arrays(*columns)
+        return np.ascontiguousarray(np.stack([c.ravel() for c in columns], axis=1))
+
+    def query_many(self, **values):
+        """
+        Interpolated features at many points (multilinear between grid points,
+        values outside the grid are clamped to its edges) and the regime of the
+        nearest grid point.
+
+        :param values: Parameter values, scalars or arrays (broadcast together)
+        :return: Feature arrays and ``regime`` (names, see REGIMES)
+        :rtype: dict
+        """
+        points = self._points(values)
+        out = np.empty((len(points), len(FEATURES)))
+        labels = np.empty(len(points), dtype=np.int8)
+        _interpolate(self._axis_values, self._axis_ptr, self.features, self.labels, points, out, labels)
+        result = {name: out[:, i] for i, name in enumerate(FEATURES)}
+        result["regime"] = np.array(REGIMES)[labels]
+        return result
+
+    def query(self, **values):
+        """
+        Interpolated features at one point (see ``query_many``).
+
+        :param values: Parameter values
+        :return: Features and ``regime``
+        :rtype: dict
+        """
+        result = self.query_many(**values)
+        return {name: value[0].item() for name, value in result.items()}
+
+
+@njit(cache=True, nogil=True)
+def _interpolate(axis_values, axis_ptr, features, labels, points, out, out_labels):
+    """
+    Multilinear interpolation on a regular (not necessarily uniform) grid.
+
+    Args:
+        axis_values: Grid values of all axes, concatenated
+        axis_ptr: Values of axis d are axis_values[axis_ptr[d]:axis_ptr[d + 1]]
+        features: Features of the grid points (n_grid, n_features), C order over the axes
+        labels: Labels of the grid points (n_grid,)
+        points: Query points (n, n_axes)
+        out: Interpolated features (n, n_features), written
+        out_labels: Label of the nearest grid point (n,), written
+    """
+    n_axes = len(axis_ptr) - 1
+    lower = np.empty(n_axes, dtype=np.int64)
+    weight = np.empty(n_axes)
+    stride = np.empty(n_axes, dtype=np.int64)
+    s = 1
+    for d in range(n_axes - 1, -1, -1):
+        stride[d] = s
+        s *= axis_ptr[d + 1] - axis_ptr[d]
+
+    for p in range(points.shape[0]):
+        nearest = 0
+        for d in range(n_axes):
+            start = axis_ptr[d]
+            size = axis_ptr[d + 1] - start
+            x = points[p, d]
+            if size == 1 or x <= axis_values[start]:
+                lower[d] = 0
+                weight[d] = 0.0
+            elif x >= axis_values[start + size - 1]:
+                lower[d] = size - 2
+                weight[d] = 1.0
+            else:
+                i = np.searchsorted(axis_values[start:start + size], x, side="right") - 1
+                lower[d] = i
+                weight[d] = (x - axis_values[start + i]) / (axis_values[start + i + 1] - axis_values[start + i])
+            nearest += (lower[d] + (1 if weight[d] >= 0.5 else 0)) * stride[d]
+        out_labels[p] = labels[nearest]
+
+        for f in range(features.shape[1]):
+            out[p, f] = 0.0
+        for corner in range(1 << n_axes):
+            w = 1.0
+            index = 0
+            for d in range(n_axes):
+                if (corner >> d) & 1:
+                    w *= weight[d]
+                    index += (lower[d] + 1) * stride[d]
+                else:
+                    w *= 1.0 - weight[d]
+                    index += lower[d] * stride[d]
+            if w == 0.0:
+                continue
+            for f in range(features.shape[1]):
+                out[p, f] += w * features[index, f]
@@ -0,0 +1,245 @@
+"""
+Burn-in state cache: equilibrated states reused instead of re-simulating transients.
+
+Runs start from zero or random initial conditions, so the first one or two
+seconds of every run are an initial transient that is thrown away. A
+``BurnInCache`` stores the state after such a transient, i.e. everything a run
+needs to continue from it:
+
+- the last ``max_delay + 1`` states of all nodes (state vector and delay history)
+- the position of the kernel noise stream (``params['rng_state']``)
+
+keyed by the parameters that determine the transient (local parameters,
+connectome, coupling, dt, initial conditions, seed and transient length).
+``WendlingModel.burn_in`` sets the initial conditions of the model to the cached
+state, or integrates the transient and stores it:
+
+    cache = BurnInCache("burnin/")           # or BurnInCache() in memory only
+    for B in np.linspace(20, 40, 21):
+        model.params["B"] = B
+        model.burn_in(2000.0, cache=cache, max_distance=0.1)
+        model.run()                          # starts equilibrated
+
+With the same seed, a run after a cache hit is identical to a run after
+integrating the transient. In parameter sweeps, ``max_distance`` reuses the
+state of the nearest cached point with the same network (largest relative
+difference of a local parameter at most ``max_distance``) and only integrates a
+shorter settling time (``settle``, default a quarter of the transient) from it.
+The settled state is cached for the new point.
+
+The transient is integrated without schedules and without streamed outputs
+(BOLD, sensors, events); their state is not part of the cache.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .connectome import get_prepared_connectome
+from .paramtable import pack_local_params
+from .timeIntegration import INIT_VARS, timeIntegration
+
+
+class BurnInState:
+    """Equilibrated state of a network: delay history (10, N, max_delay + 1), noise stream seed and parameter point."""
+
+    __slots__ = ("history", "rng_state", "point")
+
+    def __init__(self, history, rng_state, point):
+        self.history = history
+        self.rng_state = rng_state
+        self.point = point
+
+
+def _hash(*parts):
+    """Hash of strings, numbers and arrays."""
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(str((part.dtype.str, part.shape)).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(repr(part).encode())
+    return h.hexdigest()
+
+
+def _distance(a, b):
+    """Largest relative difference between two parameter points."""
+    scale = np.maximum(np.abs(a), np.abs(b))
+    diff = np.abs(a - b)
+    return float(np.max(np.where(scale > 0, diff / np.where(scale > 0, scale, 1.0), 0.0), initial=0.0))
+
+
+class BurnInCache:
+    """
+    Equilibrated states keyed by parameter set, in memory and optionally on disk.
+
+    Entries are kept in memory up to ``max_entries`` (least recently used are
+    dropped). With a directory, every entry is also written to
+    ``<path>/<key>.npz`` and entries of earlier sessions are found there.
+    """
+
+    def __init__(self, path=None, max_entries=1024):
+        """
+        :param path: Directory of the on-disk cache, defaults to None (memory only)
+        :type path: str, optional
+        :param max_entries: Number of entries kept in memory, defaults to 1024
+        :type max_entries: int, optional
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (network key, BurnInState)
+        self.hits = 0
+        self.neighbour_hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def keys(params, transient):
+        """
+        Cache keys of a parameter set.
+
+        :param params: Parameter dictionary of the model
+        :type params: dict
+        :param transient: Burn-in duration (ms)
+        :type transient: float
+        :return: Network key (connectome, coupling, dt: states of points with the
+            same network key are interchangeable), entry key, and the parameter
+            point (local parameter table, flattened)
+        :rtype: tuple
+        """
+        connectome = get_prepared_connectome(params)
+        N = connectome.N
+        network = _hash(
+            N, connectome.max_delay, float(params["dt"]), float(params["K_gl"]),
+            params.get("sigmoid_type"), *connectome.kernel_args,
+        )
+        point = pack_local_params(params, N).ravel()
+        inits = [np.asarray(params[name], dtype=np.float64) for name in INIT_VARS]
+        key = _hash(network, point, params.get("seed"), params.get("rng_state"), float(transient), *inits)
+        return network, key, point
+
+    def get(self, key):
+        """
+        Cached state of a key, or None.
+
+        :rtype: BurnInState
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+        if self.path is not None and os.path.exists(self._file(key)):
+            with np.load(self._file(key)) as data:
+                state = BurnInState(data["history"], int(data["rng_state"]), data["point"])
+                network = str(data["network"])
+            self._remember(key, network, state)
+            return state
+        return None
+
+    def nearest(self, network, point, max_distance):
+        """
+        Cached state of the nearest point with the same network (in memory).
+
+        :param network: Network key (see ``keys``)
+        :type network: str
+        :param point: Parameter point (see ``keys``)
+        :type point: numpy.ndarray
+        :param max_distance: Largest accepted relative parameter difference
+        :type max_distance: float
+        :return: State and its distance, or (None, inf)
+        :rtype: tuple
+        """
+        best, best_distance = None, np.inf
+        for entry_network, state in self._entries.values():
+            if entry_network != network or state.point.shape != point.shape:
+                continue
+            distance = _distance(state.point, point)
+            if distance <= max_distance and distance < best_distance:
+                best, best_distance = state, distance
+        return best, best_distance
+
+    def put(self, key, network, state):
+        """Store the state of a key (see ``keys``)."""
+        self._remember(key, network, state)
+        if self.path is not None:
+            np.savez(self._file(key), history=state.history, rng_state=state.rng_state, point=state.point,
+                     network=network)
+
+    def clear(self):
+        """Drop the entries in memory (files on disk are kept)."""
+        self._entries.clear()
+
+    def _remember(self, key, network, state):
+        self._entries[key] = (network, state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+
+def burn_in(params, transient, cache=None, max_distance=0.0, settle=None):
+    """
+    Set the initial conditions in `params` to the state after a transient of
+    `transient` ms, taken from the cache or integrated (see module docstring).
+
+    :param params: Parameter dictionary of the model, updated in place
+        (``y0_init`` ... ``y9_init`` and ``rng_state``)
+    :type params: dict
+    :param transient: Burn-in duration (ms)
+    :type transient: float
+    :param cache: Cache of equilibrated states, defaults to None (always integrate)
+    :type cache: BurnInCache, optional
+    :param max_distance: Reuse the state of the nearest cached point within this
+        relative parameter difference, defaults to 0.0 (exact matches only)
+    :type max_distance: float, optional
+    :param settle: Time integrated from a neighbour's state (ms), defaults to None (transient / 4)
+    :type settle: float, optional
+    :return: Where the state came from: "cache", "neighbour" or "simulated"
+    :rtype: str
+    """
+    network = key = point = None
+    state = None
+    source = "simulated"
+    start = {name: params[name] for name in INIT_VARS}
+    duration = transient
+    rng_state = params.get("rng_state")
+
+    if cache is not None:
+        network, key, point = cache.keys(params, transient)
+        state = cache.get(key)
+        if state is not None:
+            source = "cache"
+            cache.hits += 1
+        elif max_distance > 0:
+            neighbour, _ = cache.nearest(network, point, max_distance)
+            if neighbour is not None:
+                source = "neighbour"
+                cache.neighbour_hits += 1
+                start = {name: neighbour.history[i] for i, name in enumerate(INIT_VARS)}
+                duration = transient / 4 if settle is None else settle
+                rng_state = neighbour.rng_state
+        if source == "simulated":
+            cache.misses += 1
+
+    if state is None:
+        run_params = dict(
+            params, **start, duration=duration, rng_state=rng_state, record_states=False,
+            schedules=None, schedule_t0=0.0, fused_bold=False, leadfield=None, detect_events=False, profiler=None,
+        )
+        _, *ys, streamed = timeIntegration(run_params)
+        state = BurnInState(np.stack(ys), streamed["rng_state"], point)
+        if cache is not None:
+            cache.put(key, network, state)
+
+    for i, name in enumerate(INIT_VARS):
+        params[name] = state.history[i].copy()
+    params["rng_state"] = state.rng_state
+    return source
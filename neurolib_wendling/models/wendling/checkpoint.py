@@ -0,0 +1,272 @@
+"""
+Checkpoints of the complete integrator state, and forks of many continuations from one.
+
+A run's state is more than the ``y*_init`` arrays: the delay history of all
+nodes, the position of the kernel noise stream (``rng_state``), the schedule
+timeline and the state of the outputs computed inside the kernel (BOLD, sensor
+sampling phase, event detector). ``Checkpoint`` holds all of them
+(``CHECKPOINT_PARAMS``) and saves them in one binary ``.npz`` file:
+
+    model.run()                          # warm up
+    cp = model.checkpoint()
+    cp.save("warm.npz")
+
+    model.restore(Checkpoint.load("warm.npz"))
+    model.run(continue_run=True)         # continues exactly where the warm-up ended
+
+``WendlingModel.fork`` integrates many continuations of one checkpoint in one
+batched kernel call, each with its own local parameters or schedules (e.g. a
+stimulation pulse). The variants are integrated as disconnected copies of the
+network (``PreparedConnectome.replicate``) by the ensemble kernel, so only
+v_pyr is returned:
+
+    pulses = [{"schedules": {"p_mean": ([0, 100, 100, 150, 150], [90, 90, amp, amp, 90])}}
+              for amp in np.linspace(100, 400, 200)]
+    res = model.fork(pulses, checkpoint=cp, duration=1000)
+    res["v_pyr"]                         # (200 variants, 1 trial, N, time)
+
+Schedules of a variant are timed from the start of the fork. All variants
+start from the same state and noise seed, but draw from one shared stream, so
+their noise realisations differ.
+"""
+
+import numpy as np
+
+from .connectome import get_prepared_connectome
+from .paramtable import LOCAL_PARAMS, pack_local_params
+from .schedules import prepare_schedules
+from .timeIntegration import INIT_VARS, _integrate_wendling_ensemble, _prepare_integration, kernel_seed
+
+# Parameters holding the state of a run (initial conditions of the next one)
+CHECKPOINT_PARAMS = INIT_VARS + ["rng_state", "schedule_t0", "bold_phase", "bold_init", "sensor_phase", "event_state"]
+
+
+class Checkpoint:
+    """Complete integrator state: the values of ``CHECKPOINT_PARAMS`` (None where unused)."""
+
+    __slots__ = ("state",)
+
+    def __init__(self, state):
+        """
+        :param state: Values of CHECKPOINT_PARAMS
+        :type state: dict
+        """
+        missing = set(CHECKPOINT_PARAMS) - set(state)
+        if missing:
+            raise ValueError(f"Checkpoint is missing {sorted(missing)}.")
+        self.state = {name: state[name] for name in CHECKPOINT_PARAMS}
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        State of a model at the end of its last run (before a run: its initial state).
+
+        :param model: Wendling model
+        :type model: WendlingModel
+        :rtype: Checkpoint
+        """
+        state = {name: model.params.get(name) for name in CHECKPOINT_PARAMS}
+        if all(sv in model.state for sv in model.state_vars):
+            # same as setInitialValuesToLastState
+            startind = model.getMaxDelay() + 1
+            for init_var, state_var in zip(INIT_VARS, model.state_vars):
+                state[init_var] = np.array(model.state[state_var][:, -startind:])
+            state["rng_state"] = model.state.get("rng_state")
+        return cls({name: _copy(value) for name, value in state.items()})
+
+    def apply(self, params):
+        """Set the state in a parameter dictionary (copies of the arrays)."""
+        for name, value in self.state.items():
+            params[name] = _copy(value)
+
+    def save(self, path):
+        """
+        Save as a binary ``.npz`` file (unused entries are omitted).
+
+        :param path: File name
+        :type path: str
+        """
+        np.savez(path, **{name: np.asarray(value) for name, value in self.state.items() if value is not None})
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a checkpoint saved with ``save``.
+
+        :param path: File name
+        :type path: str
+        :rtype: Checkpoint
+        """
+        with np.load(path) as data:
+            state = {name: None for name in CHECKPOINT_PARAMS}
+            for name in data.files:
+                value = data[name]
+                state[name] = value.item() if value.ndim == 0 else value
+        return cls(state)
+
+    @property
+    def nbytes(self):
+        """Size of the state arrays (bytes)."""
+        return sum(np.asarray(value).nbytes for value in self.state.values() if value is not None)
+
+    def __repr__(self):
+        y0 = np.asarray(self.state["y0_init"])
+        N, history = len(y0), y0.size // len(y0)
+        return f"Checkpoint(nodes={N}, history={history} steps, rng_state={self.state['rng_state']})"
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, np.ndarray) else value
+
+
+def _knots(schedule, N, dt, t0):
+    """Knot times (ms, shifted by t0) and values (N, K) of a schedule (see schedules.py)."""
+    if isinstance(schedule, (tuple, list)):
+        times = np.asarray(schedule[0], dtype=np.float64)
+        values = np.asarray(schedule[1], dtype=np.float64)
+    else:
+        values = np.asarray(schedule, dtype=np.float64)
+        times = np.arange(values.shape[-1]) * dt
+    return times + t0, np.broadcast_to(values, (N, len(times)))
+
+
+def _values_at(times, values, union, multiplicity):
+    """Values (N, sum(multiplicity)) of a piecewise-linear schedule at the distinct
+    times `union`, each repeated `multiplicity` times (steps keep both sides)."""
+    columns = []
+    for u, m in zip(union, multiplicity):
+        hit = np.nonzero(times == u)[0]
+        if len(hit):
+            column = values[:, hit]
+        else:
+            j = np.searchsorted(times, u)
+            if j == 0:
+                column = values[:, :1]
+            elif j == len(times):
+                column = values[:, -1:]
+            else:
+                w = (u - times[j - 1]) / (times[j] - times[j - 1])
+                column = values[:, j - 1:j] + w * (values[:, j:j + 1] - values[:, j - 1:j])
+        columns.append(np.concatenate([column] + [column[:, -1:]] * (m - column.shape[1]), axis=1))
+    return np.concatenate(columns, axis=1)
+
+
+def merge_schedules(variant_params, N, dt, t0=0.0):
+    """
+    Schedules of disconnected copies of the network as one schedule dictionary
+    of the stacked network (copy ``c`` has the nodes ``c * N ... (c + 1) * N - 1``).
+
+    Knots of a parameter are merged into the union of the knot times of all
+    copies, which keeps every piecewise-linear schedule exact; copies that do not
+    schedule the parameter hold their constant value.
+
+    :param variant_params: Parameter dictionary of every copy (with its ``schedules``)
+    :type variant_params: list
+    :param N: Number of nodes of one copy
+    :type N: int
+    :param dt: Integration time step (ms)
+    :type dt: float
+    :param t0: Added to the knot times (ms), defaults to 0.0
+    :type t0: float, optional
+    :return: Schedules (see schedules.py) of the V * N nodes
+    :rtype: dict
+    """
+    names = []
+    for params in variant_params:
+        names += [name for name in (params.get("schedules") or {}) if name not in names]
+
+    merged = {}
+    for name in names:
+        knots = [
+            _knots(params["schedules"][name], N, dt, t0) if name in (params.get("schedules") or {}) else None
+            for params in variant_params
+        ]
+        scheduled = [k for k in knots if k is not None]
+        if all(np.array_equal(k[0], scheduled[0][0]) for k in scheduled):
+            # same knot times (e.g. per-step arrays of one length): stack the values
+            times = scheduled[0][0]
+            values = [
+                np.broadcast_to(np.asarray(params[name], dtype=np.float64).reshape(-1, 1), (N, len(times)))
+                if k is None else k[1]
+                for params, k in zip(variant_params, knots)
+            ]
+        else:
+            # a time appears as often as in the schedule with the most knots there (steps)
+            union = np.unique(np.concatenate([k[0] for k in scheduled]))
+            multiplicity = np.maximum.reduce(
+                [np.array([np.count_nonzero(k[0] == u) for u in union]) for k in scheduled]
+            )
+            times = np.repeat(union, multiplicity)
+            values = [
+                np.broadcast_to(np.asarray(params[name], dtype=np.float64).reshape(-1, 1), (N, len(times)))
+                if k is None else _values_at(k[0], k[1], union, multiplicity)
+                for params, k in zip(variant_params, knots)
+            ]
+        merged[name] = (times, np.vstack(values))
+    return merged
+
+
+def fork(params, checkpoint, variants, duration=None, sampling_dt=None, n_trials=1):
+    """
+    Integrate continuations of a checkpoint with different parameters in one batched kernel call.
+
+    :param params: Parameter dictionary of the model (not changed)
+    :type params: dict
+    :param checkpoint: State the continuations start from
+    :type checkpoint: Checkpoint
+    :param variants: Changes of every continuation: local parameters (see
+        paramtable.LOCAL_PARAMS) and ``schedules`` (timed from the fork start)
+    :type variants: list
+    :param duration: Duration of the continuations (ms), defaults to None (params['duration'])
+    :type duration: float, optional
+    :param sampling_dt: Sampling interval of the returned v_pyr (ms), defaults to None (dt)
+    :type sampling_dt: float, optional
+    :param n_trials: Noise realisations per variant, defaults to 1
+    :type n_trials: int, optional
+    :return: ``t`` (ms since the checkpoint), ``v_pyr`` (variants, trials, N, time)
+    :rtype: dict
+    """
+    if len(variants) == 0 or n_trials < 1:
+        raise ValueError("fork needs at least one variant and one trial.")
+    for variant in variants:
+        unknown = set(variant) - set(LOCAL_PARAMS) - {"schedules"}
+        if unknown:
+            raise ValueError(f"Variants can change local parameters and schedules, not {sorted(unknown)}.")
+
+    base = dict(params)
+    checkpoint.apply(base)
+    if duration is not None:
+        base["duration"] = duration
+    dt = base["dt"]
+    sample_every = 1 if sampling_dt is None else max(1, int(round(sampling_dt / dt)))
+    setup = _prepare_integration(dict(base, schedules=None), record_states=False)
+    N = setup["N"]
+    n_steps = setup["n_steps"]
+    V = len(variants)
+
+    connectome = get_prepared_connectome(base)
+    coupled = base["K_gl"] != 0 and connectome.n_edges > 0
+    edges = connectome.replicate(V) if coupled else setup["edges"]
+
+    # schedules of the model continue on its timeline, those of a variant start at the fork
+    t0 = base.get("schedule_t0", 0.0)
+    variant_params = []
+    for variant in variants:
+        p = dict(base, **variant)
+        if "schedules" in variant:
+            shifted = {name: _knots(s, N, dt, t0) for name, s in (variant["schedules"] or {}).items()}
+            p["schedules"] = dict(base.get("schedules") or {}, **shifted)
+        variant_params.append(p)
+    schedules = merge_schedules(variant_params, N, dt)
+
+    v_pyr = _integrate_wendling_ensemble(
+        np.tile(setup["ys"], (1, V, 1)), n_trials, n_steps, sample_every, kernel_seed(base),
+        setup["dt_s"], V * N, np.vstack([pack_local_params(p, N) for p in variant_params]),
+        *edges, base["K_gl"], setup["max_delay"],
+        *prepare_schedules(schedules, V * N, n_steps, dt), t0 / dt
+    )
+    n_samples = v_pyr.shape[-1]
+    return {
+        "t": np.arange(1, n_samples + 1) * sample_every * dt,
+        "v_pyr": v_pyr.reshape(n_trials, V, N, n_samples).transpose(1, 0, 2, 3),
+    }
@@ -0,0 +1,318 @@
+"""
+Prepared connectome: the O(N^2) preprocessing of Cmat and lengthMat, done once.
+
+Every run needs the normalised weights, the delays in integration steps and the
+list of non-zero connections. ``PreparedConnectome`` holds these and is cached
+in ``params['connectome_cache']``; runs that only change local parameters
+(e.g. a sweep over B or G) reuse it. The cache is rebuilt automatically when
+``Cmat``, ``lengthMat``, ``signalV``, ``dt`` or ``delay_interpolation`` change
+(also when the matrices are modified in place).
+
+Delays are rounded to whole steps by default. With ``delay_interpolation``
+``"linear"`` or ``"hermite"`` a connection with a fractional delay is split
+into taps at the neighbouring whole delays (2 or 4), whose weights interpolate
+the delayed output of the source: linearly, or with a cubic Hermite
+(Catmull-Rom) spline. The kernels gather taps like connections, so every
+integration engine supports it; the cost is that of 2 (4) times the number of
+connections with fractional delays.
+
+Nodes that are not connected (directly or indirectly) do not interact, so the
+connected components of the graph can be integrated as independent problems
+(``PreparedConnectome.partition``).
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from neurolib.utils import model_utils as mu
+
+# Backward compatibility: Add computeDelayMatrix if not available
+# PyPI neurolib 0.6.2 has incomplete model_utils.py (missing this function)
+# This patch ensures compatibility with all neurolib versions
+if not hasattr(mu, 'computeDelayMatrix'):
+    def _computeDelayMatrix(lengthMat, signalV, segmentLength=1):
+        """
+        Compute delay matrix from fiber length matrix and signal velocity.
+        Backward compatibility for older neurolib versions.
+        
+        :param lengthMat: Connection length matrix in segments
+        :param signalV: Signal velocity in m/s
+        :param segmentLength: Length of single segment in mm
+        :return: Delay matrix in ms
+        """
+        normalizedLenMat = lengthMat * segmentLength
+        if signalV > 0:
+            Dmat = normalizedLenMat / signalV  # Delays in ms
+        else:
+            Dmat = lengthMat * 0.0
+        return Dmat
+    
+    mu.computeDelayMatrix = _computeDelayMatrix
+
+
+# Interpolation schemes of fractional delays and the delay offsets of their taps
+DELAY_INTERPOLATIONS = {"linear": (0, 1), "hermite": (-1, 0, 1, 2)}
+
+
+def delay_taps(delay, interpolation):
+    """
+    Whole delays and weights of the taps interpolating fractional delays.
+
+    A delay of ``d + f`` steps (``0 <= f < 1``) reads ``(1 - f) * s[d] + f * s[d + 1]``
+    (linear), or the Catmull-Rom spline through ``s[d - 1] ... s[d + 2]`` (hermite;
+    linear for ``d = 0``, as there is no state newer than ``s[0]``).
+
+    :param delay: Delays in steps (n,)
+    :type delay: numpy.ndarray
+    :param interpolation: "linear" or "hermite"
+    :type interpolation: str
+    :return: Tap delays (n, n_taps) and tap weights (n, n_taps); taps of whole delays have zero weight
+    :rtype: tuple
+    """
+    delay = np.round(np.asarray(delay, dtype=np.float64), 9)  # 2.9999999999 steps is 3 steps
+    d = np.floor(delay)
+    f = (delay - d)[:, None]
+    offsets = np.array(DELAY_INTERPOLATIONS[interpolation])
+    if interpolation == "linear":
+        weights = np.hstack((1.0 - f, f))
+    else:
+        f2, f3 = f * f, f * f * f
+        weights = np.hstack((
+            -0.5 * f3 + f2 - 0.5 * f,
+            1.5 * f3 - 2.5 * f2 + 1.0,
+            -1.5 * f3 + 2.0 * f2 + 0.5 * f,
+            0.5 * f3 - 0.5 * f2,
+        ))
+        first = d == 0
+        weights[first] = np.hstack((np.zeros_like(f[first]), 1.0 - f[first], f[first], np.zeros_like(f[first])))
+    return d.astype(np.int64)[:, None] + offsets, weights
+
+
+class PreparedConnectome:
+    """
+    Normalised weights, integer delays and delay-bucketed edge lists of a connectome.
+
+    Edges (only positive weights are connections) are grouped by their delay:
+    bucket ``k`` holds the edges ``bucket_ptr[k]:bucket_ptr[k + 1]`` that all have
+    the delay ``bucket_delay[k]`` (steps), sorted by target and source node, with
+    target ``edge_tgt``, source ``edge_src`` and normalised weight ``edge_w``.
+    The kernels evaluate the coupling of one bucket as a weighted gather from a
+    single time slice of the history, instead of a random access per edge.
+    With delay interpolation, a connection has one edge (tap) per bucket it reads.
+    """
+
+    def __init__(self, Cmat, lengthMat, signalV, dt, interpolation=None):
+        """
+        :param Cmat: Structural connectivity matrix (N, N)
+        :type Cmat: numpy.ndarray
+        :param lengthMat: Fiber length matrix (N, N)
+        :type lengthMat: numpy.ndarray
+        :param signalV: Signal transmission speed (m/s)
+        :type signalV: float
+        :param dt: Integration time step (ms)
+        :type dt: float
+        :param interpolation: Interpolation of fractional delays, "linear" or "hermite", defaults to None (rounding)
+        :type interpolation: str, optional
+        """
+        if interpolation is not None and interpolation not in DELAY_INTERPOLATIONS:
+            raise ValueError(f"Unknown delay_interpolation '{interpolation}', choose None, 'linear' or 'hermite'.")
+        # Copies of the inputs, to detect changes (also in-place modifications)
+        self._Cmat = np.array(Cmat, dtype=np.float64)
+        self._lengthMat = None if lengthMat is None else np.array(lengthMat, dtype=np.float64)
+        self.signalV = signalV
+        self.dt = dt
+        self.interpolation = interpolation
+
+        N = len(self._Cmat)
+        self.N = N
+
+        if N == 1:
+            Dmat = np.zeros((N, N))
+        else:
+            # Compute delay matrix
+            Dmat = mu.computeDelayMatrix(self._lengthMat, signalV)
+            Dmat[np.eye(len(Dmat)) == 1] = np.zeros(len(Dmat))
+        self.Dmat_ndt = np.around(Dmat / dt).astype(np.int64)  # Delay matrix in multiples of dt
+
+        # Normalize connectivity matrix
+        Cmat_max = np.max(self._Cmat)
+        self.weights = self._Cmat / Cmat_max if N > 1 and Cmat_max > 0 else self._Cmat
+
+        # Edges sorted by (delay, target, source) and grouped into delay buckets
+        target, source = np.nonzero(self.weights > 0)
+        weight = self.weights[target, source]
+        if interpolation is None:
+            delay = self.Dmat_ndt[target, source]
+        else:
+            taps, tap_w = delay_taps(Dmat[target, source] / dt, interpolation)
+            used = tap_w != 0.0
+            n_taps = taps.shape[1]
+            target, source = np.repeat(target, n_taps)[used.ravel()], np.repeat(source, n_taps)[used.ravel()]
+            delay = taps[used]
+            weight = (weight[:, None] * tap_w)[used]
+        order = np.lexsort((source, target, delay))
+        self.edge_tgt = target[order].astype(np.int64)
+        self.edge_src = source[order].astype(np.int64)
+        self.edge_w = weight[order]
+        self.max_delay = int(max(np.max(self.Dmat_ndt), delay.max(initial=0)))
+        self.bucket_delay, counts = np.unique(delay[order], return_counts=True)
+        self.bucket_delay = self.bucket_delay.astype(np.int64)
+        self.bucket_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.bucket_ptr[1:])
+
+        # Weakly connected components; isolated nodes are components of their own
+        adjacency = csr_matrix((np.ones(self.n_edges), (self.edge_tgt, self.edge_src)), shape=(N, N))
+        self.n_components, self.component_labels = connected_components(adjacency, directed=True, connection="weak")
+        self._partitions = {}
+
+    @property
+    def n_edges(self):
+        """Number of connections (delay interpolation taps count separately)."""
+        return len(self.edge_src)
+
+    @property
+    def n_buckets(self):
+        """Number of distinct connection delays."""
+        return len(self.bucket_delay)
+
+    @property
+    def kernel_args(self):
+        """Edge arrays in the argument order of the integration kernels."""
+        return self.bucket_ptr, self.bucket_delay, self.edge_tgt, self.edge_src, self.edge_w
+
+    def edge_subset(self, mask, local):
+        """
+        Edge arrays (in ``kernel_args`` order) of a subset of the connections,
+        with node indices renumbered.
+
+        :param mask: Selected connections (n_edges,)
+        :type mask: numpy.ndarray
+        :param local: New index of every node (N,), only read for the selected connections
+        :type local: numpy.ndarray
+        :rtype: tuple
+        """
+        # edges stay in bucket order
+        bucket_of_edge = np.repeat(np.arange(self.n_buckets), np.diff(self.bucket_ptr))
+        buckets, counts = np.unique(bucket_of_edge[mask], return_counts=True)
+        bucket_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=bucket_ptr[1:])
+        return (
+            bucket_ptr,
+            self.bucket_delay[buckets],
+            local[self.edge_tgt[mask]],
+            local[self.edge_src[mask]],
+            self.edge_w[mask],
+        )
+
+    def replicate(self, n_copies):
+        """
+        Edge arrays (in ``kernel_args`` order) of `n_copies` disconnected copies
+        of the network; copy ``c`` has the nodes ``c * N ... (c + 1) * N - 1``.
+
+        :param n_copies: Number of copies
+        :type n_copies: int
+        :rtype: tuple
+        """
+        offsets = (np.arange(n_copies, dtype=np.int64) * self.N)[:, None]
+        # (copy, edge) arrays; edges of each bucket stay together, copy by copy
+        bucket_of_edge = np.broadcast_to(
+            np.repeat(np.arange(self.n_buckets), np.diff(self.bucket_ptr)), (n_copies, self.n_edges)
+        )
+        order = np.argsort(bucket_of_edge.ravel(), kind="stable")
+        return (
+            self.bucket_ptr * n_copies,
+            self.bucket_delay.copy(),
+            (self.edge_tgt[None, :] + offsets).ravel()[order],
+            (self.edge_src[None, :] + offsets).ravel()[order],
+            np.broadcast_to(self.edge_w, (n_copies, self.n_edges)).ravel()[order],
+        )
+
+    def partition(self, n_groups, coupled=True):
+        """
+        Split the nodes into at most `n_groups` independent groups of whole
+        connected components, balanced by their number of nodes and edges.
+
+        Every group comes with its own edge arrays (in ``kernel_args`` order) with
+        node indices local to the group. Without coupling (``coupled=False``,
+        e.g. ``K_gl == 0``) every node is independent and the groups have no edges.
+
+        :param n_groups: Maximum number of groups
+        :type n_groups: int
+        :param coupled: Whether the connections are used, defaults to True
+        :type coupled: bool, optional
+        :return: List of (sorted node indices, edge arrays) per group
+        :rtype: list
+        """
+        key = (int(n_groups), bool(coupled))
+        if key in self._partitions:
+            return self._partitions[key]
+
+        if coupled:
+            labels = self.component_labels
+            n_components = self.n_components
+        else:
+            labels = np.arange(self.N)
+            n_components = self.N
+        cost = np.bincount(labels, minlength=n_components).astype(np.float64)
+        if coupled:
+            cost += np.bincount(labels[self.edge_tgt], minlength=n_components)
+
+        # Greedy balancing: largest component first, into the least loaded group
+        n_groups = max(1, min(int(n_groups), n_components))
+        load = np.zeros(n_groups)
+        group_of = np.empty(n_components, dtype=np.int64)
+        for c in np.argsort(-cost, kind="stable"):
+            group_of[c] = np.argmin(load)
+            load[group_of[c]] += cost[c]
+
+        local = np.empty(self.N, dtype=np.int64)
+        groups = []
+        for group in range(n_groups):
+            nodes = np.nonzero(group_of[labels] == group)[0]
+            local[nodes] = np.arange(len(nodes))
+            if coupled:
+                # both ends of every edge lie in the same component
+                mask = group_of[labels[self.edge_tgt]] == group
+            else:
+                mask = np.zeros(self.n_edges, dtype=bool)
+            groups.append((nodes, self.edge_subset(mask, local)))
+
+        self._partitions[key] = groups
+        return groups
+
+    def matches(self, Cmat, lengthMat, signalV, dt, interpolation=None):
+        """
+        Whether this connectome was prepared from the given inputs.
+
+        :rtype: bool
+        """
+        if dt != self.dt or signalV != self.signalV or interpolation != self.interpolation:
+            return False
+        if lengthMat is None or self._lengthMat is None:
+            same_lengths = lengthMat is None and self._lengthMat is None
+        else:
+            same_lengths = np.array_equal(lengthMat, self._lengthMat)
+        return same_lengths and np.array_equal(Cmat, self._Cmat)
+
+
+def get_prepared_connectome(params):
+    """
+    Return the prepared connectome of the parameters, rebuilding the cached one
+    in ``params['connectome_cache']`` if its inputs changed.
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :rtype: PreparedConnectome
+    """
+    Cmat = params["Cmat"]
+    lengthMat = params.get("lengthMat")
+    signalV = params["signalV"]
+    dt = params["dt"]
+    interpolation = params.get("delay_interpolation")
+
+    connectome = params.get("connectome_cache")
+    if connectome is None or not connectome.matches(Cmat, lengthMat, signalV, dt, interpolation):
+        connectome = PreparedConnectome(Cmat, lengthMat, signalV, dt, interpolation)
+        params["connectome_cache"] = connectome
+    return connectome
@@ -0,0 +1,305 @@
+"""
+Adaptive Dormand-Prince engine for noise-free runs.
+
+Without noise (``p_sigma = 0`` in every node) the model is an ordinary
+differential equation. ``params['integration_method'] = "dopri5"`` integrates it
+with the embedded Runge-Kutta 5(4) pair of Dormand and Prince: the step size
+follows the dynamics (long steps on slow waves and fixed points, short ones on
+spikes), the local error is kept below ``dopri_rtol`` / ``dopri_atol``, and no
+random numbers are drawn. The outputs are the same as with Euler: states on the
+``dt`` grid, filled by the 4th-order dense output of every step, so ``dt`` only
+sets the output resolution. With ``params['sampling_dt']`` only the sampled
+states (and the last ones, needed to continue the run) are evaluated; the other
+columns of the returned state arrays are left at zero.
+
+The engine needs a delay-free system: single nodes, uncoupled networks
+(``K_gl = 0``) or networks whose connections all have zero delay (instantaneous
+coupling). Schedules and the outputs computed inside the Euler kernel (fused
+BOLD, lead-field, events) are not supported.
+
+Note that Euler with ``dt = 0.1 ms`` has its own discretisation error; dopri5
+results converge to the solution of the ODE instead, so the two engines agree
+to O(dt), not bit for bit.
+"""
+
+import logging
+
+import numpy as np
+from numba import njit
+
+from .paramtable import (
+    P_A, P_B, P_G, P_a, P_b, P_g, P_C1, P_C2, P_C3, P_C4, P_C5, P_C6, P_C7,
+    P_e0, P_v0, P_r, P_p_mean, P_p_sigma,
+)
+from .timeIntegration import _sigm_fast
+
+# Dormand-Prince 5(4) tableau (stage coefficients, 5th-order weights, error
+# weights 5th - 4th order incl. the FSAL stage; the system is autonomous, so the
+# stage times are not needed) and dense output polynomial coefficients
+# (stage x powers theta^1..theta^4), as in Hairer & Wanner
+DP_A = np.array([
+    [0.0, 0.0, 0.0, 0.0, 0.0],
+    [1 / 5, 0.0, 0.0, 0.0, 0.0],
+    [3 / 40, 9 / 40, 0.0, 0.0, 0.0],
+    [44 / 45, -56 / 15, 32 / 9, 0.0, 0.0],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0.0],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+])
+DP_B = np.array([35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84])
+DP_E = np.array([-71 / 57600, 0.0, 71 / 16695, -71 / 1920, 17253 / 339200, -22 / 525, 1 / 40])
+DP_P = np.array([
+    [1.0, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0.0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0.0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0.0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0.0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+])
+
+# Step size control
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10.0
+
+
+def integrate_dopri5(params, setup):
+    """
+    Integrate a noise-free run with the adaptive engine (see module docstring).
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param setup: Kernel inputs (``timeIntegration._prepare_integration``)
+    :type setup: dict
+    :return: Last max_delay + 1 states (10, N, max_delay + 1); with recording
+        the trajectory is written into setup["ys"]
+    :rtype: numpy.ndarray
+    """
+    if params.get("fused_bold") or params.get("leadfield") is not None or params.get("detect_events"):
+        raise ValueError("Fused BOLD, lead-field and event outputs are not supported with integration_method='dopri5'.")
+    if params.get("schedules"):
+        raise ValueError("Schedules are not supported with integration_method='dopri5'.")
+    node_params = setup["node_params"]
+    if np.any(node_params[:, P_p_sigma] != 0):
+        raise ValueError("integration_method='dopri5' is deterministic, set p_sigma = 0 in every node.")
+    bucket_ptr, bucket_delay, edge_tgt, edge_src, edge_w = setup["edges"]
+    if np.any(bucket_delay != 0):
+        raise ValueError(
+            "integration_method='dopri5' needs a delay-free network (K_gl = 0, no connections or zero delays)."
+        )
+
+    ys = setup["ys"]
+    startind = setup["startind"]
+    record = ys.shape[2] > startind
+    dt = params["dt"]
+    max_step = params.get("dopri_max_step")
+    h_max = setup["n_steps"] * setup["dt_s"] if max_step is None else max_step / 1000.0
+    # outputs kept by Model.setOutput (every sample_every-th step, as neurolib computes it)
+    sample_every = 1 if params.get("sampling_dt") is None else max(1, int(params["sampling_dt"] / dt))
+    tail, n_accepted, n_rejected = _integrate_dopri5(
+        ys, record, setup["n_steps"], sample_every, setup["dt_s"], setup["N"], node_params,
+        edge_tgt, edge_src, edge_w, params["K_gl"], startind,
+        float(params.get("dopri_rtol", 1e-6)), float(params.get("dopri_atol", 1e-6)), h_max,
+    )
+    logging.debug(f"dopri5: {n_accepted} steps ({n_rejected} rejected) for {setup['n_steps']} output steps of {dt} ms")
+    return tail
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _rhs(y, dy, N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling):
+    """
+    Right-hand side of the noise-free model with instantaneous coupling.
+
+    Args:
+        y: State (10, N); dy: derivatives (10, N), written
+        sig, coupling: Work arrays (N,)
+        (other arguments as in _integrate_wendling_unified)
+    """
+    for node in range(N):
+        sig[node] = _sigm_fast(y[1, node] - y[2, node] - y[3, node],
+                               params_table[node, P_e0], params_table[node, P_v0], params_table[node, P_r])
+        coupling[node] = 0.0
+    for e in range(len(edge_w)):
+        coupling[edge_tgt[e]] += edge_w[e] * sig[edge_src[e]]
+
+    for node in range(N):
+        A = params_table[node, P_A]
+        B = params_table[node, P_B]
+        G = params_table[node, P_G]
+        a = params_table[node, P_a]
+        b = params_table[node, P_b]
+        g = params_table[node, P_g]
+        e0 = params_table[node, P_e0]
+        v0 = params_table[node, P_v0]
+        r = params_table[node, P_r]
+        y0_ = y[0, node]
+        s_c3 = _sigm_fast(params_table[node, P_C3] * y0_, e0, v0, r)
+
+        dy[0, node] = y[5, node]
+        dy[1, node] = y[6, node]
+        dy[2, node] = y[7, node]
+        dy[3, node] = y[8, node]
+        dy[4, node] = y[9, node]
+        dy[5, node] = A * a * (sig[node] + K_gl * coupling[node]) - 2.0 * a * y[5, node] - a * a * y0_
+        dy[6, node] = (A * a * (params_table[node, P_C2] * _sigm_fast(params_table[node, P_C1] * y0_, e0, v0, r)
+                                + params_table[node, P_p_mean])
+                       - 2.0 * a * y[6, node] - a * a * y[1, node])
+        dy[7, node] = B * b * params_table[node, P_C4] * s_c3 - 2.0 * b * y[7, node] - b * b * y[2, node]
+        dy[8, node] = (G * g * params_table[node, P_C7]
+                       * _sigm_fast(params_table[node, P_C5] * y0_ - params_table[node, P_C6] * y[4, node], e0, v0, r)
+                       - 2.0 * g * y[8, node] - g * g * y[3, node])
+        dy[9, node] = B * b * s_c3 - 2.0 * b * y[9, node] - b * b * y[4, node]
+
+
+@njit(cache=True, fastmath=True)
+def _rms(x, y_a, y_b, rtol, atol):
+    """Root mean square of x scaled by atol + rtol * max(|y_a|, |y_b|) (flat arrays)."""
+    total = 0.0
+    for m in range(len(x)):
+        scale = atol + rtol * max(abs(y_a[m]), abs(y_b[m]))
+        total += (x[m] / scale) ** 2
+    return np.sqrt(total / len(x))
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _integrate_dopri5(ys, record, n_steps, sample_every, dt, N, params_table, edge_tgt, edge_src, edge_w, K_gl, startind,
+                      rtol, atol, h_max):
+    """
+    Adaptive Dormand-Prince 5(4) integration with dense output on the dt grid.
+
+    States are handled as flat vectors of length 10 * N (views (10, N) for the
+    right-hand side), the stage combinations are written out.
+
+    Args:
+        ys: State array (10, N, T); the state in column startind - 1 is the
+            initial state, if `record` the outputs are written to the following
+            n_steps columns
+        n_steps: Number of output steps; outputs are evaluated at the steps
+            k = 0, sample_every, 2 * sample_every, ... and the last startind steps
+        dt: Output interval (s)
+        rtol, atol: Relative and absolute tolerance of the local error
+        h_max: Largest step (s)
+        (other arguments as in _integrate_wendling_unified)
+
+    Returns:
+        tail: Last startind outputs (10, N, startind)
+        n_accepted, n_rejected: Number of accepted and rejected steps
+    """
+    M = 10 * N
+    y = ys[:, :, startind - 1].copy().reshape(M)
+    y_new = np.empty(M)
+    y_stage = np.empty(M)
+    err = np.empty(M)
+    K = np.empty((7, M))
+    Q = np.empty((4, M))
+    sig = np.empty(N)
+    coupling = np.empty(N)
+    # last startind outputs (ring), initially the history
+    tail = ys[:, :, :startind].copy()
+
+    k0, k1, k2, k3, k4, k5, k6 = K[0], K[1], K[2], K[3], K[4], K[5], K[6]
+    # (10, N) views for the right-hand side
+    y_2d, y_new_2d, y_stage_2d = y.reshape(10, N), y_new.reshape(10, N), y_stage.reshape(10, N)
+    K_2d = K.reshape(7, 10, N)
+    a21 = DP_A[1, 0]
+    a31, a32 = DP_A[2, 0], DP_A[2, 1]
+    a41, a42, a43 = DP_A[3, 0], DP_A[3, 1], DP_A[3, 2]
+    a51, a52, a53, a54 = DP_A[4, 0], DP_A[4, 1], DP_A[4, 2], DP_A[4, 3]
+    a61, a62, a63, a64, a65 = DP_A[5, 0], DP_A[5, 1], DP_A[5, 2], DP_A[5, 3], DP_A[5, 4]
+    b1, b3, b4, b5, b6 = DP_B[0], DP_B[2], DP_B[3], DP_B[4], DP_B[5]
+    e1, e3, e4, e5, e6, e7 = DP_E[0], DP_E[2], DP_E[3], DP_E[4], DP_E[5], DP_E[6]
+
+    _rhs(y_2d, K_2d[0], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+    t_end = n_steps * dt
+
+    # Initial step (Hairer, Norsett & Wanner, II.4)
+    zeros = np.zeros(M)
+    d0 = _rms(y, y, zeros, rtol, atol)
+    d1 = _rms(k0, y, zeros, rtol, atol)
+    h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    h = min(h, h_max, t_end)
+    for m in range(M):
+        y_stage[m] = y[m] + h * k0[m]
+    _rhs(y_stage_2d, K_2d[1], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+    for m in range(M):
+        err[m] = k1[m] - k0[m]
+    d2 = _rms(err, y, zeros, rtol, atol) / h
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** 0.2
+    h = min(100.0 * h, h1, h_max)
+
+    t = 0.0
+    k_out = 0  # next output step
+    last_outputs = n_steps - startind
+    n_accepted = 0
+    n_rejected = 0
+    while k_out < n_steps:
+        h = min(h, t_end - t)
+        if h <= 0.0:
+            h = dt  # rounding at the end of the run: produce the last outputs
+        for m in range(M):
+            y_stage[m] = y[m] + h * a21 * k0[m]
+        _rhs(y_stage_2d, K_2d[1], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            y_stage[m] = y[m] + h * (a31 * k0[m] + a32 * k1[m])
+        _rhs(y_stage_2d, K_2d[2], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            y_stage[m] = y[m] + h * (a41 * k0[m] + a42 * k1[m] + a43 * k2[m])
+        _rhs(y_stage_2d, K_2d[3], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            y_stage[m] = y[m] + h * (a51 * k0[m] + a52 * k1[m] + a53 * k2[m] + a54 * k3[m])
+        _rhs(y_stage_2d, K_2d[4], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            y_stage[m] = y[m] + h * (a61 * k0[m] + a62 * k1[m] + a63 * k2[m] + a64 * k3[m] + a65 * k4[m])
+        _rhs(y_stage_2d, K_2d[5], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            y_new[m] = y[m] + h * (b1 * k0[m] + b3 * k2[m] + b4 * k3[m] + b5 * k4[m] + b6 * k5[m])
+        _rhs(y_new_2d, K_2d[6], N, params_table, edge_tgt, edge_src, edge_w, K_gl, sig, coupling)
+        for m in range(M):
+            err[m] = h * (e1 * k0[m] + e3 * k2[m] + e4 * k3[m] + e5 * k4[m] + e6 * k5[m] + e7 * k6[m])
+        err_norm = _rms(err, y, y_new, rtol, atol)
+
+        if err_norm > 1.0:
+            h *= max(MIN_FACTOR, SAFETY * err_norm ** -0.2)
+            n_rejected += 1
+            continue
+
+        # dense output at the output times within (t, t + h]
+        t_new = t + h
+        if (k_out + 1) * dt <= t_new + 1e-9 * dt:
+            for p in range(4):
+                for m in range(M):
+                    Q[p, m] = (k0[m] * DP_P[0, p] + k2[m] * DP_P[2, p] + k3[m] * DP_P[3, p]
+                               + k4[m] * DP_P[4, p] + k5[m] * DP_P[5, p] + k6[m] * DP_P[6, p])
+            while k_out < n_steps and (k_out + 1) * dt <= t_new + 1e-9 * dt:
+                theta = min(1.0, ((k_out + 1) * dt - t) / h)
+                slot = k_out % startind
+                m = 0
+                for i in range(10):
+                    for node in range(N):
+                        value = y[m] + h * theta * (Q[0, m] + theta * (Q[1, m] + theta * (Q[2, m] + theta * Q[3, m])))
+                        tail[i, node, slot] = value
+                        m += 1
+                if record:
+                    for i in range(10):
+                        for node in range(N):
+                            ys[i, node, startind + k_out] = tail[i, node, slot]
+                if k_out + 1 >= last_outputs:
+                    k_out += 1
+                else:
+                    k_out = min((k_out // sample_every + 1) * sample_every, last_outputs)
+
+        t = t_new
+        y[:] = y_new
+        k0[:] = k6
+        n_accepted += 1
+        factor = MAX_FACTOR if err_norm == 0.0 else min(MAX_FACTOR, SAFETY * err_norm ** -0.2)
+        h = min(h * factor, h_max)
+
+    # tail in time order: the oldest output is in slot n_steps % startind
+    ordered = np.empty_like(tail)
+    for c in range(startind):
+        ordered[:, :, c] = tail[:, :, (n_steps + c) % startind]
+    return ordered, n_accepted, n_rejected
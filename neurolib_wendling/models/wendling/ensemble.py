@@ -0,0 +1,56 @@
+"""
+Multi-trial ensembles: many noise realisations of one parameter set.
+
+``WendlingModel.run_ensemble(n_trials)`` integrates all trials in one
+vectorised kernel (see ``timeIntegration.timeIntegrationEnsemble``). Per-trial
+statistics can be reduced while the ensemble runs, so that e.g. the mean power
+spectrum of 200 trials does not require storing 200 time series:
+
+    model = WendlingModel()
+    result = model.run_ensemble(
+        200,
+        reducers={"psd": MeanPSD(nperseg=4096), "spikes": ThresholdCrossings(8.0)},
+        keep_trials=False,
+        batch_size=50,
+    )
+    result["reduced"]["psd"]  # (N, n_freqs), mean over trials
+
+A reducer is any function ``f(v_pyr, dt)`` that maps a batch of trials
+``v_pyr`` (trials, N, time) sampled every ``dt`` ms to one array per trial
+(first axis: trials). The ensemble result holds the mean over all trials.
+"""
+
+import numpy as np
+from scipy import signal
+
+
+class MeanPSD:
+    """Welch power spectral density of v_pyr per trial and node."""
+
+    def __init__(self, nperseg=4096):
+        """
+        :param nperseg: Welch segment length in samples, defaults to 4096
+        :type nperseg: int, optional
+        """
+        self.nperseg = nperseg
+        self.freqs = None  # Frequencies (Hz), set on the first call
+
+    def __call__(self, v_pyr, dt):
+        fs = 1000.0 / dt
+        self.freqs, psd = signal.welch(v_pyr, fs=fs, nperseg=min(self.nperseg, v_pyr.shape[-1]), axis=-1)
+        return psd
+
+
+class ThresholdCrossings:
+    """Number of upward crossings of a v_pyr threshold (mV) per trial and node, e.g. spike counts."""
+
+    def __init__(self, threshold):
+        """
+        :param threshold: Threshold on v_pyr (mV)
+        :type threshold: float
+        """
+        self.threshold = threshold
+
+    def __call__(self, v_pyr, dt):
+        above = v_pyr > self.threshold
+        return np.count_nonzero(above[..., 1:] & ~above[..., :-1], axis=-1)
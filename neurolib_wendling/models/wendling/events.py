@@ -0,0 +1,200 @@
+"""
+Online spike and seizure detection on v_pyr = y1 - y2 - y3, inside the integration kernel.
+
+Long epilepsy simulations only need the events, not the traces. With
+``params['detect_events'] = True`` the kernel runs a detector on every node and
+step and returns a compact event array (``EVENT_DTYPE``, one record per event):
+
+- spikes (``EVENT_SPIKE``): v_pyr above ``event_spike_threshold`` (mV), from the
+  upward to the downward crossing
+- seizures (``EVENT_SEIZURE``, e.g. SWD episodes): running envelope above
+  ``event_seizure_threshold`` (mV) for at least ``event_min_seizure_duration`` (ms).
+  The envelope is an exponential moving average (time constant
+  ``event_envelope_tau``) of ``|v_pyr - baseline|``, the baseline a slower moving
+  average (``event_baseline_tau``).
+
+``peak`` is the maximum of v_pyr during the event. The detector state (running
+averages, events still in progress) is kept in ``params['event_state']``, so
+chunkwise runs detect events across chunk boundaries.
+"""
+
+import numpy as np
+from numba import njit
+
+EVENT_SPIKE = 1
+EVENT_SEIZURE = 2
+
+EVENT_DTYPE = np.dtype([
+    ("node", np.int64),
+    ("onset", np.float64),  # ms
+    ("offset", np.float64),  # ms, NaN while the event is still in progress
+    ("peak", np.float64),  # mV
+    ("type", np.int8),
+])
+
+# Columns of the detector state (N, 9); onsets in steps since the run start.
+# Flags are 0 / 1 (no NaN sentinels: the kernels are compiled with fastmath).
+E_STARTED = 0  # running averages initialised
+E_BASELINE = 1
+E_ENVELOPE = 2
+E_SPIKE_OPEN = 3
+E_SPIKE_ONSET = 4
+E_SPIKE_PEAK = 5
+E_SEIZURE_OPEN = 6
+E_SEIZURE_ONSET = 7
+E_SEIZURE_PEAK = 8
+N_EVENT_STATE = 9
+
+# Columns of the raw events written by the kernel (steps, not ms)
+N_EVENT_FIELDS = 5
+
+EVENT_BLOCK = 1024  # Initial capacity of the raw event array
+
+
+def prepare_event_detector(params, N, dt):
+    """
+    Detector settings and state for the kernel.
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param N: Number of nodes
+    :type N: int
+    :param dt: Integration time step (ms)
+    :type dt: float
+    :return: Settings (spike threshold, seizure threshold, envelope and baseline
+        rates per step, minimum seizure duration in steps) and state (N, 9)
+    :rtype: tuple
+    """
+    settings = np.array([
+        params.get("event_spike_threshold", 10.0),
+        params.get("event_seizure_threshold", 3.0),
+        min(1.0, dt / params.get("event_envelope_tau", 100.0)),
+        min(1.0, dt / params.get("event_baseline_tau", 2000.0)),
+        params.get("event_min_seizure_duration", 1000.0) / dt,
+    ], dtype=np.float64)
+
+    state = params.get("event_state")
+    if state is None:
+        state = np.zeros((N, N_EVENT_STATE))
+    state = np.array(state, dtype=np.float64)
+    if state.shape != (N, N_EVENT_STATE):
+        raise ValueError(f"Event detector state must have shape ({N}, {N_EVENT_STATE}), got {state.shape}.")
+    return settings, state
+
+
+def finish_events(raw, state, settings, n_steps, dt):
+    """
+    Convert the raw events of one run to ``EVENT_DTYPE`` and prepare the state
+    for a continued run.
+
+    Events still in progress at the end of the run are appended with a NaN
+    offset (seizures only once they last the minimum duration); a continued run
+    reports them again when they end.
+
+    :param raw: Raw events (n_events, 5): node, onset step, offset step, peak, type
+    :type raw: numpy.ndarray
+    :param state: Detector state (N, 9) at the end of the run
+    :type state: numpy.ndarray
+    :param settings: Detector settings (prepare_event_detector)
+    :type settings: numpy.ndarray
+    :param n_steps: Number of integrated steps
+    :type n_steps: int
+    :param dt: Integration time step (ms)
+    :type dt: float
+    :return: Events (times in ms since the run start) and detector state
+        (onsets relative to the end of the run)
+    :rtype: tuple
+    """
+    open_events = []
+    for node in range(len(state)):
+        if state[node, E_SPIKE_OPEN]:
+            open_events.append((node, state[node, E_SPIKE_ONSET], np.nan, state[node, E_SPIKE_PEAK], EVENT_SPIKE))
+        if state[node, E_SEIZURE_OPEN] and n_steps - 1 - state[node, E_SEIZURE_ONSET] >= settings[4]:
+            open_events.append((node, state[node, E_SEIZURE_ONSET], np.nan, state[node, E_SEIZURE_PEAK], EVENT_SEIZURE))
+    raw = np.vstack([raw.reshape(-1, N_EVENT_FIELDS), np.array(open_events, dtype=np.float64).reshape(-1, N_EVENT_FIELDS)])
+
+    events = np.empty(len(raw), dtype=EVENT_DTYPE)
+    events["node"] = raw[:, 0]
+    # step k ends at (k + 1) * dt, like the time vector of the run
+    events["onset"] = (raw[:, 1] + 1) * dt
+    events["offset"] = (raw[:, 2] + 1) * dt
+    events["peak"] = raw[:, 3]
+    events["type"] = raw[:, 4]
+    events = np.sort(events, order=["onset", "node"], kind="stable")
+
+    state = state.copy()
+    state[:, E_SPIKE_ONSET] -= n_steps
+    state[:, E_SEIZURE_ONSET] -= n_steps
+    return events, state
+
+
+@njit(cache=True, fastmath=True)
+def _emit_event(events, n_events, node, onset, offset, peak, kind):
+    """Append one raw event, growing the array when it is full."""
+    if n_events == events.shape[0]:
+        grown = np.empty((2 * events.shape[0], events.shape[1]), dtype=np.float64)
+        grown[:n_events] = events[:n_events]
+        events = grown
+    events[n_events, 0] = node
+    events[n_events, 1] = onset
+    events[n_events, 2] = offset
+    events[n_events, 3] = peak
+    events[n_events, 4] = kind
+    return events, n_events + 1
+
+
+@njit(cache=True, fastmath=True)
+def _detect_step(state, settings, node, v, k, events, n_events):
+    """
+    Update the detector of one node with the new v_pyr of step k.
+
+    Args:
+        state: Detector state (N, 9), updated in place
+        settings: Output of prepare_event_detector
+        node: Node index
+        v: v_pyr of the node after step k
+        k: Step index in the run
+        events: Raw events (capacity, 5); n_events: number of events stored
+
+    Returns:
+        events, n_events: Raw events (possibly reallocated) and their number
+    """
+    spike_threshold = settings[0]
+    seizure_threshold = settings[1]
+
+    # Running baseline and envelope (initialised with the first sample)
+    if state[node, E_STARTED] == 0.0:
+        state[node, E_STARTED] = 1.0
+        state[node, E_BASELINE] = v
+        state[node, E_ENVELOPE] = 0.0
+    state[node, E_BASELINE] += settings[3] * (v - state[node, E_BASELINE])
+    state[node, E_ENVELOPE] += settings[2] * (abs(v - state[node, E_BASELINE]) - state[node, E_ENVELOPE])
+
+    # Spikes: threshold crossings of v_pyr
+    if v > spike_threshold:
+        if state[node, E_SPIKE_OPEN] == 0.0:
+            state[node, E_SPIKE_OPEN] = 1.0
+            state[node, E_SPIKE_ONSET] = k
+            state[node, E_SPIKE_PEAK] = v
+        elif v > state[node, E_SPIKE_PEAK]:
+            state[node, E_SPIKE_PEAK] = v
+    elif state[node, E_SPIKE_OPEN] != 0.0:
+        events, n_events = _emit_event(events, n_events, node, state[node, E_SPIKE_ONSET], k,
+                                       state[node, E_SPIKE_PEAK], EVENT_SPIKE)
+        state[node, E_SPIKE_OPEN] = 0.0
+
+    # Seizures: envelope above threshold for long enough
+    if state[node, E_ENVELOPE] > seizure_threshold:
+        if state[node, E_SEIZURE_OPEN] == 0.0:
+            state[node, E_SEIZURE_OPEN] = 1.0
+            state[node, E_SEIZURE_ONSET] = k
+            state[node, E_SEIZURE_PEAK] = v
+        elif v > state[node, E_SEIZURE_PEAK]:
+            state[node, E_SEIZURE_PEAK] = v
+    elif state[node, E_SEIZURE_OPEN] != 0.0:
+        if k - state[node, E_SEIZURE_ONSET] >= settings[4]:
+            events, n_events = _emit_event(events, n_events, node, state[node, E_SEIZURE_ONSET], k,
+                                           state[node, E_SEIZURE_PEAK], EVENT_SEIZURE)
+        state[node, E_SEIZURE_OPEN] = 0.0
+
+    return events, n_events
@@ -17,22 +17,23 @@ def generateRandomICs(N, seed=None):
     :return: Tuple of 10 initial condition arrays (N, 1)
     :rtype: tuple
     """
-    np.random.seed(seed)
+    # Local generator, same numbers as seeding the global one (np.random.seed)
+    rng = np.random.RandomState(seed)
     
     # Membrane potentials: small random perturbations around 0
     # Range based on typical physiological values
-    y0_init = np.random.uniform(-0.5, 0.5, (N, 1))  # mV
-    y1_init = np.random.uniform(-0.5, 0.5, (N, 1))  # mV
-    y2_init = np.random.uniform(-0.5, 0.5, (N, 1))  # mV
-    y3_init = np.random.uniform(-0.5, 0.5, (N, 1))  # mV
-    y4_init = np.random.uniform(-0.5, 0.5, (N, 1))  # mV
+    y0_init = rng.uniform(-0.5, 0.5, (N, 1))  # mV
+    y1_init = rng.uniform(-0.5, 0.5, (N, 1))  # mV
+    y2_init = rng.uniform(-0.5, 0.5, (N, 1))  # mV
+    y3_init = rng.uniform(-0.5, 0.5, (N, 1))  # mV
+    y4_init = rng.uniform(-0.5, 0.5, (N, 1))  # mV
     
     # Derivatives: small random perturbations near zero
-    y5_init = np.random.uniform(-0.1, 0.1, (N, 1))
-    y6_init = np.random.uniform(-0.1, 0.1, (N, 1))
-    y7_init = np.random.uniform(-0.1, 0.1, (N, 1))
-    y8_init = np.random.uniform(-0.1, 0.1, (N, 1))
-    y9_init = np.random.uniform(-0.1, 0.1, (N, 1))
+    y5_init = rng.uniform(-0.1, 0.1, (N, 1))
+    y6_init = rng.uniform(-0.1, 0.1, (N, 1))
+    y7_init = rng.uniform(-0.1, 0.1, (N, 1))
+    y8_init = rng.uniform(-0.1, 0.1, (N, 1))
+    y9_init = rng.uniform(-0.1, 0.1, (N, 1))
     
     return (
         y0_init, y1_init, y2_init, y3_init, y4_init,
@@ -40,6 +41,27 @@ def generateRandomICs(N, seed=None):
     )
 
 
+def generateRandomICsBatch(N, n_models, seed=None):
+    """
+    Random initial conditions of many models at once (one vectorised draw).
+    
+    Same distributions as generateRandomICs, from one random stream for all
+    models (the numbers differ from generateRandomICs with per-model seeds).
+    
+    :param N: Number of nodes
+    :type N: int
+    :param n_models: Number of models
+    :type n_models: int
+    :param seed: Random seed, defaults to None
+    :type seed: int, optional
+    :return: Initial conditions (n_models, 10, N, 1); ``ics[k][i]`` is y{i}_init of model k
+    :rtype: numpy.ndarray
+    """
+    # Membrane potentials within +-0.5 mV, derivatives within +-0.1
+    half_width = np.repeat([0.5, 0.1], 5)[:, None, None]
+    return np.random.default_rng(seed).uniform(-1.0, 1.0, (n_models, 10, N, 1)) * half_width
+
+
 def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling2002", random_init=True, heterogeneity=0.0):
     """Load default parameters for the Wendling Neural Mass Model.
     
@@ -75,7 +97,6 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
     ### Runtime parameters (MATCHED TO WORKING CODE)
     params.dt = 0.1  # Time step (ms) = 0.0001 s (10 kHz sampling)
     params.duration = 10000  # Simulation duration (ms) - 10s
-    np.random.seed(seed)
     params.seed = seed
     
     # Sigmoid type
@@ -87,6 +108,7 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
     
     params.signalV = 20.0  # Signal transmission speed (m/s)
     params.K_gl = 0.5  # Global coupling strength
+    params.delay_interpolation = None  # Fractional delays: None (round to dt), "linear" or "hermite" (see connectome.py)
     
     if Cmat is None:
         params.N = 1
@@ -98,6 +120,18 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
         params.N = len(params.Cmat)
         params.lengthMat = Dmat if Dmat is not None else np.zeros_like(Cmat)
     
+    # Normalised weights, delays and edge lists (connectome.py), rebuilt when
+    # Cmat, lengthMat, signalV or dt change
+    params.connectome_cache = None
+    
+    # Threads integrating independent parts of the network (connected components,
+    # or single nodes when K_gl == 0) in parallel; 1 = whole network in one piece
+    params.component_workers = 1
+    
+    # Worker processes the nodes are split across (partitioned.py), exchanging the
+    # states of boundary nodes once per minimum delay between parts; 1 = no partitioning
+    params.partitions = 1
+    
     # ------------------------------------------------------------------------
     # Local node parameters (Wendling 2002 defaults)
     # ------------------------------------------------------------------------
@@ -112,16 +146,14 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
     # Node heterogeneity: vectorize parameters if requested
     if heterogeneity > 0 and params.N > 1:
         # Generate node-specific parameters with variation
-        # Using seed for reproducibility
-        np.random.seed(seed)
+        # Using seed for reproducibility (local generator, the global one is not reseeded)
+        rng = np.random.RandomState(seed)
         # UPDATED: More symmetric variation for better diversity
         # While still avoiding epileptic range
-        params.A = A_base * (1 + np.random.uniform(-heterogeneity, heterogeneity, params.N))
-        params.B = B_base * (1 + np.random.uniform(-heterogeneity, heterogeneity, params.N))  # Full range: 15.4-28.6 @ het=0.3
-        params.G = G_base * (1 + np.random.uniform(-heterogeneity, heterogeneity, params.N))  # Full range: 12.6-23.4 @ het=0.3
-        params.p_mean = p_mean_base * (1 + np.random.uniform(-heterogeneity, heterogeneity, params.N))
-        # Reset seed for other random operations
-        np.random.seed(seed)
+        params.A = A_base * (1 + rng.uniform(-heterogeneity, heterogeneity, params.N))
+        params.B = B_base * (1 + rng.uniform(-heterogeneity, heterogeneity, params.N))  # Full range: 15.4-28.6 @ het=0.3
+        params.G = G_base * (1 + rng.uniform(-heterogeneity, heterogeneity, params.N))  # Full range: 12.6-23.4 @ het=0.3
+        params.p_mean = p_mean_base * (1 + rng.uniform(-heterogeneity, heterogeneity, params.N))
     else:
         # No heterogeneity or single node: use scalar (backward compatible)
         params.A = A_base
@@ -129,6 +161,11 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
         params.G = G_base
         params.p_mean = p_mean_base
     
+    # Time-varying local parameters (any of paramtable.LOCAL_PARAMS, e.g. B, G, p_mean), see schedules.py:
+    # {name: (times_ms, values) or per-step array}
+    params.schedules = None
+    params.schedule_t0 = 0.0  # Time of the run start on the schedule timeline (ms), advanced by chunkwise runs
+    
     # Time constants (1/ms) - CORRECTED to match Wendling 2002 paper
     params.a = 100.0 / 1000.0  # 0.1 (1/ms) = 100 s^-1 (tau_a = 10 ms)
     params.b = 50.0 / 1000.0   # 0.05 (1/ms) = 50 s^-1 (tau_b = 20 ms) - STANDARD VALUE
@@ -156,7 +193,57 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
     params.r = 0.56   # Sigmoid slope (1/mV)
     
     # Integration method
-    params.integration_method = "euler"  # "rk4" or "euler" - using Euler to match original author's code
+    params.integration_method = "euler"  # "euler", "dopri5" or "multirate" - using Euler to match original author's code
+    
+    # Adaptive Dormand-Prince engine for noise-free, delay-free runs (integration_method = "dopri5", see dopri.py)
+    params.dopri_rtol = 1e-6  # Relative tolerance of the local error
+    params.dopri_atol = 1e-6  # Absolute tolerance (mV, mV/s)
+    params.dopri_max_step = None  # Largest step (ms), None = unlimited
+    
+    # Multirate engine (integration_method = "multirate", see multirate.py): Euler steps of dt for y3/y8,
+    # Heun steps of multirate_substeps * dt for the other variables and the delayed coupling
+    params.multirate_substeps = 5
+    
+    # Optional instrumentation (IntegrationProfiler from profiling.py), None = disabled
+    params.profiler = None
+    
+    # Admission control before run() (see resources.py): "auto" switches runs that do not
+    # fit into memory to streamed / decimated output, "warn", "refuse" or None (no check)
+    params.admission = "auto"
+    params.memory_limit = None  # Memory a run may use (bytes), None = 80% of the available memory
+    params.max_runtime = None  # Longest estimated runtime accepted (s), None = unlimited
+    
+    # ------------------------------------------------------------------------
+    # Output options
+    # ------------------------------------------------------------------------
+    
+    # Store the full state trajectories (False: keep only the last max_delay + 1
+    # steps needed to continue the run, e.g. for long runs with fused BOLD)
+    params.record_states = True
+    
+    # Fused BOLD: Balloon-Windkessel model integrated inside the kernel, driven by
+    # max(v_pyr, 0) * bold_input_scale (same transform as boldInputTransform)
+    params.fused_bold = False
+    params.bold_sampling_dt = 2000.0  # BOLD sampling interval / TR (ms)
+    params.bold_input_scale = 0.05
+    params.bold_init = None  # Hemodynamic state (4, N): X, F, Q, V; None = neurolib's default
+    params.bold_phase = 0  # Steps since the last BOLD sample (continued runs)
+    
+    # Sensor-space output (EEG/MEG): lead-field (channels, N) applied to v_pyr
+    # inside the kernel, stored as sensors.sensors (channels, time)
+    params.leadfield = None
+    params.sensor_sampling_dt = None  # Sensor sampling interval (ms), None = dt
+    params.sensor_phase = 0  # Steps since the last sensor sample (continued runs)
+    
+    # Online spike / seizure detection on v_pyr inside the kernel (see events.py),
+    # stored as events.events: one record (node, onset, offset, peak, type) per event
+    params.detect_events = False
+    params.event_spike_threshold = 10.0  # v_pyr threshold of spikes (mV)
+    params.event_seizure_threshold = 3.0  # Envelope threshold of seizures (mV)
+    params.event_envelope_tau = 100.0  # Time constant of the envelope of |v_pyr - baseline| (ms)
+    params.event_baseline_tau = 2000.0  # Time constant of the v_pyr baseline (ms)
+    params.event_min_seizure_duration = 1000.0  # Shorter envelope episodes are not reported (ms)
+    params.event_state = None  # Detector state (continued runs)
     
     # ------------------------------------------------------------------------
     # Initial conditions
@@ -194,4 +281,8 @@ def loadDefaultParams(Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling200
         params.y8_init = np.zeros((params.N, 1))
         params.y9_init = np.zeros((params.N, 1))
     
+    # Seed of the kernel noise stream at the start of a run, like the initial
+    # conditions set by continued runs and burn-in (burnin.py); None = from seed
+    params.rng_state = None
+    
     return params
@@ -1,9 +1,19 @@
+import logging
+
 import numpy as np
 
 from . import loadDefaultParams as dp
 from . import timeIntegration as ti
+from .burnin import burn_in
+from .checkpoint import Checkpoint, fork
+from .connectome import get_prepared_connectome
+from .profiling import IntegrationProfiler
+from .resources import admit, estimate_resources
+from .result import WendlingResult
+from .sensitivity import sensitivities
 # Use absolute import for standalone package (not relative import)
 from neurolib.models.model import Model
+from neurolib.utils.collections import dotdict
 
 
 class WendlingModel(Model):
@@ -44,7 +54,13 @@ class WendlingModel(Model):
     
     # BOLD input transform (voltage to firing rate-like signal)
     # Wendling outputs membrane potential (mV), BOLD expects firing rate-like signal
-    boldInputTransform = lambda self, v: np.maximum(v, 0) * 0.05
+    boldInputTransform = lambda self, v: np.maximum(v, 0) * self.params.get("bold_input_scale", 0.05)
+    
+    # Outputs sampled inside the integration kernel: group -> (phase parameter, state parameter)
+    streamed_outputs = {
+        "BOLD": ("bold_phase", "bold_init"),  # fused Balloon-Windkessel BOLD (params['fused_bold'])
+        "sensors": ("sensor_phase", None),  # lead-field projection of v_pyr (params['leadfield'])
+    }
 
     def __init__(self, params=None, Cmat=None, Dmat=None, seed=None, sigmoid_type="wendling2002", random_init=None, heterogeneity=0.0):
         """
@@ -78,6 +94,9 @@ class WendlingModel(Model):
             random_init = (Cmat is not None and len(Cmat) > 1)
         self.random_init = random_init
         
+        # Result container of the last run (built on first access, see result.py)
+        self._result = None
+        
         # Integration function
         integration = ti.timeIntegration
         
@@ -94,33 +113,481 @@ class WendlingModel(Model):
         
         # Initialize base class
         super().__init__(integration=integration, params=params)
+
+    def clone(self, seed=None, init=None, **params):
+        """
+        Cheap copy of the model for large sweeps, without loadDefaultParams and
+        neurolib's ``Model.__init__``.
+
+        The clone shares the prepared connectome and the array parameters of this
+        model. Shared arrays are read-only, also in this model (they are replaced by
+        read-only copies at the first clone): assign a new array to change one, in
+        the clone or in this model. All other parameters are the clone's own as soon
+        as they are assigned. Node parameters, also heterogeneous ones, are those of
+        this model. Outputs, state and the profiler are not copied.
+
+        :param seed: Seed of the clone, defaults to None (seed and initial conditions of this model).
+            With random initial conditions new ones are drawn from it as in the constructor, so the
+            clone of a homogeneous network equals ``WendlingModel(Cmat, Dmat, seed=seed)``
+        :type seed: int, optional
+        :param init: Initial conditions (10, N, 1) or (10, N, max_delay + 1), defaults to None (see seed)
+        :type init: numpy.ndarray, optional
+        :param params: Parameter overrides, e.g. ``B=30.0``
+        :return: New model
+        :rtype: WendlingModel
+        """
+        if seed is None:
+            seed = self.params["seed"]
+            rng_state = self.params.get("rng_state")
+        else:
+            rng_state = None
+            if init is None and self.random_init and self.params["N"] > 1:
+                init = dp.generateRandomICs(self.params["N"], seed)
+        return self._clone(seed, rng_state, init, params)
+
+    def clones(self, n, seed=None, **params):
+        """
+        Many clones (see ``clone``) with random initial conditions from one vectorised
+        draw (``generateRandomICsBatch``), if this model uses random initial conditions.
+
+        :param n: Number of clones
+        :type n: int
+        :param seed: Seeds of the clones are seed, seed + 1, ...; defaults to None (fresh noise in every run)
+        :type seed: int, optional
+        :param params: Parameter overrides of all clones
+        :return: New models
+        :rtype: list
+        """
+        ics = None
+        if self.random_init and self.params["N"] > 1:
+            ics = dp.generateRandomICsBatch(self.params["N"], n, seed)
+        return [
+            self._clone(None if seed is None else seed + k, None, None if ics is None else ics[k], params)
+            for k in range(n)
+        ]
+
+    def _clone(self, seed, rng_state, init, overrides):
+        get_prepared_connectome(self.params)  # prepared once, shared by all clones
+        model = object.__new__(type(self))
+        model.__dict__.update(self.__dict__)
+
+        params = dotdict({})
+        for key, value in self.params.items():
+            if isinstance(value, np.ndarray) and (value.flags.writeable or value.base is not None):
+                # own read-only copy, so that no in-place write reaches the clones
+                value = value.copy()
+                value.flags.writeable = False
+                self.params[key] = value
+            params[key] = value
+        params.update(seed=seed, rng_state=rng_state, profiler=None)
+        if init is not None:
+            for iv, values in zip(self.init_vars, init):
+                params[iv] = values
+        params.update(overrides)
+
+        model.params = params
+        model.seed = seed
+        model.outputs = dotdict({})
+        model.state = dotdict({})
+        model._result = None
+        model.boldInitialized = False
+        model.__dict__.pop("boldModel", None)
+        return model
+
+    def run(self, inputs=None, chunkwise=False, chunksize=None, bold=False, append=False, append_outputs=None,
+            continue_run=False):
+        """
+        Run the model (see neurolib's ``Model.run``) after admission control.
+        
+        The peak memory (and with ``params['max_runtime']`` the runtime) of the run is
+        estimated first; runs that would not fit are refused, or switched to streamed or
+        decimated chunkwise output, depending on ``params['admission']`` (see resources.py).
+        Overrides made by the admission control only apply to this run.
+        """
+        if append_outputs is not None:
+            append = append_outputs
+        if chunkwise and chunksize is None:
+            chunksize = int(2000 / self.params["dt"])
+        decision = admit(self.params, chunksize=chunksize, append=append)
+        if decision is None:
+            return super().run(inputs=inputs, chunkwise=chunkwise, chunksize=chunksize, bold=bold, append=append,
+                               continue_run=continue_run)
+        
+        saved = {name: self.params.get(name) for name in decision["params"]}
+        self.params.update(decision["params"])
+        try:
+            if decision["chunksize"] is None:
+                super().run(inputs=inputs, chunkwise=chunkwise, chunksize=chunksize, bold=bold, append=append,
+                            continue_run=continue_run)
+            else:
+                if continue_run and not append:
+                    # chunks are appended to each other, not to the outputs of the previous run
+                    self.outputs = dotdict({})
+                super().run(inputs=inputs, chunksize=decision["chunksize"], bold=bold, append=True,
+                            continue_run=continue_run)
+        finally:
+            self.params.update(saved)
+    
+    def estimate_resources(self, chunksize=None, append=False):
+        """
+        Predicted peak memory and runtime of ``run()`` with the current parameters (see resources.py).
+        
+        :param chunksize: Steps per chunk of a chunkwise run, defaults to None (one piece)
+        :type chunksize: int, optional
+        :param append: Chunk outputs are appended, defaults to False
+        :type append: bool, optional
+        :return: ``peak_bytes``, ``state_bytes``, ``output_bytes``, ``runtime`` (s), ``N``, ``n_steps``, ...
+        :rtype: dict
+        """
+        return estimate_resources(self.params, chunksize=chunksize, append=append)
+    
+    def integrate(self, append_outputs=False, simulate_bold=False):
+        """
+        Run the time integration and store states and outputs.
+        
+        Extends neurolib's ``Model.integrate`` with outputs computed inside the
+        integration kernel (fused BOLD, sensor projection) and with runs that do not record the
+        state trajectories (``params['record_states'] = False``).
+        
+        :param append_outputs: Append the outputs to previous outputs (chunkwise / continued runs), defaults to False
+        :type append_outputs: bool, optional
+        :param simulate_bold: Simulate BOLD from the stored output after integration, defaults to False
+        :type simulate_bold: bool, optional
+        """
+        t, *variables = self.integration(self.params)
+        self._result = None
+        # outputs computed inside the kernel are returned after the state variables
+        streamed = variables.pop() if len(variables) > len(self.state_vars) else {}
+        # a continued run starts the noise stream where this one ended
+        self.state["rng_state"] = streamed.pop("rng_state", None)
+        
+        if self.params.get("record_states", True):
+            self.storeOutputsAndStates(t, variables, append=append_outputs)
+        else:
+            # no trajectories: outputs of an earlier run must not pass for this run's
+            for name in ["t"] + self.output_vars:
+                self.outputs.pop(name, None)
+            # only the last `startindt` steps were returned: keep them as state to continue the run
+            self.setStateVariables("t", t)
+            for svn, sv in zip(self.state_vars, variables):
+                self.setStateVariables(svn, sv)
+        
+        for group, result in streamed.items():
+            if group == "events":
+                self._storeEvents(result, append=append_outputs)
+            else:
+                self._storeStreamedOutput(group, result, append=append_outputs)
+        
+        profiler = self.params.get("profiler")
+        if profiler is not None:
+            profiler.lap("copy")
+            profiler.finish_run()
+        
+        # parameter schedules continue on the same timeline in the next chunk
+        if self.params.get("schedules"):
+            self.params["schedule_t0"] = self.params.get("schedule_t0", 0.0) + self.params["duration"]
+        
+        # force bold if params['bold'] == True
+        if self.params.get("bold"):
+            simulate_bold = True
+        
+        # post-hoc BOLD from the stored output (not needed if BOLD was fused into the kernel)
+        if simulate_bold and self.boldInitialized and not self.params.get("fused_bold"):
+            self.simulateBold(t, variables, append=True)
+    
+    def _storeStreamedOutput(self, group, result, append=False):
+        """
+        Store an output sampled inside the kernel as ``<group>.t_<group>`` / ``<group>.<group>``
+        (e.g. ``BOLD.t_BOLD`` / ``BOLD.BOLD``, same outputs as neurolib's post-hoc BOLD) and keep
+        its sampling phase and state for the next chunk.
+        
+        :param group: Output group, key of ``streamed_outputs``
+        :type group: str
+        :param result: Streamed output returned by ``timeIntegration``
+        :type result: dict
+        :param append: Append to previous output of this group, defaults to False
+        :type append: bool, optional
+        """
+        phase_param, state_param = self.streamed_outputs[group]
+        self.params[phase_param] = result["phase"]
+        if state_param is not None:
+            self.params[state_param] = result["state"]
+        
+        # sample times are relative to the start of this chunk
+        t_offset = self.state.get(f"{group}_t_end", 0.0) if append else 0.0
+        self.state[f"{group}_t_end"] = t_offset + result["duration"]
+        
+        t = t_offset + result["t"]
+        data = result["data"]
+        if append and group in self.outputs:
+            t = np.hstack((self.outputs[group][f"t_{group}"], t))
+            data = np.hstack((self.outputs[group][group], data))
+        self.setOutput(f"{group}.t_{group}", t)
+        self.setOutput(f"{group}.{group}", data)
+    
+    def _storeEvents(self, result, append=False):
+        """
+        Store the detected events (see events.py) as ``events.events`` and keep the
+        detector state for the next chunk.
+        
+        Event times are relative to the start of the first chunk. Events still in
+        progress (NaN offset) at the end of the previous chunk are replaced by the
+        events of this chunk, which report them again.
+        
+        :param result: Events returned by ``timeIntegration``
+        :type result: dict
+        :param append: Append to previous events, defaults to False
+        :type append: bool, optional
+        """
+        self.params["event_state"] = result["state"]
+        
+        t_offset = self.state.get("events_t_end", 0.0) if append else 0.0
+        self.state["events_t_end"] = t_offset + result["duration"]
+        
+        events = result["events"].copy()
+        events["onset"] += t_offset
+        events["offset"] += t_offset
+        if append and "events" in self.outputs:
+            previous = self.outputs["events"]["events"]
+            events = np.concatenate((previous[~np.isnan(previous["offset"])], events))
+            events = np.sort(events, order=["onset", "node"], kind="stable")
+        self.setOutput("events.events", events)
+    
+    def simulateBold(self, t, variables, append=False):
+        """
+        Post-hoc BOLD (neurolib's ``Model.simulateBold``) driven by the pyramidal
+        signal v_pyr = y1 - y2 - y3 through ``boldInputTransform``, the same input
+        as the fused BOLD, instead of the default output y1.
+        """
+        v_pyr = variables[1] - variables[2] - variables[3]
+        variables = [v_pyr if svn == self.default_output else sv for svn, sv in zip(self.state_vars, variables)]
+        super().simulateBold(t, variables, append=append)
+    
+    def setInitialValuesToLastState(self):
+        """Sets the initial conditions and the noise stream to the end of the last run, for continuing it."""
+        super().setInitialValuesToLastState()
+        self.params["rng_state"] = self.state.get("rng_state")
+    
+    def clearModelState(self):
+        """Clears the model's state, including the state of outputs computed inside the kernel."""
+        super().clearModelState()
+        self.params["schedule_t0"] = 0.0
+        self.params["event_state"] = None
+        for phase_param, state_param in self.streamed_outputs.values():
+            self.params[phase_param] = 0
+            if state_param is not None:
+                self.params[state_param] = None
+    
+    def checkOutputs(self):
+        """Check outputs for NaNs; without recorded states only the streamed outputs are checked."""
+        if self.params.get("record_states", True):
+            super().checkOutputs()
+        else:
+            for group in self.streamed_outputs:
+                if group in self.outputs and np.isnan(self.outputs[group][group]).any():
+                    logging.error(f"nan in {group} output!")
+    
+    def run_ensemble(self, n_trials, sampling_dt=None, reducers=None, keep_trials=True, batch_size=None):
+        """
+        Simulate `n_trials` independent noise realisations of the current parameters.
+        
+        All trials start from the initial conditions in ``params`` (like a new ``run()``)
+        and are integrated together in one kernel; see ensemble.py for reducers (mean PSD,
+        spike counts) that are applied while the ensemble runs. The model's outputs and
+        state are not changed.
+        
+        :param n_trials: Number of trials
+        :type n_trials: int
+        :param sampling_dt: Sampling interval of the returned v_pyr (ms), defaults to None (dt)
+        :type sampling_dt: float, optional
+        :param reducers: Mapping from name to reducer ``f(v_pyr, dt)``, defaults to None
+        :type reducers: dict, optional
+        :param keep_trials: Return the per-trial v_pyr signals, defaults to True
+        :type keep_trials: bool, optional
+        :param batch_size: Trials integrated per kernel call (limits memory), defaults to None (all)
+        :type batch_size: int, optional
+        :return: ``t`` (ms), ``v_pyr`` (trials, N, time) or None, ``reduced`` (trial means), ``n_trials``
+        :rtype: dict
+        """
+        sample_every = 1 if sampling_dt is None else max(1, int(round(sampling_dt / self.params["dt"])))
+        return ti.timeIntegrationEnsemble(
+            dict(self.params, schedule_t0=0.0),
+            n_trials,
+            sample_every=sample_every,
+            reducers=reducers,
+            keep_trials=keep_trials,
+            batch_size=batch_size,
+        )
+    
+    def burn_in(self, transient=2000.0, cache=None, max_distance=0.0, settle=None):
+        """
+        Start the next run from the state after an initial transient instead of
+        the initial conditions in ``params``.
+        
+        The state after `transient` ms (delay history and noise stream) is taken
+        from `cache` if this parameter set was burnt in before, otherwise it is
+        integrated (and cached); see burnin.py. It replaces ``y0_init`` ...
+        ``y9_init`` and ``rng_state``, so the next ``run()`` starts equilibrated.
+        
+        :param transient: Burn-in duration (ms), defaults to 2000.0
+        :type transient: float, optional
+        :param cache: Cache of equilibrated states, defaults to None (always integrate)
+        :type cache: BurnInCache, optional
+        :param max_distance: Start from the state of the nearest cached parameter point within
+            this relative parameter difference, defaults to 0.0 (exact matches only)
+        :type max_distance: float, optional
+        :param settle: Time integrated from a neighbour's state (ms), defaults to None (transient / 4)
+        :type settle: float, optional
+        :return: Where the state came from: "cache", "neighbour" or "simulated"
+        :rtype: str
+        """
+        return burn_in(self.params, transient, cache=cache, max_distance=max_distance, settle=settle)
+    
+    def checkpoint(self):
+        """
+        Complete integrator state at the end of the last run (see checkpoint.py):
+        delay history, noise stream, schedule timeline and the state of the
+        outputs computed inside the kernel.
+        
+        :rtype: Checkpoint
+        """
+        return Checkpoint.from_model(self)
+    
+    def restore(self, checkpoint):
+        """
+        Set the state of a checkpoint; ``run(continue_run=True)`` then continues from it
+        (a plain ``run()`` resets the state of the streamed outputs).
+        
+        :param checkpoint: State to continue from
+        :type checkpoint: Checkpoint
+        """
+        checkpoint.apply(self.params)
+    
+    def fork(self, variants, checkpoint=None, duration=None, sampling_dt=None, n_trials=1):
+        """
+        Integrate many continuations of one state in a single batched kernel call,
+        each with its own local parameters or schedules (e.g. stimulation pulses).
+        
+        The model's outputs and state are not changed; only v_pyr is returned
+        (see checkpoint.py).
+        
+        :param variants: Changes of every continuation, e.g. ``[{"p_mean": 120}, {"schedules": {...}}]``;
+            schedules of a variant are timed from the start of the fork
+        :type variants: list
+        :param checkpoint: State to start from, defaults to None (end of the last run)
+        :type checkpoint: Checkpoint, optional
+        :param duration: Duration of the continuations (ms), defaults to None (params['duration'])
+        :type duration: float, optional
+        :param sampling_dt: Sampling interval of the returned v_pyr (ms), defaults to None (dt)
+        :type sampling_dt: float, optional
+        :param n_trials: Noise realisations per variant, defaults to 1
+        :type n_trials: int, optional
+        :return: ``t`` (ms since the checkpoint), ``v_pyr`` (variants, trials, N, time)
+        :rtype: dict
+        """
+        if checkpoint is None:
+            checkpoint = self.checkpoint()
+        return fork(self.params, checkpoint, variants, duration=duration, sampling_dt=sampling_dt, n_trials=n_trials)
+    
+    def sensitivities(self, wrt=("A", "B", "G", "K_gl"), per_node=True, sampling_dt=None, transient=0.0, target=None):
+        """
+        Integrate the current parameters together with the derivatives of v_pyr
+        with respect to local parameters and ``K_gl`` (forward mode, fixed noise;
+        see sensitivity.py). With a `target`, the mean squared difference of v_pyr
+        and its gradient are returned, e.g. for gradient-based fitting.
+        
+        The model's outputs and state are not changed.
+        
+        :param wrt: Parameters to differentiate by, defaults to ("A", "B", "G", "K_gl")
+        :type wrt: list, optional
+        :param per_node: One derivative per node for local parameters, defaults to True
+        :type per_node: bool, optional
+        :param sampling_dt: Sampling interval of v_pyr and the loss (ms), defaults to None (dt)
+        :type sampling_dt: float, optional
+        :param transient: Initial time not returned and not part of the loss (ms), defaults to 0.0
+        :type transient: float, optional
+        :param target: Target v_pyr (N, time) on the returned samples, defaults to None
+        :type target: numpy.ndarray, optional
+        :return: ``t``, ``v_pyr``, ``wrt``, ``dv_pyr`` (directions, N, time) or ``loss`` and ``grad``
+        :rtype: dict
+        """
+        return sensitivities(
+            dict(self.params, schedule_t0=0.0), wrt=wrt, per_node=per_node,
+            sampling_dt=sampling_dt, transient=transient, target=target,
+        )
+    
+    @property
+    def result(self):
+        """
+        State trajectories of the last run as a ``WendlingResult``: views of the
+        integration's state array, cached derived signals (v_pyr, firing rate) and
+        zero-copy export to xarray / pandas / Arrow.
+        
+        :rtype: WendlingResult
+        """
+        if self._result is None:
+            self._result = WendlingResult.from_model(self)
+        return self._result
     
     def get_output_signal(self):
         """
-        Compute the pyramidal output signal: v_pyr = y1 - y2 - y3.
+        Pyramidal output signal: v_pyr = y1 - y2 - y3.
         
-        This is the typical EEG/LFP surrogate signal.
+        This is the typical EEG/LFP surrogate signal. It is computed once per run
+        and cached read-only in ``result.v_pyr``; this returns a writable copy of it.
         
         :return: Output signal for each node
         :rtype: numpy.ndarray
         """
-        if hasattr(self, 'y1') and hasattr(self, 'y2') and hasattr(self, 'y3'):
-            return self.y1 - self.y2 - self.y3
-        else:
+        try:
+            return self.result.v_pyr.copy()
+        except ValueError:
             raise ValueError("Model has not been run yet. Call model.run() first.")
     
+    def enable_profiling(self, callback=None, track_memory=False, log=False):
+        """
+        Enable per-phase instrumentation of ``timeIntegration``.
+        
+        Every subsequent run records the time (and optionally memory) spent in
+        parameter preparation, numba compilation, the integration kernel and
+        copying results back, as well as the kernel throughput in node-steps/s.
+        
+        :param callback: Function called with the report (dict) after every run, defaults to None
+        :type callback: callable, optional
+        :param track_memory: Record memory allocated per phase (tracemalloc), defaults to False
+        :type track_memory: bool, optional
+        :param log: Emit reports as structured log records, defaults to False
+        :type log: bool, optional
+        :return: The profiler, holding the reports of all profiled runs
+        :rtype: IntegrationProfiler
+        """
+        self.params["profiler"] = IntegrationProfiler(callback=callback, track_memory=track_memory, log=log)
+        return self.params["profiler"]
+    
+    def disable_profiling(self):
+        """
+        Disable instrumentation, returning the profiler that was active (or None).
+        
+        :rtype: IntegrationProfiler
+        """
+        profiler = self.params.get("profiler")
+        self.params["profiler"] = None
+        return profiler
+    
     def getMaxDelay(self):
         """
         Compute maximum delay in the model.
         
-        Returns the maximum delay due to distance matrix (Dmat).
+        Returns the maximum delay due to distance matrix (Dmat), taken from the
+        prepared connectome that is also used by the integration (self-connections
+        have no delay).
         Local delays within the node are determined by time constants.
         
         :return: Maximum delay in time steps
         :rtype: int
         """
         # Maximum delay from distance matrix
-        max_dmat_delay = super().getMaxDelay()
+        max_dmat_delay = get_prepared_connectome(self.params).max_delay
         
         # Local delays from time constants are small (< 1 ms typically)
         # Already handled in timeIntegration
@@ -0,0 +1,53 @@
+"""
+Packed table of the local (node) parameters of the Wendling model.
+
+Every local parameter can be a scalar (same value for all nodes) or an array
+of length N (node-specific value), in any combination. Before the integration
+all of them are packed into one contiguous float64 table of shape
+(N, len(LOCAL_PARAMS)) in kernel units, so the kernel signature does not
+depend on which parameters are heterogeneous (no recompilation) and every node
+reads its parameters from one row.
+
+Example:
+    model.params['b'] = np.array([0.05, 0.05, 0.03])   # slower slow-inhibitory kinetics in node 2
+    model.params['p_sigma'] = np.array([30, 30, 0])     # deterministic node 2
+"""
+
+import numpy as np
+
+# Local parameters, in column order of the table
+LOCAL_PARAMS = [
+    "A", "B", "G",  # synaptic gains (mV)
+    "a", "b", "g",  # inverse time constants (1/ms in params, 1/s in the table)
+    "C1", "C2", "C3", "C4", "C5", "C6", "C7",  # connectivity constants
+    "e0", "v0", "r",  # sigmoid
+    "p_mean", "p_sigma",  # input (Hz)
+]
+
+# Column indices, used by the kernels
+(P_A, P_B, P_G, P_a, P_b, P_g,
+ P_C1, P_C2, P_C3, P_C4, P_C5, P_C6, P_C7,
+ P_e0, P_v0, P_r, P_p_mean, P_p_sigma) = range(len(LOCAL_PARAMS))
+
+# Conversion from parameter units to kernel units (the kernel integrates in seconds)
+KERNEL_SCALE = {"a": 1000.0, "b": 1000.0, "g": 1000.0}
+
+
+def pack_local_params(params, N):
+    """
+    Build the (N, len(LOCAL_PARAMS)) parameter table in kernel units.
+    
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param N: Number of nodes
+    :type N: int
+    :return: Contiguous parameter table, one row per node
+    :rtype: numpy.ndarray
+    """
+    table = np.empty((N, len(LOCAL_PARAMS)), dtype=np.float64)
+    for col, name in enumerate(LOCAL_PARAMS):
+        value = np.asarray(params[name], dtype=np.float64).ravel()
+        if value.size != 1 and value.size != N:
+            raise ValueError(f"Parameter '{name}' must be a scalar or have length N={N}, got {value.size} values.")
+        table[:, col] = value * KERNEL_SCALE.get(name, 1.0)
+    return table
@@ -0,0 +1,267 @@
+"""
+Partitioned integration: the nodes of a large network split across worker processes.
+
+With ``params['partitions'] = P`` the network is split into P parts of
+neighbouring nodes (``partition_nodes``) and every part is integrated by its own
+process with the unified kernel. Because the coupling is delayed, a node only
+needs the states of remote sources from at least ``d_min + 1`` steps ago, where
+``d_min`` is the smallest delay (in steps) of the connections between parts. The
+processes therefore integrate windows of ``d_min + 1`` steps independently and
+only exchange the states of their boundary nodes (sources of connections into
+another part) after every window.
+
+Every process integrates its own nodes plus copies of the remote sources (halo
+nodes). Halo nodes are not coupled and their states are replaced by the
+received ones after every window, so within a window they are only read where
+the delay reaches back into already exchanged history.
+
+The processes communicate through ``multiprocessing`` connections (pipes).
+The exchange schedule is deadlock free for any connection objects with the
+same interface, e.g. ``multiprocessing.connection.Client`` / ``Listener`` to
+workers on other hosts.
+
+With noise, every part draws its own random stream (seeded with ``seed + part``),
+so results differ from an unpartitioned run; without noise they agree up to
+floating point rounding.
+"""
+
+import multiprocessing
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+from .connectome import get_prepared_connectome
+from .events import N_EVENT_STATE
+from .timeIntegration import _integrate_wendling_unified, _seed_kernel_rng
+
+
+def partition_nodes(connectome, n_parts):
+    """
+    Split the nodes into `n_parts` parts of (nearly) equal size with few connections between parts.
+
+    Nodes are ordered by reverse Cuthill-McKee (neighbours get nearby positions,
+    connected components stay together) and the ordering is cut into contiguous
+    blocks.
+
+    :param connectome: Prepared connectome of the network
+    :type connectome: PreparedConnectome
+    :param n_parts: Number of parts
+    :type n_parts: int
+    :return: Part of every node (N,)
+    :rtype: numpy.ndarray
+    """
+    N = connectome.N
+    adjacency = csr_matrix((np.ones(connectome.n_edges), (connectome.edge_tgt, connectome.edge_src)), shape=(N, N))
+    order = reverse_cuthill_mckee((adjacency + adjacency.T).tocsr(), symmetric_mode=True)
+    part = np.empty(N, dtype=np.int64)
+    part[order] = np.arange(N) * n_parts // N
+    return part
+
+
+def plan_partitions(connectome, part, coupled=True):
+    """
+    Local and halo nodes, connections and exchange lists of every part.
+
+    :param connectome: Prepared connectome of the network
+    :type connectome: PreparedConnectome
+    :param part: Part of every node (N,)
+    :type part: numpy.ndarray
+    :param coupled: Whether the connections are used (False: K_gl == 0, no exchange), defaults to True
+    :type coupled: bool, optional
+    :return: Exchange interval in steps (None without connections between parts) and one plan per part:
+        ``nodes`` (local nodes followed by halo nodes, network indices), ``n_local``, ``edges``
+        (kernel edge arrays), ``send`` / ``recv`` (neighbour part -> node positions in ``nodes``)
+    :rtype: tuple
+    """
+    n_parts = int(part.max()) + 1
+    used = np.full(connectome.n_edges, coupled)
+    tgt_part = np.where(used, part[connectome.edge_tgt], -1)
+    src_part = part[connectome.edge_src]
+    cross = used & (tgt_part != src_part)
+    delays = np.repeat(connectome.bucket_delay, np.diff(connectome.bucket_ptr))
+    # a step reads remote states from delay + 1 steps ago
+    interval = int(delays[cross].min()) + 1 if cross.any() else None
+
+    plans = []
+    local = np.empty(connectome.N, dtype=np.int64)
+    for p in range(n_parts):
+        own = np.nonzero(part == p)[0]
+        halo = np.unique(connectome.edge_src[(tgt_part == p) & cross])
+        nodes = np.concatenate((own, halo))
+        local[nodes] = np.arange(len(nodes))
+        plans.append({
+            "nodes": nodes,
+            "n_local": len(own),
+            "edges": connectome.edge_subset(tgt_part == p, local),
+            "recv": {q: len(own) + np.nonzero(part[halo] == q)[0] for q in np.unique(part[halo])},
+        })
+    for p, plan in enumerate(plans):
+        # part p sends to q the nodes that are halo nodes of q, in q's (sorted) order
+        plan["send"] = {}
+        for q, other in enumerate(plans):
+            if q != p and p in other["recv"]:
+                position = np.searchsorted(plan["nodes"][:plan["n_local"]], other["nodes"][other["recv"][p]])
+                plan["send"][q] = position
+    return interval, plans
+
+
+def _exchange(part, plan, conns, tail, n):
+    """
+    Send the last `n` states of the boundary nodes to every neighbour and receive
+    the halo states. Neighbours are served in a global order of the pairs (p, q),
+    so blocking sends cannot deadlock.
+    """
+    neighbours = sorted(set(plan["send"]) | set(plan["recv"]), key=lambda q: (min(part, q), max(part, q)))
+    for q in neighbours:
+        send = plan["send"].get(q)
+        recv = plan["recv"].get(q)
+        if part < q:
+            if send is not None:
+                conns[q].send(tail[:, send, -n:])
+            if recv is not None:
+                tail[:, recv, -n:] = conns[q].recv()
+        else:
+            if recv is not None:
+                tail[:, recv, -n:] = conns[q].recv()
+            if send is not None:
+                conns[q].send(tail[:, send, -n:])
+
+
+def partition_worker(part, job, conns, result_conn):
+    """
+    Integrate one part window by window, exchanging boundary states with the other parts.
+
+    :param part: Index of the part
+    :type part: int
+    :param job: Plan of the part (see ``plan_partitions``) and its kernel inputs
+    :type job: dict
+    :param conns: Connection to every neighbour part
+    :type conns: dict
+    :param result_conn: Connection receiving the result: recorded states of the
+        local nodes (10, n_local, n_steps) or None, and their last states
+    :type result_conn: multiprocessing.connection.Connection
+    """
+    plan = job["plan"]
+    n_ext = len(plan["nodes"])
+    n_local = plan["n_local"]
+    n_steps = job["n_steps"]
+    interval = job["interval"] or n_steps
+    record = job["record"]
+    history = job["history"]
+    startind = history.shape[2]
+    sched_ids, sched_offsets, sched_t, sched_v, sched_t0 = job["schedules"]
+
+    if job["seed"] is not None:
+        _seed_kernel_rng(job["seed"] + part)
+
+    # outputs that are not computed in partitioned runs
+    bold_state = np.ones((4, n_ext))
+    leadfield = np.zeros((0, n_ext))
+    event_settings = np.zeros(5)
+    event_state = np.zeros((n_ext, N_EVENT_STATE))
+
+    trajectory = np.empty((10, n_local, n_steps)) if record else None
+    for first in range(0, n_steps, interval):
+        n = min(interval, n_steps - first)
+        if record:
+            ys = np.empty((10, n_ext, startind + n))
+            ys[:, :, :startind] = history
+        else:
+            ys = history
+        history = _integrate_wendling_unified(
+            ys, record, n, job["dt_s"], n_ext, job["node_params"],
+            *plan["edges"], job["K_gl"], job["max_delay"],
+            bold_state, 0, 0, 0.0, leadfield, 0, 0,
+            False, event_settings, event_state,
+            sched_ids, sched_offsets, sched_t, sched_v, sched_t0 + first
+        )[0]
+        if record:
+            trajectory[:, :, first:first + n] = ys[:, :n_local, startind:]
+        _exchange(part, plan, conns, history, n)
+
+    result_conn.send((trajectory, history[:, :n_local]))
+    result_conn.close()
+
+
+def integrate_partitioned(params, setup, n_parts):
+    """
+    Integrate the network in `n_parts` worker processes (see module docstring).
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param setup: Kernel inputs of the whole network (``timeIntegration._prepare_integration``)
+    :type setup: dict
+    :param n_parts: Number of parts / worker processes
+    :type n_parts: int
+    :return: Last max_delay + 1 states (10, N, max_delay + 1); the trajectory is written into setup["ys"]
+    :rtype: numpy.ndarray
+    """
+    if params.get("fused_bold") or params.get("leadfield") is not None or params.get("detect_events"):
+        raise ValueError("Fused BOLD, lead-field and event outputs are not supported in partitioned runs.")
+    connectome = get_prepared_connectome(params)
+    N = setup["N"]
+    n_parts = max(1, min(int(n_parts), N))
+    part = partition_nodes(connectome, n_parts)
+    interval, plans = plan_partitions(connectome, part, coupled=params["K_gl"] != 0)
+
+    ys = setup["ys"]
+    startind = setup["startind"]
+    record = ys.shape[2] > startind
+    sched_ids, sched_offsets, sched_t, sched_v, sched_t0 = setup["schedules"]
+
+    context = multiprocessing.get_context("spawn")
+    pipes = {}
+    for p, plan in enumerate(plans):
+        for q in plan["send"]:
+            if (min(p, q), max(p, q)) not in pipes:
+                pipes[(min(p, q), max(p, q))] = context.Pipe()
+
+    workers = []
+    for p, plan in enumerate(plans):
+        nodes = plan["nodes"]
+        conns = {}
+        for (a, b), (end_a, end_b) in pipes.items():
+            if a == p:
+                conns[b] = end_a
+            elif b == p:
+                conns[a] = end_b
+        job = {
+            "plan": plan,
+            "n_steps": setup["n_steps"],
+            "interval": interval,
+            "record": record,
+            "history": np.ascontiguousarray(ys[:, nodes, :startind]),
+            "dt_s": setup["dt_s"],
+            "node_params": setup["node_params"][nodes],
+            "K_gl": params["K_gl"],
+            "max_delay": setup["max_delay"],
+            "schedules": (sched_ids, sched_offsets, sched_t, np.ascontiguousarray(sched_v[nodes]), sched_t0),
+            "seed": setup.get("seed", params.get("seed")),
+        }
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=partition_worker, args=(p, job, conns, sender), daemon=True)
+        process.start()
+        sender.close()
+        workers.append((process, receiver))
+    # the workers hold their own ends: a failing worker is seen as a closed connection
+    for end_a, end_b in pipes.values():
+        end_a.close()
+        end_b.close()
+
+    tail = np.empty((10, N, startind))
+    try:
+        for (process, receiver), plan in zip(workers, plans):
+            own = plan["nodes"][:plan["n_local"]]
+            trajectory, last = receiver.recv()
+            if record:
+                ys[:, own, startind:] = trajectory
+            tail[:, own] = last
+    except EOFError:
+        raise RuntimeError("A partition worker failed, see its error output.")
+    finally:
+        for process, _ in workers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+    return tail
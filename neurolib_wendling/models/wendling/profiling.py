@@ -0,0 +1,173 @@
+"""
+Opt-in instrumentation of the Wendling time integration.
+
+The profiler splits one call of ``timeIntegration`` into phases
+
+- ``prepare``: delay matrix, initial conditions, parameter vectorisation
+- ``compile``: numba compilation (or loading from the on-disk cache); the
+  dopri5, multirate and partitioned engines compile their own kernels, which
+  is then part of ``kernel``
+- ``kernel``: the compiled integration loop
+- ``copy``: assembling the returned state arrays and streamed outputs and
+  storing them in the model (``WendlingModel.integrate``)
+
+and records wall time, memory allocated per phase and kernel throughput.
+
+Usage:
+    model = WendlingModel()
+    profiler = model.enable_profiling(callback=print)
+    model.run()
+    print(profiler.summary())
+
+When no profiler is set (default), ``timeIntegration`` only performs a few
+``is None`` checks, so the overhead is negligible.
+"""
+
+import logging
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+class IntegrationProfiler:
+    """
+    Per-phase timer for ``timeIntegration``.
+
+    The profiler is a lap timer: ``start_run()`` starts the clock, every
+    ``lap(name)`` closes the phase ``name`` that started at the previous lap,
+    and ``finish_run()`` assembles the report of the run.
+    """
+
+    def __init__(self, callback=None, track_memory=False, log=False):
+        """
+        :param callback: Function called with the report (dict) after every run, defaults to None
+        :type callback: callable, optional
+        :param track_memory: Record memory allocated per phase with tracemalloc (slows down Python code), defaults to False
+        :type track_memory: bool, optional
+        :param log: Emit every report as structured log record (logger ``neurolib_wendling.models.wendling.profiling``), defaults to False
+        :type log: bool, optional
+        """
+        self.callback = callback
+        self.track_memory = track_memory
+        self.log = log
+
+        self.reports = []
+        self._phases = None
+        self._run_info = None
+        self._t_last = None
+        self._mem_last = 0
+        self._started_tracing = False
+
+    @property
+    def last(self):
+        """Report of the most recent run (None before the first run)."""
+        return self.reports[-1] if self.reports else None
+
+    def reset(self):
+        """Discard all recorded reports."""
+        self.reports = []
+
+    def start_run(self, **run_info):
+        """
+        Start profiling a run.
+
+        :param run_info: Run description stored in the report (e.g. N, n_steps, dt)
+        """
+        self._run_info = dict(run_info)
+        self._phases = {}
+        if self.track_memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._mem_last = tracemalloc.get_traced_memory()[0]
+        self._t_last = time.perf_counter()
+
+    def lap(self, name):
+        """
+        Close the current phase.
+
+        :param name: Name of the phase that just finished
+        :type name: str
+        """
+        t_now = time.perf_counter()
+        phase = {"time_s": t_now - self._t_last}
+        if self.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            phase["alloc_mb"] = (current - self._mem_last) / 1024.0 ** 2
+            phase["peak_mb"] = (peak - self._mem_last) / 1024.0 ** 2
+            self._mem_last = current
+            tracemalloc.reset_peak()
+        self._phases[name] = phase
+        # exclude the bookkeeping above from the next phase
+        self._t_last = time.perf_counter()
+
+    def finish_run(self):
+        """
+        Finish the current run, call the callback and return the report.
+
+        :return: Report with run description, phases, total time and kernel throughput
+        :rtype: dict
+        """
+        if self.track_memory and self._started_tracing:
+            tracemalloc.stop()
+
+        report = dict(self._run_info)
+        report["phases"] = self._phases
+        report["total_s"] = sum(p["time_s"] for p in self._phases.values())
+
+        kernel = self._phases.get("kernel")
+        node_steps = report.get("N", 0) * report.get("n_steps", 0)
+        if kernel is not None and kernel["time_s"] > 0:
+            report["node_steps_per_s"] = node_steps / kernel["time_s"]
+        else:
+            report["node_steps_per_s"] = float("nan")
+
+        self.reports.append(report)
+        self._phases = None
+
+        if self.log:
+            logger.info(self.format_report(report), extra={"wendling_profile": report})
+        if self.callback is not None:
+            self.callback(report)
+        return report
+
+    @staticmethod
+    def format_report(report):
+        """
+        One-line human readable version of a report.
+
+        :param report: Report as returned by :meth:`finish_run`
+        :type report: dict
+        :rtype: str
+        """
+        phases = ", ".join(
+            f"{name} {p['time_s'] * 1e3:.1f} ms" + (f" ({p['alloc_mb']:+.1f} MB)" if "alloc_mb" in p else "")
+            for name, p in report["phases"].items()
+        )
+        return (
+            f"wendling run N={report.get('N')} steps={report.get('n_steps')}: "
+            f"{phases} | total {report['total_s'] * 1e3:.1f} ms, "
+            f"{report['node_steps_per_s']:.3g} node-steps/s"
+        )
+
+    def summary(self):
+        """
+        Summary of all recorded runs (phase times summed over runs).
+
+        :rtype: str
+        """
+        if not self.reports:
+            return "No runs profiled."
+        totals = {}
+        for report in self.reports:
+            for name, p in report["phases"].items():
+                totals[name] = totals.get(name, 0.0) + p["time_s"]
+        total = sum(totals.values())
+        lines = [f"{len(self.reports)} run(s), total {total:.3f} s"]
+        for name, t in totals.items():
+            share = 100.0 * t / total if total > 0 else 0.0
+            lines.append(f"  {name:<8} {t:9.4f} s  {share:5.1f} %")
+        lines.append(f"  last run: {self.last['node_steps_per_s']:.3g} node-steps/s")
+        return "\n".join(lines)
@@ -0,0 +1,275 @@
+"""
+Resource estimates and admission control of runs.
+
+``estimate_resources`` predicts the peak memory and the runtime of a run from
+its size: nodes, steps, maximum delay, connections, recorded variables and
+streamed outputs. The runtime uses the throughput of the Euler kernel on this
+machine, measured once per session by ``calibrate_throughput`` (a few short
+runs, < 1 s).
+
+Before every ``run()`` the model checks the estimate against
+``params['memory_limit']`` (None: the available memory) and
+``params['max_runtime']`` and, depending on ``params['admission']``:
+
+- ``"auto"`` (default): runs that do not fit are switched to a form that does,
+  with a warning: without recording the states when streamed outputs (BOLD,
+  sensors, events) are set, else chunkwise with decimated outputs (larger
+  ``sampling_dt``). Runs that cannot fit raise a ``MemoryError``
+- ``"warn"``: log a warning and run anyway
+- ``"refuse"``: raise a ``MemoryError`` (or ``TimeoutError`` for ``max_runtime``)
+- ``None``: no check
+
+    estimate = model.estimate_resources()
+    estimate["peak_bytes"], estimate["runtime"]     # bytes, seconds
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+
+from .connectome import get_prepared_connectome
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the available memory a run may use
+MEMORY_FRACTION = 0.8
+
+# Kernel throughput (seconds per node step and per connection step), see calibrate_throughput
+_throughput = None
+
+
+def available_memory():
+    """
+    Memory available to new allocations (bytes), None if unknown.
+
+    :rtype: int
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def calibrate_throughput(N=32, n_steps=4000, force=False):
+    """
+    Measure the Euler kernel's cost per node step and per connection step (once per session).
+
+    :param N: Nodes of the benchmark network, defaults to 32
+    :type N: int, optional
+    :param n_steps: Steps per benchmark run, defaults to 4000
+    :type n_steps: int, optional
+    :param force: Measure again, defaults to False
+    :type force: bool, optional
+    :return: Seconds per node step and per connection step
+    :rtype: tuple
+    """
+    global _throughput
+    if _throughput is not None and not force:
+        return _throughput
+
+    from .loadDefaultParams import loadDefaultParams
+    from .timeIntegration import timeIntegration
+
+    Cmat = np.ones((N, N)) - np.eye(N)
+    params = loadDefaultParams(Cmat=Cmat, Dmat=np.zeros((N, N)), seed=0)
+    params.update(duration=n_steps * params["dt"])
+
+    def seconds(K_gl):
+        timeIntegration(dict(params, K_gl=K_gl, duration=params["dt"]))  # compile / load the kernel
+        best = np.inf
+        for _ in range(3):
+            start = time.perf_counter()
+            timeIntegration(dict(params, K_gl=K_gl))
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    uncoupled = seconds(0.0)
+    coupled = seconds(1.0)
+    per_node = uncoupled / (N * n_steps)
+    per_edge = max(coupled - uncoupled, 0.0) / (N * (N - 1) * n_steps)
+    _throughput = (per_node, per_edge)
+    logger.debug(f"Kernel throughput: {1 / per_node:.3g} node steps/s, {per_edge * 1e9:.3g} ns per connection step")
+    return _throughput
+
+
+def estimate_resources(params, chunksize=None, append=False, calibrate=True):
+    """
+    Peak memory and runtime of a run.
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param chunksize: Steps per chunk of a chunkwise run, defaults to None (one piece)
+    :type chunksize: int, optional
+    :param append: Chunk outputs are appended (chunkwise runs), defaults to False
+    :type append: bool, optional
+    :param calibrate: Measure the kernel throughput if not done yet, else only the memory is estimated, defaults to True
+    :type calibrate: bool, optional
+    :return: ``peak_bytes``, ``state_bytes`` (integration arrays of one piece),
+        ``output_bytes`` (stored outputs), ``runtime`` (s, None without calibration),
+        ``N``, ``n_steps``, ``max_delay``, ``n_edges``
+    :rtype: dict
+    """
+    connectome = get_prepared_connectome(params)
+    N = connectome.N
+    dt = params["dt"]
+    n_steps = int(np.ceil(round(params["duration"], 6) / dt))
+    startind = connectome.max_delay + 1
+    coupled = params["K_gl"] != 0 and connectome.n_edges > 0
+    n_edges = connectome.n_edges if coupled else 0
+    piece = n_steps if chunksize is None else min(int(chunksize), n_steps)
+    sampling_dt = params.get("sampling_dt")
+    sample_every = 1 if sampling_dt is None else max(1, int(sampling_dt / dt))
+    record = params.get("record_states", True)
+
+    # integration arrays: state array (trajectory or history), ring buffers
+    state_bytes = 10 * N * (startind + (piece if record else 0)) * 8
+    state_bytes += 11 * N * (startind + 1) * 8
+    # connectome: input copies, weights, integer delays
+    setup_bytes = 4 * N * N * 8
+
+    # stored outputs: views of the state array in one piece; appended chunks are
+    # copies, and the last append holds the old and the new array
+    output_bytes = 0
+    if record and chunksize is not None and append:
+        output_bytes = 2 * (10 + 1) * N * (n_steps // sample_every) * 8
+    # derived signals (WendlingResult.v_pyr)
+    if record:
+        output_bytes += N * ((n_steps if append or chunksize is None else piece) // sample_every) * 8
+
+    # streamed outputs
+    copies = 2 if append else 1
+    if params.get("fused_bold"):
+        output_bytes += copies * N * (n_steps // max(1, int(round(params.get("bold_sampling_dt", 2000.0) / dt)))) * 8
+    leadfield = params.get("leadfield")
+    if leadfield is not None:
+        every = 1 if params.get("sensor_sampling_dt") is None else int(round(params["sensor_sampling_dt"] / dt))
+        output_bytes += copies * np.shape(leadfield)[0] * (n_steps // max(1, every)) * 8
+
+    runtime = None
+    if calibrate or _throughput is not None:
+        per_node, per_edge = calibrate_throughput()
+        runtime = n_steps * (N * per_node + n_edges * per_edge)
+
+    return {
+        "peak_bytes": int(state_bytes + setup_bytes + output_bytes),
+        "state_bytes": int(state_bytes),
+        "output_bytes": int(output_bytes),
+        "runtime": runtime,
+        "N": N,
+        "n_steps": n_steps,
+        "max_delay": connectome.max_delay,
+        "n_edges": n_edges,
+    }
+
+
+def _has_streamed_outputs(params):
+    return bool(params.get("fused_bold")) or params.get("leadfield") is not None or bool(params.get("detect_events"))
+
+
+def admit(params, chunksize=None, append=False):
+    """
+    Admission control of a run (see module docstring).
+
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param chunksize: Steps per chunk requested by the caller, defaults to None (one piece)
+    :type chunksize: int, optional
+    :param append: Chunk outputs are appended, defaults to False
+    :type append: bool, optional
+    :return: None if the run is admitted as it is, else the changes that make it fit:
+        parameter overrides (``params``) and ``chunksize`` (None: one piece)
+    :rtype: dict
+    """
+    policy = params.get("admission", "auto")
+    if policy is None:
+        return None
+    if policy not in ("auto", "warn", "refuse"):
+        raise ValueError(f"Unknown admission policy '{policy}', choose 'auto', 'warn', 'refuse' or None.")
+
+    limit = params.get("memory_limit")
+    if limit is None:
+        available = available_memory()
+        limit = None if available is None else MEMORY_FRACTION * available
+    max_runtime = params.get("max_runtime")
+    estimate = estimate_resources(params, chunksize=chunksize, append=append, calibrate=max_runtime is not None)
+
+    if max_runtime is not None and estimate["runtime"] > max_runtime:
+        message = f"Estimated runtime {estimate['runtime']:.1f} s exceeds max_runtime = {max_runtime} s."
+        if policy == "warn":
+            logger.warning(message)
+        else:
+            raise TimeoutError(message)
+
+    if limit is None or estimate["peak_bytes"] <= limit:
+        return None
+
+    message = (
+        f"Run needs ~{estimate['peak_bytes'] / 2**30:.2f} GiB (N={estimate['N']}, {estimate['n_steps']} steps), "
+        f"limit is {limit / 2**30:.2f} GiB"
+    )
+    if policy == "warn":
+        logger.warning(message + ".")
+        return None
+    if policy == "refuse" or chunksize is not None:
+        raise MemoryError(message + ". Use a larger sampling_dt, record_states=False with streamed outputs, or a shorter duration.")
+
+    # streaming: the streamed outputs are all the run has to keep
+    if params.get("record_states", True) and _has_streamed_outputs(params):
+        streaming = dict(params, record_states=False)
+        if estimate_resources(streaming, calibrate=False)["peak_bytes"] <= limit:
+            logger.warning(
+                message + "; running without recording the states (streamed outputs only, the state outputs "
+                "y0 ... y9 of earlier runs are removed)."
+            )
+            return {"params": {"record_states": False}, "chunksize": None}
+
+    # decimation: chunkwise with the smallest sampling interval whose outputs fit;
+    # sampling intervals and chunks are divisors of the step count
+    n_steps = estimate["n_steps"]
+    dt = params["dt"]
+    base = 1 if params.get("sampling_dt") is None else max(1, int(params["sampling_dt"] / dt))
+    divisors = _divisors(n_steps)
+    for factor in divisors:
+        sampling_dt = factor * dt
+        if factor % base or int(sampling_dt / dt) != factor:
+            continue
+        # the largest chunk of whole samples with a quarter of the memory for the chunk's state array
+        target = max(factor, int(limit / 4 / (10 * estimate["N"] * 8)))
+        chunk = max(d for d in divisors if d % factor == 0 and (d <= target or d == factor))
+        # same checks as neurolib's Model.checkChunkwise
+        if (chunk * dt / sampling_dt) % 1 != 0 or ((params["duration"] % (chunk * dt)) / sampling_dt) % 1 != 0:
+            continue
+        changes = {"sampling_dt": sampling_dt}
+        trial = dict(params, **changes)
+        if estimate_resources(trial, chunksize=chunk, append=True, calibrate=False)["peak_bytes"] <= limit:
+            logger.warning(
+                message + f"; running chunkwise ({chunk} steps) with outputs decimated to sampling_dt = {factor * params['dt']} ms."
+            )
+            return {"params": changes, "chunksize": chunk}
+    raise MemoryError(
+        message + f", and no decimation of the outputs fits: sampling intervals and chunks must divide the "
+        f"{n_steps} steps of the run ({len(divisors)} divisors). Use a duration with a step count with more "
+        "divisors, a larger sampling_dt or a shorter duration."
+    )
+
+
+def _divisors(n):
+    """Divisors of a positive integer in ascending order."""
+    small, large = [], []
+    d = 1
+    while d * d <= n:
+        if n % d == 0:
+            small.append(d)
+            if d * d != n:
+                large.append(n // d)
+        d += 1
+    return small + large[::-1]
@@ -0,0 +1,195 @@
+"""
+Compact container of the state trajectories of a run.
+
+``WendlingModel.result`` wraps the contiguous state array written by the
+integration kernel (10 variables x N nodes x time) without copying it. The
+variables are views of that buffer, derived signals (``v_pyr``, firing rates)
+are computed once on first access and cached, and the signals can be handed to
+xarray, pandas or Arrow without copies.
+"""
+
+import numpy as np
+
+from .paramtable import P_e0, P_r, P_v0, pack_local_params
+
+STATE_VARS = [f"y{i}" for i in range(10)]
+
+
+def _same_view(a, b):
+    """Whether two arrays are the same view of the same memory."""
+    return (
+        a.shape == b.shape and a.strides == b.strides
+        and a.__array_interface__["data"][0] == b.__array_interface__["data"][0]
+    )
+
+
+class WendlingResult:
+    """
+    State trajectories of a run backed by one (10, N, T) buffer.
+
+    ``result.y0`` ... ``result.y9`` are (N, T) views of the buffer. ``v_pyr``
+    (y1 - y2 - y3) and ``firing_rate`` (sigmoid of v_pyr) are computed on first
+    access and cached; cached signals are read-only.
+    """
+
+    __slots__ = ("states", "t", "_e0", "_v0", "_r", "_v_pyr", "_firing_rate")
+
+    def __init__(self, states, t, e0=2.5, v0=6.0, r=0.56):
+        """
+        :param states: State trajectories (10, N, T); each (variable, node) row contiguous
+        :type states: numpy.ndarray
+        :param t: Time vector (T,) in ms
+        :type t: numpy.ndarray
+        :param e0: Sigmoid parameter e0, scalar or per node (N,), defaults to 2.5
+        :param v0: Sigmoid parameter v0, scalar or per node (N,), defaults to 6.0
+        :param r: Sigmoid parameter r, scalar or per node (N,), defaults to 0.56
+        """
+        if states.ndim != 3 or states.shape[0] != len(STATE_VARS) or states.shape[2] != len(t):
+            raise ValueError(f"States must have shape (10, N, {len(t)}), got {states.shape}.")
+        self.states = states
+        self.t = t
+        N = states.shape[1]
+        self._e0 = np.broadcast_to(np.asarray(e0, dtype=np.float64).reshape(-1, 1), (N, 1))
+        self._v0 = np.broadcast_to(np.asarray(v0, dtype=np.float64).reshape(-1, 1), (N, 1))
+        self._r = np.broadcast_to(np.asarray(r, dtype=np.float64).reshape(-1, 1), (N, 1))
+        self._v_pyr = None
+        self._firing_rate = None
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Result of the last run of a model.
+
+        Uses the state array of the integration directly when the outputs are
+        views of it (a single run); appended chunks are stacked into one buffer.
+
+        :param model: Model after ``run()`` with recorded states
+        :type model: WendlingModel
+        :rtype: WendlingResult
+        """
+        if any(name not in model.outputs for name in STATE_VARS):
+            raise ValueError("Model has not been run yet (or params['record_states'] is False). Call model.run() first.")
+        outputs = [model.outputs[name] for name in STATE_VARS]
+        t = model.outputs["t"]
+        N, T = outputs[0].shape
+
+        states = None
+        buffer = outputs[0].base
+        if isinstance(buffer, np.ndarray) and buffer.ndim == 3 and buffer.shape[:2] == (len(STATE_VARS), N):
+            # the outputs must be exactly the tail of the buffer (not e.g. decimated views of it)
+            tail = buffer[:, :, buffer.shape[2] - T:]
+            if all(_same_view(out, tail[i]) for i, out in enumerate(outputs)):
+                states = tail
+        if states is None:
+            states = np.stack(outputs)
+
+        table = pack_local_params(model.params, N)
+        return cls(states, t, e0=table[:, P_e0], v0=table[:, P_v0], r=table[:, P_r])
+
+    @property
+    def n_nodes(self):
+        """Number of nodes."""
+        return self.states.shape[1]
+
+    @property
+    def n_times(self):
+        """Number of time points."""
+        return self.states.shape[2]
+
+    @property
+    def nbytes(self):
+        """Memory of the trajectories and the cached signals (bytes)."""
+        cached = [a.nbytes for a in (self._v_pyr, self._firing_rate) if a is not None]
+        return self.states.nbytes + sum(cached)
+
+    @property
+    def v_pyr(self):
+        """Pyramidal output y1 - y2 - y3 (N, T), the EEG/LFP surrogate."""
+        if self._v_pyr is None:
+            v_pyr = np.subtract(self.states[1], self.states[2])
+            np.subtract(v_pyr, self.states[3], out=v_pyr)
+            v_pyr.flags.writeable = False
+            self._v_pyr = v_pyr
+        return self._v_pyr
+
+    @property
+    def firing_rate(self):
+        """Firing rate of the pyramidal population S(v_pyr) (N, T) in Hz."""
+        if self._firing_rate is None:
+            rate = np.subtract(self._v0, self.v_pyr)
+            rate *= self._r
+            np.exp(rate, out=rate)
+            rate += 1.0
+            np.divide(2.0 * self._e0, rate, out=rate)
+            rate.flags.writeable = False
+            self._firing_rate = rate
+        return self._firing_rate
+
+    def clear_cache(self):
+        """Release the cached derived signals."""
+        self._v_pyr = None
+        self._firing_rate = None
+
+    def __getattr__(self, name):
+        # y0 ... y9 as attributes
+        if name in STATE_VARS:
+            return self.states[STATE_VARS.index(name)]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __getitem__(self, name):
+        """Signal by name: "y0" ... "y9", "v_pyr" or "firing_rate"."""
+        if name in STATE_VARS:
+            return self.states[STATE_VARS.index(name)]
+        if name in ("v_pyr", "firing_rate"):
+            return getattr(self, name)
+        raise KeyError(f"Unknown signal '{name}', choose from {STATE_VARS + ['v_pyr', 'firing_rate']}.")
+
+    def __repr__(self):
+        return f"WendlingResult(nodes={self.n_nodes}, times={self.n_times}, t=[{self.t[0]:g}, {self.t[-1]:g}] ms)"
+
+    def to_xarray(self, name=None):
+        """
+        Signals as an ``xarray.DataArray`` sharing the memory of the result.
+
+        :param name: Signal (see ``__getitem__``), defaults to None (all state variables)
+        :type name: str, optional
+        :return: Dimensions ("variable", "node", "time") for all states, else ("node", "time")
+        :rtype: xarray.DataArray
+        """
+        import xarray as xr
+
+        coords = {"node": np.arange(self.n_nodes), "time": self.t}
+        if name is None:
+            return xr.DataArray(self.states, dims=("variable", "node", "time"), coords=dict(coords, variable=STATE_VARS))
+        return xr.DataArray(self[name], dims=("node", "time"), coords=coords, name=name)
+
+    def to_pandas(self, name="v_pyr"):
+        """
+        One signal as a ``pandas.DataFrame`` (time x node) sharing the memory of the result.
+
+        :param name: Signal (see ``__getitem__``), defaults to "v_pyr"
+        :type name: str, optional
+        :rtype: pandas.DataFrame
+        """
+        import pandas as pd
+
+        # pandas stores the columns of a float block as rows: the (N, T) signal
+        # is the block itself, no copy is made
+        return pd.DataFrame(self[name].T, index=pd.Index(self.t, name="time"), copy=False)
+
+    def to_arrow(self, name="v_pyr"):
+        """
+        One signal as a ``pyarrow.Table`` with a time column and one column per
+        node; the node columns share the memory of the result.
+
+        :param name: Signal (see ``__getitem__``), defaults to "v_pyr"
+        :type name: str, optional
+        :rtype: pyarrow.Table
+        """
+        import pyarrow as pa
+
+        signal = self[name]
+        columns = {"time": pa.array(self.t)}
+        for node in range(self.n_nodes):
+            columns[str(node)] = pa.array(signal[node])
+        return pa.table(columns)
@@ -0,0 +1,100 @@
+"""
+Time-varying parameter schedules for the Wendling model.
+
+A schedule lets a local parameter (see paramtable.py) change during a single ``run()``, e.g. to
+drive slow-fast seizure onset / offset protocols (Köksal Ersöz et al., 2020)
+without chunking the simulation. Schedules are set in ``params['schedules']``
+as a dictionary ``{parameter: schedule}``. A schedule is either
+
+- a piecewise-linear schedule ``(times, values)``: knot times in ms (increasing)
+  and values of shape ``(K,)`` (all nodes) or ``(N, K)`` (per node), or
+- a per-step array of shape ``(n_steps,)`` or ``(N, n_steps)``, one value per
+  integration step.
+
+Times are measured from the start of the simulation; chunkwise and continued
+runs keep advancing on the same timeline (``params['schedule_t0']``). Before the
+first and after the last knot the first / last value is held.
+
+Example:
+    model.params['schedules'] = {
+        'B': ([0, 5000, 6000, 20000], [50, 50, 25, 25]),   # B drops between 5 s and 6 s
+        'p_mean': ([0, 20000], np.array([[90, 90], [90, 120]])),  # ramp on node 1 only
+    }
+"""
+
+import numpy as np
+
+from .paramtable import KERNEL_SCALE, LOCAL_PARAMS
+
+# Every local parameter can be scheduled (column of the parameter table, see paramtable.py)
+SCHEDULABLE_PARAMS = LOCAL_PARAMS
+
+
+def prepare_schedules(schedules, N, n_steps, dt):
+    """
+    Convert schedules to the flat knot arrays read by the integration kernel.
+
+    All schedules are stored as piecewise-linear knots; a per-step array becomes
+    one knot per step. Knots of all schedules are concatenated, ``offsets``
+    delimits the knots of each schedule.
+
+    :param schedules: Mapping from parameter name to schedule (see module docstring), or None
+    :type schedules: dict
+    :param N: Number of nodes
+    :type N: int
+    :param n_steps: Number of integration steps of the run (for validating per-step arrays)
+    :type n_steps: int
+    :param dt: Integration time step (ms)
+    :type dt: float
+    :return: param_ids (n_sched,), offsets (n_sched + 1,), knot times in steps (K,), knot values in kernel units (N, K)
+    :rtype: tuple of numpy.ndarray
+    """
+    param_ids = []
+    knot_t = []
+    knot_v = []
+    offsets = [0]
+
+    for name, schedule in (schedules or {}).items():
+        if name not in SCHEDULABLE_PARAMS:
+            raise ValueError(f"Parameter '{name}' cannot be scheduled, choose from {SCHEDULABLE_PARAMS}.")
+
+        if isinstance(schedule, (tuple, list)):
+            if len(schedule) != 2:
+                raise ValueError(f"Schedule of '{name}' must be (times, values) or a per-step array.")
+            times = np.asarray(schedule[0], dtype=np.float64) / dt
+            values = np.asarray(schedule[1], dtype=np.float64)
+        else:
+            values = np.asarray(schedule, dtype=np.float64)
+            if values.shape[-1] < n_steps:
+                raise ValueError(
+                    f"Per-step schedule of '{name}' has {values.shape[-1]} steps, the run needs {n_steps}."
+                )
+            times = np.arange(values.shape[-1], dtype=np.float64)
+
+        if values.ndim == 1:
+            values = np.broadcast_to(values, (N, len(values)))
+        if values.ndim != 2 or values.shape[0] != N or values.shape[1] != len(times):
+            raise ValueError(
+                f"Schedule values of '{name}' must have shape ({len(times)},) or ({N}, {len(times)}), got {values.shape}."
+            )
+        if len(times) == 0 or np.any(np.diff(times) < 0):
+            raise ValueError(f"Schedule times of '{name}' must be non-empty and increasing.")
+
+        param_ids.append(SCHEDULABLE_PARAMS.index(name))
+        knot_t.append(times)
+        knot_v.append(values * KERNEL_SCALE.get(name, 1.0))
+        offsets.append(offsets[-1] + len(times))
+
+    if not param_ids:
+        return (
+            np.zeros(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=np.float64),
+            np.zeros((N, 0), dtype=np.float64),
+        )
+    return (
+        np.array(param_ids, dtype=np.int64),
+        np.array(offsets, dtype=np.int64),
+        np.concatenate(knot_t),
+        np.ascontiguousarray(np.concatenate(knot_v, axis=1)),
+    )
@@ -0,0 +1,366 @@
+"""
+Forward-mode parameter sensitivities of the Euler-Maruyama integration.
+
+Alongside the state, the kernel propagates the tangent-linear system of the
+discretised model: the derivative of every state variable with respect to
+selected local parameters (per node or shared by all nodes) and ``K_gl``. The
+derivatives are those of the discrete simulation itself, so they are exact
+gradients of what ``run()`` computes, not of an approximation of it.
+
+The noise is fixed by the seed (``rng_state`` or ``seed``): it is drawn in the
+same order as by the network kernel, so the returned v_pyr equals the v_pyr of
+a single-kernel ``run()`` with the same seed, and repeated evaluations at
+different parameters see the same noise realisation.
+
+    res = model.sensitivities(wrt=["B", "G", "K_gl"], sampling_dt=1.0, transient=1000, target=emp_v)
+    res["loss"]                  # mean squared difference of v_pyr and target
+    res["grad"]["B"]             # d loss / d B of every node (N,)
+
+Without ``target`` the sensitivities of v_pyr themselves are returned
+(``dv_pyr``, directions x N x time), e.g. to chain them through another loss.
+The cost grows with the number of directions: one per node and parameter with
+``per_node=True``, one per parameter otherwise.
+
+Schedules are not supported, and the integration runs in one piece (no
+component workers or partitions).
+"""
+
+import numpy as np
+from numba import njit
+
+from .paramtable import (
+    KERNEL_SCALE, P_A, P_B, P_G, P_a, P_b, P_g, P_C1, P_C2, P_C3, P_C4, P_C5, P_C6, P_C7,
+    P_e0, P_v0, P_r, P_p_mean, P_p_sigma, LOCAL_PARAMS,
+)
+from .timeIntegration import _branch_kernel_rng, _prepare_integration, _seed_kernel_rng, _sigm_fast, kernel_seed
+
+# Parameters with sensitivities (local parameters and the global coupling)
+SENSITIVITY_PARAMS = ["A", "B", "G", "a", "b", "g", "p_mean", "p_sigma", "K_gl"]
+
+# Column of K_gl in the direction table
+_K_GL = -1
+
+
+def sensitivities(params, wrt=("A", "B", "G", "K_gl"), per_node=True, sampling_dt=None, transient=0.0, target=None):
+    """
+    Integrate the model together with the derivatives of v_pyr with respect to `wrt`.
+
+    :param params: Parameter dictionary of the model (not changed)
+    :type params: dict
+    :param wrt: Parameters to differentiate by (see SENSITIVITY_PARAMS), defaults to ("A", "B", "G", "K_gl")
+    :type wrt: list, optional
+    :param per_node: One derivative per node for local parameters, else one for the
+        parameter of all nodes, defaults to True
+    :type per_node: bool, optional
+    :param sampling_dt: Sampling interval of v_pyr and the loss (ms), defaults to None (dt)
+    :type sampling_dt: float, optional
+    :param transient: Initial time not returned and not part of the loss (ms), defaults to 0.0
+    :type transient: float, optional
+    :param target: Target v_pyr (N, time) on the returned samples; the mean squared
+        difference and its gradient are returned instead of ``dv_pyr``, defaults to None
+    :type target: numpy.ndarray, optional
+    :return: ``t`` (ms), ``v_pyr`` (N, time), ``wrt`` (parameter, node or None per direction),
+        ``dv_pyr`` (directions, N, time) or None, ``loss`` and ``grad`` ({parameter: (N,) or float}) or None
+    :rtype: dict
+    """
+    unknown = [name for name in wrt if name not in SENSITIVITY_PARAMS]
+    if unknown:
+        raise ValueError(f"No sensitivities for {unknown}, choose from {SENSITIVITY_PARAMS}.")
+    if params.get("schedules"):
+        raise ValueError("Sensitivities are not supported with parameter schedules.")
+    if params.get("integration_method", "euler") != "euler":
+        raise ValueError("Sensitivities are computed for the Euler-Maruyama integration.")
+
+    dt = params["dt"]
+    sample_every = 1 if sampling_dt is None else max(1, int(round(sampling_dt / dt)))
+    setup = _prepare_integration(params, record_states=False)
+    N = setup["N"]
+    n_steps = setup["n_steps"]
+    n_skip = min(int(round(transient / (sample_every * dt))), n_steps // sample_every)
+    n_out = n_steps // sample_every - n_skip
+
+    # Direction table: parameter column (or _K_GL) and node (-1: all nodes)
+    labels, dir_col, dir_node = [], [], []
+    for name in wrt:
+        if name == "K_gl":
+            labels.append((name, None))
+            dir_col.append(_K_GL)
+            dir_node.append(-1)
+        elif per_node:
+            for node in range(N):
+                labels.append((name, node))
+                dir_col.append(LOCAL_PARAMS.index(name))
+                dir_node.append(node)
+        else:
+            labels.append((name, None))
+            dir_col.append(LOCAL_PARAMS.index(name))
+            dir_node.append(-1)
+    dir_col = np.array(dir_col, dtype=np.int64)
+    dir_node = np.array(dir_node, dtype=np.int64)
+
+    has_target = target is not None
+    if has_target:
+        target = np.ascontiguousarray(target, dtype=np.float64)
+        if target.shape != (N, n_out):
+            raise ValueError(f"Target must have shape (N, time) = {(N, n_out)}, got {target.shape}.")
+    else:
+        target = np.zeros((N, 0), dtype=np.float64)
+
+    # Same noise stream as timeIntegration
+    _seed_kernel_rng(kernel_seed(params))
+
+    v_pyr, dv, loss, grad = _integrate_sensitivities(
+        setup["ys"], n_steps, sample_every, n_skip, setup["dt_s"], N, setup["node_params"],
+        *setup["edges"], params["K_gl"], setup["max_delay"],
+        dir_col, dir_node, not has_target, has_target, target,
+    )
+    _branch_kernel_rng()
+
+    # Derivatives by kernel units -> by parameter units
+    scale = np.array([KERNEL_SCALE.get(name, 1.0) for name, _ in labels])
+    result = {
+        "t": (np.arange(n_skip, n_skip + n_out) + 1) * sample_every * dt,
+        "v_pyr": v_pyr,
+        "wrt": labels,
+        "dv_pyr": None,
+        "loss": None,
+        "grad": None,
+    }
+    if has_target:
+        grad = grad * scale
+        result["loss"] = loss
+        result["grad"] = {}
+        d = 0
+        for name in wrt:
+            if per_node and name != "K_gl":
+                result["grad"][name] = grad[d:d + N].copy()
+                d += N
+            else:
+                result["grad"][name] = float(grad[d])
+                d += 1
+    else:
+        result["dv_pyr"] = np.ascontiguousarray(dv.transpose(1, 0, 2)) * scale[:, None, None]
+    return result
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _integrate_sensitivities(ys, n_steps, sample_every, n_skip, dt, N, params_table,
+                             bucket_ptr, bucket_delay, edge_tgt, edge_src, edge_w, K_gl, max_delay,
+                             dir_col, dir_node, store, has_target, target):
+    """
+    Euler-Maruyama integration of the Wendling network with its tangent-linear
+    system. Same equations and noise draws as _integrate_wendling_unified.
+
+    Tangents are kept with the directions innermost: u (2, 10, N, D) for the
+    current and previous step and the derivatives of the firing rates S(v_pyr)
+    in a ring buffer (L, N, D) read by the delayed coupling. The initial
+    conditions do not depend on the parameters (zero tangents).
+
+    Args:
+        ys: Initial conditions (10, N, max_delay + 1)
+        sample_every: v_pyr (and the loss) are sampled every sample_every steps
+        n_skip: Samples dropped at the start (transient)
+        dt: Time step in seconds, params_table in kernel units
+        dir_col: Parameter column of every direction (-1: K_gl)
+        dir_node: Node of every direction (-1: all nodes)
+        store: Return the sensitivities of the v_pyr samples
+        has_target: Accumulate the mean squared difference to target (N, n_out) and its gradient
+
+    Returns:
+        v_pyr: Samples (N, n_out)
+        dv: Sensitivities (N, D, n_out) if store, else (N, D, 0)
+        loss: Mean squared difference to the target (0 without target)
+        grad: Gradient of the loss (D,)
+    """
+    D = len(dir_col)
+    startind = max_delay + 1
+    L = max_delay + 2
+    n_out = n_steps // sample_every - n_skip
+
+    ring = np.zeros((L, 10, N), dtype=np.float64)
+    sig_ring = np.zeros((L, N), dtype=np.float64)
+    for h in range(startind):
+        for i in range(10):
+            for node in range(N):
+                ring[h % L, i, node] = ys[i, node, h]
+        for node in range(N):
+            sig_ring[h % L, node] = _sigm_fast(
+                ys[1, node, h] - ys[2, node, h] - ys[3, node, h],
+                params_table[node, P_e0], params_table[node, P_v0], params_table[node, P_r]
+            )
+    u = np.zeros((2, 10, N, D), dtype=np.float64)
+    us_ring = np.zeros((L, N, D), dtype=np.float64)
+
+    coupling = np.zeros(N, dtype=np.float64)
+    ucoupling = np.zeros((N, D), dtype=np.float64)
+    n_buckets = len(bucket_delay)
+
+    v_pyr = np.zeros((N, n_out), dtype=np.float64)
+    dv = np.zeros((N, D, n_out if store else 0), dtype=np.float64)
+    loss = 0.0
+    grad = np.zeros(D, dtype=np.float64)
+    norm = 1.0 / (N * n_out) if n_out > 0 else 0.0
+    sqrt_dt = np.sqrt(dt)
+
+    for k in range(n_steps):
+        idx = startind + k
+        cur = idx % L
+        prev = (idx - 1) % L
+        uc = k % 2
+        up = 1 - uc
+
+        if n_buckets > 0:
+            coupling[:] = 0.0
+            ucoupling[:, :] = 0.0
+            for bucket in range(n_buckets):
+                delay_slot = prev - bucket_delay[bucket]
+                if delay_slot < 0:
+                    delay_slot += L
+                for e in range(bucket_ptr[bucket], bucket_ptr[bucket + 1]):
+                    tgt = edge_tgt[e]
+                    src = edge_src[e]
+                    w = edge_w[e]
+                    coupling[tgt] += w * sig_ring[delay_slot, src]
+                    for d in range(D):
+                        ucoupling[tgt, d] += w * us_ring[delay_slot, src, d]
+
+        # output sample of this step (-1: none)
+        out = -1
+        if (k + 1) % sample_every == 0:
+            out = (k + 1) // sample_every - 1 - n_skip
+
+        for node in range(N):
+            A = params_table[node, P_A]
+            B = params_table[node, P_B]
+            G = params_table[node, P_G]
+            a = params_table[node, P_a]
+            b = params_table[node, P_b]
+            g = params_table[node, P_g]
+            C1 = params_table[node, P_C1]
+            C2 = params_table[node, P_C2]
+            C3 = params_table[node, P_C3]
+            C4 = params_table[node, P_C4]
+            C5 = params_table[node, P_C5]
+            C6 = params_table[node, P_C6]
+            C7 = params_table[node, P_C7]
+            e0 = params_table[node, P_e0]
+            v0 = params_table[node, P_v0]
+            r = params_table[node, P_r]
+
+            y0_ = ring[prev, 0, node]
+            y1 = ring[prev, 1, node]
+            y2 = ring[prev, 2, node]
+            y3 = ring[prev, 3, node]
+            y4 = ring[prev, 4, node]
+            y5 = ring[prev, 5, node]
+            y6 = ring[prev, 6, node]
+            y7 = ring[prev, 7, node]
+            y8 = ring[prev, 8, node]
+            y9 = ring[prev, 9, node]
+
+            xi_t = np.random.normal(0.0, 1.0)
+            p_t = params_table[node, P_p_mean] + params_table[node, P_p_sigma] * xi_t * sqrt_dt
+            coupling_input = K_gl * coupling[node]
+
+            # Firing rates and their slopes S'(v) = r S (1 - S / 2e0)
+            s_self = sig_ring[prev, node]
+            s1 = _sigm_fast(C1 * y0_, e0, v0, r)
+            s3 = _sigm_fast(C3 * y0_, e0, v0, r)
+            s5 = _sigm_fast(C5 * y0_ - C6 * y4, e0, v0, r)
+            ds1 = r * s1 * (1.0 - s1 / (2.0 * e0))
+            ds3 = r * s3 * (1.0 - s3 / (2.0 * e0))
+            ds5 = r * s5 * (1.0 - s5 / (2.0 * e0))
+
+            dy5 = A * a * (s_self + coupling_input) - 2.0 * a * y5 - a * a * y0_
+            dy6 = A * a * (C2 * s1 + p_t) - 2.0 * a * y6 - a * a * y1
+            dy7 = B * b * (C4 * s3) - 2.0 * b * y7 - b * b * y2
+            dy8 = G * g * (C7 * s5) - 2.0 * g * y8 - g * g * y3
+            dy9 = B * b * s3 - 2.0 * b * y9 - b * b * y4
+
+            ring[cur, 0, node] = y0_ + dt * y5
+            ring[cur, 1, node] = y1 + dt * y6
+            ring[cur, 2, node] = y2 + dt * y7
+            ring[cur, 3, node] = y3 + dt * y8
+            ring[cur, 4, node] = y4 + dt * y9
+            ring[cur, 5, node] = y5 + dt * dy5
+            ring[cur, 6, node] = y6 + dt * dy6
+            ring[cur, 7, node] = y7 + dt * dy7
+            ring[cur, 8, node] = y8 + dt * dy8
+            ring[cur, 9, node] = y9 + dt * dy9
+            v_new = ring[cur, 1, node] - ring[cur, 2, node] - ring[cur, 3, node]
+            s_new = _sigm_fast(v_new, e0, v0, r)
+            sig_ring[cur, node] = s_new
+            ds_new = r * s_new * (1.0 - s_new / (2.0 * e0))
+
+            residual = 0.0
+            if out >= 0:
+                v_pyr[node, out] = v_new
+                if has_target:
+                    residual = v_new - target[node, out]
+                    loss += norm * residual * residual
+
+            for d in range(D):
+                u0 = u[up, 0, node, d]
+                u1 = u[up, 1, node, d]
+                u2 = u[up, 2, node, d]
+                u3 = u[up, 3, node, d]
+                u4 = u[up, 4, node, d]
+                u5 = u[up, 5, node, d]
+                u6 = u[up, 6, node, d]
+                u7 = u[up, 7, node, d]
+                u8 = u[up, 8, node, d]
+                u9 = u[up, 9, node, d]
+
+                # Tangent-linear right-hand side
+                du5 = A * a * (us_ring[prev, node, d] + K_gl * ucoupling[node, d]) - 2.0 * a * u5 - a * a * u0
+                du6 = A * a * C2 * ds1 * C1 * u0 - 2.0 * a * u6 - a * a * u1
+                du7 = B * b * C4 * ds3 * C3 * u0 - 2.0 * b * u7 - b * b * u2
+                du8 = G * g * C7 * ds5 * (C5 * u0 - C6 * u4) - 2.0 * g * u8 - g * g * u3
+                du9 = B * b * ds3 * C3 * u0 - 2.0 * b * u9 - b * b * u4
+
+                # Explicit dependence on the parameter of this direction
+                col = dir_col[d]
+                if col == -1:
+                    du5 += A * a * coupling[node]
+                elif dir_node[d] < 0 or dir_node[d] == node:
+                    if col == P_A:
+                        du5 += a * (s_self + coupling_input)
+                        du6 += a * (C2 * s1 + p_t)
+                    elif col == P_a:
+                        du5 += A * (s_self + coupling_input) - 2.0 * y5 - 2.0 * a * y0_
+                        du6 += A * (C2 * s1 + p_t) - 2.0 * y6 - 2.0 * a * y1
+                    elif col == P_B:
+                        du7 += b * C4 * s3
+                        du9 += b * s3
+                    elif col == P_b:
+                        du7 += B * C4 * s3 - 2.0 * y7 - 2.0 * b * y2
+                        du9 += B * s3 - 2.0 * y9 - 2.0 * b * y4
+                    elif col == P_G:
+                        du8 += g * C7 * s5
+                    elif col == P_g:
+                        du8 += G * C7 * s5 - 2.0 * y8 - 2.0 * g * y3
+                    elif col == P_p_mean:
+                        du6 += A * a
+                    elif col == P_p_sigma:
+                        du6 += A * a * xi_t * sqrt_dt
+
+                u[uc, 0, node, d] = u0 + dt * u5
+                u[uc, 1, node, d] = u1 + dt * u6
+                u[uc, 2, node, d] = u2 + dt * u7
+                u[uc, 3, node, d] = u3 + dt * u8
+                u[uc, 4, node, d] = u4 + dt * u9
+                u[uc, 5, node, d] = u5 + dt * du5
+                u[uc, 6, node, d] = u6 + dt * du6
+                u[uc, 7, node, d] = u7 + dt * du7
+                u[uc, 8, node, d] = u8 + dt * du8
+                u[uc, 9, node, d] = u9 + dt * du9
+                dv_new = u[uc, 1, node, d] - u[uc, 2, node, d] - u[uc, 3, node, d]
+                us_ring[cur, node, d] = ds_new * dv_new
+
+                if out >= 0:
+                    if store:
+                        dv[node, d, out] = dv_new
+                    if has_target:
+                        grad[d] += 2.0 * norm * residual * dv_new
+
+    return v_pyr, dv, loss, grad
@@ -0,0 +1,695 @@
+"""
+Local simulation service: one shared pool of warmed-up worker processes for many clients.
+
+Instead of every analyst starting their own Python processes (each compiling or
+loading the kernels and preparing the same connectomes), a ``SimulationServer``
+runs on one machine and accepts simulation jobs over a Unix socket or a
+localhost TCP port:
+
+- jobs are put on a queue and executed by a pool of worker processes; every
+  worker compiles the kernels once at startup and keeps recently used models
+  (with their prepared connectome, see connectome.py) between jobs
+- compatible unseeded jobs (same model and parameters, only ``v_pyr`` requested,
+  see ``_batch_key``) arriving within ``batch_window`` seconds are integrated together
+  as one ensemble (``WendlingModel.run_ensemble``), i.e. in a single kernel call
+- results are streamed back as soon as they are available; long jobs can be
+  split into chunks (``chunk_duration``) that are sent one by one
+
+Start a server from the command line::
+
+    python -m neurolib_wendling.models.wendling.service --socket /tmp/wendling.sock --workers 8
+
+and use the client from any process (e.g. a notebook)::
+
+    async with SimulationClient(path="/tmp/wendling.sock") as client:
+        result = await client.run(Cmat=Cmat, Dmat=Dmat, params={"duration": 5000, "B": 30})
+        result["t"], result["v_pyr"]
+
+Messages are a JSON header followed by the raw bytes of the numpy arrays it
+refers to; no pickled objects are exchanged with clients.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from neurolib.utils.collections import dotdict
+
+from .model import WendlingModel
+from .checkpoint import CHECKPOINT_PARAMS
+
+# Parameters that carry the state of a run into the next chunk
+CONTINUATION_PARAMS = CHECKPOINT_PARAMS
+
+# Keyword arguments of WendlingModel accepted in a job's model specification
+MODEL_ARGS = ["Cmat", "Dmat", "seed", "sigmoid_type", "random_init", "heterogeneity"]
+
+# Outputs a job can request
+STATE_OUTPUTS = ["v_pyr"] + WendlingModel.state_vars
+STREAMED_OUTPUTS = ["BOLD", "sensors", "events"]
+
+# Message framing: lengths of the JSON header and of the binary payload
+_FRAME = struct.Struct("!II")
+
+
+# ----------------------------------------------------------------------------
+# Wire format
+# ----------------------------------------------------------------------------
+
+
+def _pack(obj, arrays):
+    """Replace numpy arrays in a nested structure by references into `arrays`."""
+    if isinstance(obj, np.ndarray):
+        arrays.append(np.ascontiguousarray(obj))
+        return {"__array__": len(arrays) - 1}
+    if isinstance(obj, dict):
+        return {str(key): _pack(value, arrays) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_pack(value, arrays) for value in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def _unpack(obj, arrays):
+    """Inverse of ``_pack``."""
+    if isinstance(obj, dict):
+        if "__array__" in obj:
+            return arrays[obj["__array__"]]
+        return {key: _unpack(value, arrays) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_unpack(value, arrays) for value in obj]
+    return obj
+
+
+def encode_message(message):
+    """
+    Encode a message (nested dicts / lists of JSON values and numpy arrays).
+
+    :param message: Message to encode
+    :type message: dict
+    :return: Framed message
+    :rtype: bytes
+    """
+    arrays = []
+    body = _pack(message, arrays)
+    header = json.dumps({
+        "body": body,
+        "arrays": [(np.lib.format.dtype_to_descr(a.dtype), a.shape) for a in arrays],
+    }).encode()
+    payload = b"".join(a.tobytes() for a in arrays)
+    return _FRAME.pack(len(header), len(payload)) + header + payload
+
+
+def decode_message(header, payload):
+    """
+    Decode a message from its JSON header and binary payload. Arrays are views
+    of the (writable) payload, not copies.
+
+    :rtype: dict
+    """
+    header = json.loads(header)
+    payload = bytearray(payload)
+    arrays = []
+    offset = 0
+    for descr, shape in header["arrays"]:
+        dtype = np.lib.format.descr_to_dtype(descr)
+        count = int(np.prod(shape))
+        if count == 0:
+            arrays.append(np.empty(shape, dtype=dtype))
+            continue
+        arrays.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape))
+        offset += count * dtype.itemsize
+    return _unpack(header["body"], arrays)
+
+
+async def read_message(reader):
+    """Read one message from a stream, None at the end of the stream."""
+    try:
+        frame = await reader.readexactly(_FRAME.size)
+    except asyncio.IncompleteReadError:
+        return None
+    header_size, payload_size = _FRAME.unpack(frame)
+    header = await reader.readexactly(header_size)
+    payload = await reader.readexactly(payload_size)
+    return decode_message(header, payload)
+
+
+def _digest(obj):
+    """Stable hash of a nested structure with numpy arrays."""
+    return hashlib.sha1(encode_message(obj)).hexdigest()
+
+
+# ----------------------------------------------------------------------------
+# Worker processes
+# ----------------------------------------------------------------------------
+
+_MODEL_CACHE = OrderedDict()  # per worker process: model key -> (model, default parameters)
+MODEL_CACHE_SIZE = 8
+
+
+def _warm_up():
+    """Compile (or load from numba's cache) the kernels in a new worker process."""
+    model = WendlingModel(Cmat=np.array([[0.0, 1.0], [1.0, 0.0]]), Dmat=np.ones((2, 2)), seed=0)
+    model.params["duration"] = 1.0
+    model.run()
+    model.run_ensemble(2)
+
+
+def _ping():
+    return True
+
+
+def _get_model(model_args):
+    """
+    Model for the given constructor arguments with default parameters, reusing
+    the models (and their prepared connectomes) of previous jobs in this process.
+    """
+    key = _digest(model_args)
+    if key in _MODEL_CACHE:
+        _MODEL_CACHE.move_to_end(key)
+        model, defaults = _MODEL_CACHE[key]
+    else:
+        model = WendlingModel(**model_args)
+        defaults = dict(model.params)
+        _MODEL_CACHE[key] = (model, defaults)
+        if len(_MODEL_CACHE) > MODEL_CACHE_SIZE:
+            _MODEL_CACHE.popitem(last=False)
+
+    connectome = model.params.get("connectome_cache")
+    model.params = dotdict(dict(defaults))
+    model.params["connectome_cache"] = connectome
+    model.clearModelState()
+    return model
+
+
+def _sample_every(spec, dt):
+    sampling_dt = spec.get("sampling_dt")
+    return 1 if sampling_dt is None else max(1, int(round(sampling_dt / dt)))
+
+
+def _collect_outputs(model, outputs, sample_every, t_offset):
+    """Requested outputs of a finished run, with times shifted by `t_offset` (ms)."""
+    result = {}
+    for name in outputs:
+        if name in STATE_OUTPUTS:
+            if not model.params.get("record_states", True):
+                raise ValueError(f"Output '{name}' needs params['record_states'] = True.")
+            signal = model.result.v_pyr if name == "v_pyr" else model.outputs[name]
+            result[name] = signal[:, sample_every - 1::sample_every]
+            result["t"] = t_offset + model.outputs["t"][sample_every - 1::sample_every]
+        elif name in ("BOLD", "sensors"):
+            if name not in model.outputs:
+                raise ValueError(f"Output '{name}' was not computed, see params['fused_bold'] / params['leadfield'].")
+            result[name] = model.outputs[name][name]
+            result[f"t_{name}"] = t_offset + model.outputs[name][f"t_{name}"]
+        elif name == "events":
+            if "events" not in model.outputs:
+                raise ValueError("Output 'events' needs params['detect_events'] = True.")
+            events = model.outputs["events"]["events"].copy()
+            events["onset"] += t_offset
+            events["offset"] += t_offset
+            result[name] = events
+        else:
+            raise ValueError(f"Unknown output '{name}', choose from {STATE_OUTPUTS + STREAMED_OUTPUTS}.")
+    return result
+
+
+def _run_job(spec):
+    """
+    Run one job (or one chunk of a job) in a worker process.
+
+    :param spec: Job specification; ``state`` holds the continuation parameters
+        of the previous chunk and ``t_offset`` its end time (ms)
+    :type spec: dict
+    :return: Outputs and continuation parameters for the next chunk
+    :rtype: tuple
+    """
+    model = _get_model(spec.get("model", {}))
+    model.params.update(spec.get("params", {}))
+    model.params.update(spec.get("state") or {})
+    model.run(continue_run=True)  # keeps the final state as initial conditions
+    result = _collect_outputs(model, spec.get("outputs", ["v_pyr"]), _sample_every(spec, model.params["dt"]),
+                              spec.get("t_offset", 0.0))
+    state = {name: model.params[name] for name in CONTINUATION_PARAMS}
+    return result, state
+
+
+def _run_batch(spec, n_jobs):
+    """Run `n_jobs` identical jobs (see ``_batch_key``) as one ensemble in a worker process."""
+    model = _get_model(spec.get("model", {}))
+    model.params.update(spec.get("params", {}))
+    ensemble = model.run_ensemble(n_jobs, sampling_dt=spec.get("sampling_dt"))
+    return [{"t": ensemble["t"], "v_pyr": ensemble["v_pyr"][i]} for i in range(n_jobs)]
+
+
+def _batch_key(spec):
+    """
+    Key of the jobs that can be integrated together as one ensemble, None if the
+    job cannot be batched.
+
+    Batched jobs must be identical except for the noise: same model and
+    parameters, no chunks, only ``v_pyr`` requested and none of the outputs that
+    ensembles do not support. They draw their noise from one random stream, so
+    they are independent realisations but differ from the same job run alone.
+    Seeded jobs (``seed`` or ``rng_state``) are therefore never batched: they
+    get the noise stream of their seed, as a run of the model would.
+    """
+    params = spec.get("params", {})
+    if not spec.get("batchable", True) or spec.get("chunk_duration") is not None:
+        return None
+    if spec.get("model", {}).get("seed") is not None or params.get("seed") is not None:
+        return None
+    if params.get("rng_state") is not None:
+        return None
+    if list(spec.get("outputs", ["v_pyr"])) != ["v_pyr"] or params.get("record_states", True) is False:
+        return None
+    if params.get("fused_bold") or params.get("leadfield") is not None or params.get("detect_events"):
+        return None
+    return _digest({"model": spec.get("model", {}), "params": params, "sampling_dt": spec.get("sampling_dt")})
+
+
+# ----------------------------------------------------------------------------
+# Server
+# ----------------------------------------------------------------------------
+
+
+class _Job:
+    """A submitted job and the function sending messages to its client."""
+
+    __slots__ = ("id", "spec", "send")
+
+    def __init__(self, job_id, spec, send):
+        self.id = job_id
+        self.spec = spec
+        self.send = send
+
+
+class SimulationServer:
+    """
+    Asyncio server running simulation jobs on a pool of warmed-up worker processes.
+
+    Messages from clients: ``{"op": "submit", "job": id, "spec": {...}}`` and
+    ``{"op": "status"}``. For every job the server answers ``accepted``, one
+    ``result`` per chunk (``{"job", "chunk", "data"}``) and ``done``, or ``error``.
+    """
+
+    def __init__(self, path=None, host="127.0.0.1", port=0, n_workers=None, batch_window=0.05, max_batch=64,
+                 max_queue=1024):
+        """
+        :param path: Unix socket path, defaults to None (TCP on host:port)
+        :type path: str, optional
+        :param host: Host to listen on without a socket path, defaults to "127.0.0.1"
+        :type host: str, optional
+        :param port: TCP port, defaults to 0 (any free port, see ``address``)
+        :type port: int, optional
+        :param n_workers: Number of worker processes, defaults to None (number of CPUs)
+        :type n_workers: int, optional
+        :param batch_window: Time to wait for compatible jobs to batch (s), defaults to 0.05
+        :type batch_window: float, optional
+        :param max_batch: Maximum number of jobs per batch, defaults to 64
+        :type max_batch: int, optional
+        :param max_queue: Maximum number of queued batches, defaults to 1024
+        :type max_queue: int, optional
+        """
+        self.path = path
+        self.host = host
+        self.port = port
+        self.n_workers = n_workers or multiprocessing.cpu_count()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+
+        self._pool = None
+        self._server = None
+        self._queue = None
+        self._consumers = []
+        self._batches = {}
+
+    @property
+    def address(self):
+        """Unix socket path or (host, port) the server listens on."""
+        if self.path is not None:
+            return self.path
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        """Start the worker processes (compiling the kernels in each) and listen for clients."""
+        loop = asyncio.get_running_loop()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm_up
+        )
+        # start (and warm up) all workers before accepting jobs
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.n_workers)))
+
+        self._queue = asyncio.Queue(self.max_queue)
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.n_workers)]
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=self.host, port=self.port)
+        logging.info(f"Wendling simulation service listening on {self.address} with {self.n_workers} workers")
+
+    async def serve_forever(self):
+        """Start the server (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Stop accepting clients, cancel queued jobs and shut down the workers."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for consumer in self._consumers:
+            consumer.cancel()
+        self._consumers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader, writer):
+        """Serve one client connection."""
+        lock = asyncio.Lock()
+
+        async def send(message):
+            try:
+                async with lock:
+                    writer.write(encode_message(message))
+                    await writer.drain()
+            except ConnectionError:
+                pass  # client is gone, drop its results
+
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                op = message.get("op")
+                if op == "submit":
+                    job = _Job(message["job"], message.get("spec", {}), send)
+                    await send({"op": "accepted", "job": job.id})
+                    self._submit(job)
+                elif op == "status":
+                    await send({"op": "status", "queued": self._queue.qsize(), "workers": self.n_workers,
+                                "batching": sum(len(jobs) for jobs in self._batches.values())})
+                else:
+                    await send({"op": "error", "job": message.get("job"), "message": f"Unknown operation {op!r}."})
+        except (asyncio.CancelledError, ConnectionError):
+            pass  # server stopping or client gone
+        finally:
+            writer.close()
+
+    def _submit(self, job):
+        """Queue a job, or collect it into the pending batch of compatible jobs."""
+        key = _batch_key(job.spec) if self.max_batch > 1 else None
+        if key is None:
+            self._enqueue([job])
+            return
+        pending = self._batches.setdefault(key, [])
+        pending.append(job)
+        if len(pending) == 1:
+            asyncio.get_running_loop().call_later(self.batch_window, self._flush, key)
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+
+    def _flush(self, key):
+        jobs = self._batches.pop(key, None)
+        if jobs:
+            self._enqueue(jobs)
+
+    def _enqueue(self, jobs):
+        try:
+            self._queue.put_nowait(jobs)
+        except asyncio.QueueFull:
+            for job in jobs:
+                asyncio.create_task(job.send({"op": "error", "job": job.id, "message": "Job queue is full."}))
+
+    async def _consume(self):
+        """Take batches from the queue and run them on the worker pool."""
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = await self._queue.get()
+            try:
+                if len(jobs) > 1:
+                    results = await loop.run_in_executor(self._pool, _run_batch, jobs[0].spec, len(jobs))
+                    for job, data in zip(jobs, results):
+                        await job.send({"op": "result", "job": job.id, "chunk": 0, "data": data})
+                        await job.send({"op": "done", "job": job.id})
+                else:
+                    await self._run_chunks(loop, jobs[0])
+            except Exception as e:
+                for job in jobs:
+                    await job.send({"op": "error", "job": job.id, "message": f"{type(e).__name__}: {e}"})
+            finally:
+                self._queue.task_done()
+
+    async def _run_chunks(self, loop, job):
+        """Run a job, chunk by chunk if ``chunk_duration`` is set, streaming every chunk."""
+        spec = job.spec
+        params = spec.get("params", {})
+        chunk_duration = spec.get("chunk_duration")
+        if chunk_duration is None:
+            chunks = [None]
+        else:
+            if "duration" not in params:
+                raise ValueError("Chunked jobs need params['duration'].")
+            n_chunks = math.ceil(round(params["duration"] / chunk_duration, 6))
+            chunks = [min(chunk_duration, params["duration"] - i * chunk_duration) for i in range(n_chunks)]
+
+        state = None
+        for i, duration in enumerate(chunks):
+            chunk_spec = dict(spec, state=state, t_offset=0.0 if duration is None else i * chunk_duration)
+            if duration is not None:
+                chunk_spec["params"] = dict(params, duration=duration)
+            data, state = await loop.run_in_executor(self._pool, _run_job, chunk_spec)
+            await job.send({"op": "result", "job": job.id, "chunk": i, "data": data})
+        await job.send({"op": "done", "job": job.id})
+
+
+# ----------------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------------
+
+
+def merge_chunks(chunks):
+    """
+    Concatenate the results of the chunks of one job along time.
+
+    :param chunks: Results of the chunks, in order
+    :type chunks: list
+    :return: Result of the whole job
+    :rtype: dict
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    merged = {}
+    for name in chunks[0]:
+        if name == "events":
+            # events in progress at the end of a chunk are reported again when they end
+            parts = [c[name][~np.isnan(c[name]["offset"])] for c in chunks[:-1]] + [chunks[-1][name]]
+            merged[name] = np.concatenate(parts)
+        else:
+            merged[name] = np.concatenate([c[name] for c in chunks], axis=-1)
+    return merged
+
+
+class SimulationClient:
+    """
+    Thin asyncio client of a ``SimulationServer``.
+
+    Example:
+        async with SimulationClient(path="/tmp/wendling.sock") as client:
+            jobs = [await client.submit(params={"B": B, "duration": 2000}) for B in range(10, 50)]
+            results = [await client.result(job) for job in jobs]
+    """
+
+    def __init__(self, path=None, host="127.0.0.1", port=None):
+        """
+        :param path: Unix socket path of the server, defaults to None (TCP)
+        :type path: str, optional
+        :param host: Server host, defaults to "127.0.0.1"
+        :type host: str, optional
+        :param port: Server TCP port, defaults to None
+        :type port: int, optional
+        """
+        self.path = path
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+        self._listener = None
+        self._inbox = {}
+        self._next_job = 0
+
+    async def connect(self):
+        """Connect to the server."""
+        if self.path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._listener = asyncio.create_task(self._listen())
+        return self
+
+    async def close(self):
+        """Close the connection."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _listen(self):
+        """Route incoming messages to the inbox of their job."""
+        while True:
+            message = await read_message(self._reader)
+            if message is None:
+                for inbox in self._inbox.values():
+                    inbox.put_nowait({"op": "error", "message": "Connection to the server closed."})
+                break
+            self._mailbox(message.get("job")).put_nowait(message)
+
+    def _mailbox(self, job):
+        if job not in self._inbox:
+            self._inbox[job] = asyncio.Queue()
+        return self._inbox[job]
+
+    async def _send(self, message):
+        self._writer.write(encode_message(message))
+        await self._writer.drain()
+
+    async def submit(self, params=None, outputs=("v_pyr",), sampling_dt=None, chunk_duration=None, batchable=True,
+                     **model_args):
+        """
+        Submit a simulation job.
+
+        :param params: Parameters overriding the model defaults (e.g. duration, B, schedules), defaults to None
+        :type params: dict, optional
+        :param outputs: Outputs to return: "v_pyr", "y0" ... "y9", "BOLD", "sensors", "events", defaults to ("v_pyr",)
+        :type outputs: tuple, optional
+        :param sampling_dt: Sampling interval of v_pyr / state outputs (ms), defaults to None (dt)
+        :type sampling_dt: float, optional
+        :param chunk_duration: Run and stream the job in chunks of this duration (ms), defaults to None
+        :type chunk_duration: float, optional
+        :param batchable: Allow integrating the job together with compatible jobs, defaults to True
+        :type batchable: bool, optional
+        :param model_args: WendlingModel arguments (Cmat, Dmat, seed, sigmoid_type, random_init, heterogeneity)
+        :return: Job id
+        :rtype: int
+        """
+        unknown = set(model_args) - set(MODEL_ARGS)
+        if unknown:
+            raise ValueError(f"Unknown model arguments {sorted(unknown)}, choose from {MODEL_ARGS}.")
+        job = self._next_job
+        self._next_job += 1
+        spec = {
+            "model": model_args,
+            "params": params or {},
+            "outputs": list(outputs),
+            "sampling_dt": sampling_dt,
+            "chunk_duration": chunk_duration,
+            "batchable": batchable,
+        }
+        self._mailbox(job)
+        await self._send({"op": "submit", "job": job, "spec": spec})
+        return job
+
+    async def stream(self, job):
+        """
+        Results of a job as they arrive, one per chunk.
+
+        :param job: Job id returned by ``submit``
+        :type job: int
+        :raises RuntimeError: If the job failed on the server
+        """
+        inbox = self._mailbox(job)
+        try:
+            while True:
+                message = await inbox.get()
+                op = message["op"]
+                if op == "result":
+                    yield message["data"]
+                elif op == "done":
+                    return
+                elif op == "error":
+                    raise RuntimeError(f"Simulation job {job} failed: {message['message']}")
+        finally:
+            self._inbox.pop(job, None)
+
+    async def result(self, job):
+        """
+        Wait for a job and return its result, chunks concatenated along time.
+
+        :param job: Job id returned by ``submit``
+        :type job: int
+        :rtype: dict
+        """
+        return merge_chunks([chunk async for chunk in self.stream(job)])
+
+    async def run(self, **kwargs):
+        """Submit a job (arguments as in ``submit``) and wait for its result."""
+        return await self.result(await self.submit(**kwargs))
+
+    async def status(self):
+        """
+        Queue status of the server.
+
+        :return: ``queued`` batches, ``batching`` jobs waiting for a batch and number of ``workers``
+        :rtype: dict
+        """
+        inbox = self._mailbox(None)
+        await self._send({"op": "status"})
+        while True:
+            message = await inbox.get()
+            if message["op"] == "status":
+                return message
+
+
+def main():
+    """Command line entry point: run a simulation server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local Wendling simulation service")
+    parser.add_argument("--socket", help="Unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--batch-window", type=float, default=0.05, help="Seconds to wait for compatible jobs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = SimulationServer(path=args.socket, host=args.host, port=args.port, n_workers=args.workers,
+                              batch_window=args.batch_window)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
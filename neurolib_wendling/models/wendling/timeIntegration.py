@@ -1,32 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import numba
 from numba import njit
 
-from neurolib.utils import model_utils as mu
+from .connectome import get_prepared_connectome
+from .events import EVENT_BLOCK, N_EVENT_FIELDS, _detect_step, finish_events, prepare_event_detector
+from .paramtable import (
+    P_A, P_B, P_G, P_a, P_b, P_g, P_C1, P_C2, P_C3, P_C4, P_C5, P_C6, P_C7,
+    P_e0, P_v0, P_r, P_p_mean, P_p_sigma, pack_local_params,
+)
+from .schedules import prepare_schedules
+
+# Initial condition parameters, in state variable order (y0 ... y9)
+INIT_VARS = [f"y{i}_init" for i in range(10)]
+
 
-# Backward compatibility: Add computeDelayMatrix if not available
-# PyPI neurolib 0.6.2 has incomplete model_utils.py (missing this function)
-# This patch ensures compatibility with all neurolib versions
-if not hasattr(mu, 'computeDelayMatrix'):
-    def _computeDelayMatrix(lengthMat, signalV, segmentLength=1):
-        """
-        Compute delay matrix from fiber length matrix and signal velocity.
-        Backward compatibility for older neurolib versions.
-        
-        :param lengthMat: Connection length matrix in segments
-        :param signalV: Signal velocity in m/s
-        :param segmentLength: Length of single segment in mm
-        :return: Delay matrix in ms
-        """
-        normalizedLenMat = lengthMat * segmentLength
-        if signalV > 0:
-            Dmat = normalizedLenMat / signalV  # Delays in ms
-        else:
-            Dmat = lengthMat * 0.0
-        return Dmat
-    
-    mu.computeDelayMatrix = _computeDelayMatrix
-    
 def timeIntegration(params):
     """Time integration for Wendling Neural Mass Model.
     
@@ -35,184 +24,434 @@ def timeIntegration(params):
     
     :param params: Parameter dictionary of the model
     :type params: dict
-    :return: Integrated activity variables (t, y0, y1, ..., y9)
-    :rtype: tuple of numpy.ndarray
+    :return: Integrated activity variables (t, y0, y1, ..., y9), followed by a
+        dictionary of outputs computed inside the kernel (e.g. fused BOLD) and
+        the seed of the noise stream for the next run (``rng_state``)
+    :rtype: tuple
     """
     
     dt = params["dt"]  # Time step (ms)
     duration = params["duration"]  # Simulation duration (ms)
-    RNGseed = params["seed"]  # Random seed
     
-    # Set random seed if provided
-    if RNGseed is not None:
-        np.random.seed(RNGseed)
+    # Optional instrumentation (see profiling.py), None when disabled
+    profiler = params.get("profiler")
+    if profiler is not None:
+        profiler.start_run(N=len(params["Cmat"]), n_steps=int(round(duration / dt)), dt=dt)
+    
+    record_states = params.get("record_states", True)
+    setup = _prepare_integration(params, record_states=record_states)
+    N = setup["N"]
+    n_steps = setup["n_steps"]
+    startind = setup["startind"]
+    ys = setup["ys"]
+    
+    # Fused Balloon-Windkessel BOLD (bold_every = 0 disables it in the kernel)
+    fused_bold = params.get("fused_bold", False)
+    if fused_bold:
+        bold_every = int(round(params.get("bold_sampling_dt", 2000.0) / dt))
+        bold_phase = int(params.get("bold_phase", 0))
+        bold_state = params.get("bold_init")
+        if bold_state is None:
+            # Same initial hemodynamic state as neurolib's BOLDModel
+            bold_state = np.ones((4, N), dtype=np.float64)
+        bold_state = np.array(bold_state, dtype=np.float64)
+    else:
+        bold_every = 0
+        bold_phase = 0
+        bold_state = np.ones((4, N), dtype=np.float64)
+    bold_scale = float(params.get("bold_input_scale", 0.05))
+    
+    # Streaming forward projection v_pyr -> sensors (sensor_every = 0 disables it)
+    leadfield = params.get("leadfield")
+    if leadfield is not None:
+        leadfield = np.ascontiguousarray(leadfield, dtype=np.float64)
+        if leadfield.ndim != 2 or leadfield.shape[1] != N:
+            raise ValueError(f"Lead-field must have shape (channels, N={N}), got {leadfield.shape}.")
+        sampling_dt = params.get("sensor_sampling_dt")
+        sensor_every = 1 if sampling_dt is None else int(round(sampling_dt / dt))
+        sensor_phase = int(params.get("sensor_phase", 0))
+    else:
+        leadfield = np.zeros((0, N), dtype=np.float64)
+        sensor_every = 0
+        sensor_phase = 0
+    
+    # Online spike / seizure detection on v_pyr (see events.py)
+    detect_events = params.get("detect_events", False)
+    event_settings, event_state = prepare_event_detector(params, N, dt)
+    
+    kernel_args = (
+        ys, record_states, n_steps, setup["dt_s"], N, setup["node_params"],
+        *setup["edges"], params["K_gl"], setup["max_delay"],
+        bold_state, bold_every, bold_phase, bold_scale,
+        leadfield, sensor_every, sensor_phase,
+        detect_events, event_settings, event_state,
+        *setup["schedules"]
+    )
+    
+    # Independent node groups (connected components, or all nodes if K_gl == 0)
+    # integrated in parallel threads, see PreparedConnectome.partition
+    groups = setup["groups"]
+    
+    method = params.get("integration_method")
+    n_parts = int(params.get("partitions", 1) or 1)
+    
+    if profiler is not None:
+        profiler.lap("prepare")
+        if method not in ("dopri5", "multirate") and n_parts <= 1:
+            # Zero-step call: compiles the kernel (or loads it from cache) without
+            # consuming random numbers, so compilation is timed separately. The
+            # other engines compile their own kernels within the "kernel" phase.
+            _integrate_wendling_unified(ys, False, 0, *kernel_args[3:])
+            profiler.lap("compile")
+    
+    # Start of the kernel noise stream (see kernel_seed); numba's random state is
+    # per thread, so runs in different threads never share a stream
+    rng_state = kernel_seed(params)
+    _seed_kernel_rng(rng_state)
+    setup["seed"] = rng_state
+    
+    if method == "dopri5":
+        # Adaptive deterministic engine for noise-free, delay-free runs
+        from .dopri import integrate_dopri5
+        tail = integrate_dopri5(params, setup)
+        bold = sensors = events = None
+    elif method == "multirate":
+        # Fast dendritic inhibition micro-stepped inside slow macro steps
+        from .multirate import integrate_multirate
+        tail = integrate_multirate(params, setup)
+        bold = sensors = events = None
+    elif n_parts > 1:
+        # Nodes split across worker processes exchanging delayed boundary states
+        from .partitioned import integrate_partitioned
+        tail = integrate_partitioned(params, setup, n_parts)
+        bold = sensors = events = None
+    elif len(groups) > 1:
+        tail, bold, bold_state, sensors, events, event_state = _integrate_groups(groups, setup["seed"], kernel_args)
+    else:
+        # Call unified integration (writes the trajectory into ys when recording)
+        tail, bold, bold_state, sensors, events, event_state = _integrate_wendling_unified(*kernel_args)
+    
+    # Seed for the next run, drawn from the stream (and reseeding it), so the
+    # stream position is a single integer
+    next_rng_state = _branch_kernel_rng()
+    
+    if profiler is not None:
+        profiler.lap("kernel")
+    
+    if record_states:
+        t = np.arange(1, n_steps + 1) * dt  # Time vector (ms)
+    else:
+        # Only the last startind steps are kept: enough to continue the run
+        ys = tail
+        t = np.arange(n_steps - startind + 1, n_steps + 1) * dt
+    
+    # Per-variable views (N, time) of the contiguous state array
+    return_arrays = tuple(ys[i] for i in range(10))
+    
+    # Outputs computed inside the kernel, stored by WendlingModel.integrate
+    streamed = {}
+    if fused_bold:
+        streamed["BOLD"] = _streamed_output(bold, bold_every, bold_phase, n_steps, dt, state=bold_state)
+    if sensor_every > 0:
+        streamed["sensors"] = _streamed_output(sensors, sensor_every, sensor_phase, n_steps, dt)
+    if detect_events:
+        events, event_state = finish_events(events, event_state, event_settings, n_steps, dt)
+        streamed["events"] = {"events": events, "state": event_state, "duration": n_steps * dt}
+    
+    streamed["rng_state"] = next_rng_state
+    
+    # the "copy" phase is closed by WendlingModel.integrate once the outputs are stored
+    # Return time vector and all state variables (including initial conditions),
+    # followed by the streamed outputs (ignored by neurolib's Model.integrate)
+    return (t,) + return_arrays + (streamed,)
+
+
+def timeIntegrationEnsemble(params, n_trials, sample_every=1, reducers=None, keep_trials=True, batch_size=None):
+    """Integrate `n_trials` noise realisations of the same model in one vectorised run.
+    
+    All trials share the parameters, connectome, delays, initial conditions and
+    parameter schedules; the setup is done once and every kernel step updates
+    all trials. Only the pyramidal output v_pyr = y1 - y2 - y3 is returned.
+    
+    Trials are integrated in batches of `batch_size`. Reducers are applied to
+    every batch and averaged over trials, so with ``keep_trials=False`` memory
+    does not grow with the number of trials.
+    
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param n_trials: Number of independent noise realisations
+    :type n_trials: int
+    :param sample_every: Store v_pyr every `sample_every` integration steps, defaults to 1
+    :type sample_every: int, optional
+    :param reducers: Mapping from name to a function ``f(v_pyr, dt)`` that returns one value (array) per trial
+        for a batch ``v_pyr`` of shape (trials, N, time) sampled every ``dt`` ms, see ensemble.py, defaults to None
+    :type reducers: dict, optional
+    :param keep_trials: Return the per-trial signals, defaults to True
+    :type keep_trials: bool, optional
+    :param batch_size: Trials integrated per kernel call, defaults to None (all trials at once)
+    :type batch_size: int, optional
+    :return: ``t`` (ms), ``v_pyr`` (trials, N, time) or None, ``reduced`` (trial means of the reducers), ``n_trials``
+    :rtype: dict
+    """
+    if params.get("fused_bold") or params.get("leadfield") is not None or params.get("detect_events"):
+        raise ValueError("Fused BOLD, lead-field and event outputs are not supported in ensemble runs.")
+    if n_trials < 1 or sample_every < 1:
+        raise ValueError("n_trials and sample_every must be positive.")
+    
+    dt = params["dt"]
+    setup = _prepare_integration(params, record_states=False)
+    n_steps = setup["n_steps"]
+    batch_size = n_trials if batch_size is None else max(1, min(int(batch_size), n_trials))
+    
+    reducers = reducers or {}
+    sums = {}
+    batches = []
+    # The numba RNG is seeded once, later batches continue the same stream
+    seed = kernel_seed(params)
+    for first in range(0, n_trials, batch_size):
+        n_batch = min(batch_size, n_trials - first)
+        v_pyr = _integrate_wendling_ensemble(
+            setup["ys"], n_batch, n_steps, sample_every, seed, setup["dt_s"], setup["N"], setup["node_params"],
+            *setup["edges"], params["K_gl"], setup["max_delay"],
+            *setup["schedules"]
+        )
+        seed = -1
+        for name, reducer in reducers.items():
+            value = np.sum(reducer(v_pyr, sample_every * dt), axis=0)
+            sums[name] = value if name not in sums else sums[name] + value
+        if keep_trials:
+            batches.append(v_pyr)
+    
+    return {
+        "t": np.arange(1, n_steps // sample_every + 1) * sample_every * dt,
+        "v_pyr": np.concatenate(batches, axis=0) if keep_trials else None,
+        "reduced": {name: value / n_trials for name, value in sums.items()},
+        "n_trials": n_trials,
+    }
+
+
+def _prepare_integration(params, record_states=True):
+    """
+    Setup shared by all integration kernels: prepared connectome (see connectome.py),
+    initial conditions, unit conversion, the local parameter table and schedules.
+    
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :param record_states: Allocate the state array for the full trajectory, defaults to True
+    :type record_states: bool, optional
+    :return: Kernel inputs (``ys``, ``N``, ``n_steps``, ``startind``, ``max_delay``, ``node_params``, ...)
+    :rtype: dict
+    """
+    dt = params["dt"]  # Time step (ms)
+    duration = params["duration"]  # Simulation duration (ms)
     
-    # ------------------------------------------------------------------------
-    # Local parameters
-    # ------------------------------------------------------------------------
-    A = params["A"]
-    B = params["B"]
-    G = params["G"]
-    a = params["a"]
-    b = params["b"]
-    g = params["g"]
-    C1 = params["C1"]
-    C2 = params["C2"]
-    C3 = params["C3"]
-    C4 = params["C4"]
-    C5 = params["C5"]
-    C6 = params["C6"]
-    C7 = params["C7"]
-    p_mean = params["p_mean"]
-    p_sigma = params["p_sigma"]
-    e0 = params["e0"]
-    v0 = params["v0"]
-    r = params["r"]
-    sigmoid_type = params.get("sigmoid_type", "wendling2002")
     integration_method = params.get("integration_method", "rk4")
     
     # ------------------------------------------------------------------------
     # Global coupling parameters
     # ------------------------------------------------------------------------
-    Cmat = params["Cmat"]
-    N = len(Cmat)  # Number of nodes
-    K_gl = params["K_gl"]  # Global coupling strength
-    lengthMat = params["lengthMat"]
-    signalV = params["signalV"]
-    
-    if N == 1:
-        Dmat = np.zeros((N, N))
-    else:
-        # Compute delay matrix
-        Dmat = mu.computeDelayMatrix(lengthMat, signalV)
-        Dmat[np.eye(len(Dmat)) == 1] = np.zeros(len(Dmat))
+    # Normalised weights, delays in steps and edge lists, cached across runs
+    connectome = get_prepared_connectome(params)
+    N = connectome.N  # Number of nodes
     
-    Dmat_ndt = np.around(Dmat / dt).astype(int)  # Delay matrix in multiples of dt
+    # Without coupling the kernels get no edges and skip the coupling entirely
+    coupled = params["K_gl"] != 0 and connectome.n_edges > 0
+    edges = connectome.kernel_args if coupled else connectome.partition(1, coupled=False)[0][1]
+    
+    # Split into independent groups of components for parallel integration
+    workers = int(params.get("component_workers", 1) or 1)
+    groups = connectome.partition(workers, coupled=coupled) if workers > 1 else []
     
     # ------------------------------------------------------------------------
     # Initialization
     # ------------------------------------------------------------------------
-    t = np.arange(1, round(duration, 6) / dt + 1) * dt  # Time vector (ms)
+    n_steps = int(np.ceil(round(duration, 6) / dt))  # Same length as np.arange(1, duration / dt + 1)
     
-    max_global_delay = int(np.max(Dmat_ndt))
+    max_global_delay = connectome.max_delay
     startind = max_global_delay + 1  # Start index after initial conditions
     
-    # State variable arrays
-    y0_arr = np.zeros((N, startind + len(t)))
-    y1_arr = np.zeros((N, startind + len(t)))
-    y2_arr = np.zeros((N, startind + len(t)))
-    y3_arr = np.zeros((N, startind + len(t)))
-    y4_arr = np.zeros((N, startind + len(t)))
-    y5_arr = np.zeros((N, startind + len(t)))
-    y6_arr = np.zeros((N, startind + len(t)))
-    y7_arr = np.zeros((N, startind + len(t)))
-    y8_arr = np.zeros((N, startind + len(t)))
-    y9_arr = np.zeros((N, startind + len(t)))
+    # State array (10, N, time): initial conditions (history of length startind)
+    # followed by the trajectory. Without recording only the history is allocated
+    # and the kernel keeps the delayed states in a ring buffer.
+    n_cols = startind + n_steps if record_states else startind
+    ys = np.zeros((10, N, n_cols), dtype=np.float64)
     
     # Set initial conditions
-    if np.shape(params["y0_init"])[1] == 1:
-        y0_arr[:, :startind] = np.dot(params["y0_init"], np.ones((1, startind)))
-        y1_arr[:, :startind] = np.dot(params["y1_init"], np.ones((1, startind)))
-        y2_arr[:, :startind] = np.dot(params["y2_init"], np.ones((1, startind)))
-        y3_arr[:, :startind] = np.dot(params["y3_init"], np.ones((1, startind)))
-        y4_arr[:, :startind] = np.dot(params["y4_init"], np.ones((1, startind)))
-        y5_arr[:, :startind] = np.dot(params["y5_init"], np.ones((1, startind)))
-        y6_arr[:, :startind] = np.dot(params["y6_init"], np.ones((1, startind)))
-        y7_arr[:, :startind] = np.dot(params["y7_init"], np.ones((1, startind)))
-        y8_arr[:, :startind] = np.dot(params["y8_init"], np.ones((1, startind)))
-        y9_arr[:, :startind] = np.dot(params["y9_init"], np.ones((1, startind)))
-    else:
-        y0_arr[:, :startind] = params["y0_init"][:, -startind:]
-        y1_arr[:, :startind] = params["y1_init"][:, -startind:]
-        y2_arr[:, :startind] = params["y2_init"][:, -startind:]
-        y3_arr[:, :startind] = params["y3_init"][:, -startind:]
-        y4_arr[:, :startind] = params["y4_init"][:, -startind:]
-        y5_arr[:, :startind] = params["y5_init"][:, -startind:]
-        y6_arr[:, :startind] = params["y6_init"][:, -startind:]
-        y7_arr[:, :startind] = params["y7_init"][:, -startind:]
-        y8_arr[:, :startind] = params["y8_init"][:, -startind:]
-        y9_arr[:, :startind] = params["y9_init"][:, -startind:]
-    
-    # Normalize connectivity matrix
-    if N > 1:
-        Cmat_normalized = Cmat / np.max(Cmat) if np.max(Cmat) > 0 else Cmat
-    else:
-        Cmat_normalized = Cmat
+    for i, init_var in enumerate(INIT_VARS):
+        y_init = np.asarray(params[init_var], dtype=np.float64).reshape(N, -1)
+        if y_init.shape[1] == 1:
+            ys[i, :, :startind] = y_init
+        else:
+            ys[i, :, :startind] = y_init[:, -startind:]
     
     # ------------------------------------------------------------------------
     # Integration (Unified Euler-Maruyama only)
     # ------------------------------------------------------------------------
     if integration_method == "rk4":
         raise ValueError("RK4 integration has been removed. Use integration_method='euler' instead.")
+    if integration_method not in ("euler", "dopri5", "multirate"):
+        raise ValueError(f"Unknown integration_method '{integration_method}', choose 'euler', 'dopri5' or 'multirate'.")
     
-    # Use unified Euler-Maruyama integration (same core as _integrate_wendling_simple)
     # Convert units
     dt_s = dt / 1000.0  # ms to seconds
-    a_s = a * 1000.0    # 1/ms to 1/s
-    b_s = b * 1000.0
-    g_s = g * 1000.0
-    n_steps = len(t)
-    
-    # Prepare initial conditions (N, 10)
-    y0_init_arr = np.zeros((N, 10), dtype=np.float64)
-    for i in range(N):
-        y0_init_arr[i, 0] = y0_arr[i, startind-1]
-        y0_init_arr[i, 1] = y1_arr[i, startind-1]
-        y0_init_arr[i, 2] = y2_arr[i, startind-1]
-        y0_init_arr[i, 3] = y3_arr[i, startind-1]
-        y0_init_arr[i, 4] = y4_arr[i, startind-1]
-        y0_init_arr[i, 5] = y5_arr[i, startind-1]
-        y0_init_arr[i, 6] = y6_arr[i, startind-1]
-        y0_init_arr[i, 7] = y7_arr[i, startind-1]
-        y0_init_arr[i, 8] = y8_arr[i, startind-1]
-        y0_init_arr[i, 9] = y9_arr[i, startind-1]
-    
-    # Vectorize parameters (convert scalar to array if needed)
-    # This must be done before calling JIT function to avoid numba issues
-    A_vec = np.atleast_1d(A).astype(np.float64)
-    B_vec = np.atleast_1d(B).astype(np.float64)
-    G_vec = np.atleast_1d(G).astype(np.float64)
-    p_mean_vec = np.atleast_1d(p_mean).astype(np.float64)
-    
-    # If scalar (length 1), expand to N nodes
-    if len(A_vec) == 1 and N > 1:
-        A_vec = np.full(N, A_vec[0], dtype=np.float64)
-        B_vec = np.full(N, B_vec[0], dtype=np.float64)
-        G_vec = np.full(N, G_vec[0], dtype=np.float64)
-        p_mean_vec = np.full(N, p_mean_vec[0], dtype=np.float64)
-    
-    # Call unified integration
-    result = _integrate_wendling_unified(
-        y0_init_arr, n_steps, dt_s, N,
-        A_vec, a_s, B_vec, b_s, G_vec, g_s,
-        params["C"], C1, C2, C3, C4, C5, C6, C7,
-        e0, v0, r, p_mean_vec, p_sigma,
-        Cmat_normalized, K_gl, Dmat_ndt, max_global_delay
-    )
     
-    # Convert result (N, 10, n_steps) to separate arrays
-    for i in range(N):
-        y0_arr[i, startind:] = result[i, 0, :]
-        y1_arr[i, startind:] = result[i, 1, :]
-        y2_arr[i, startind:] = result[i, 2, :]
-        y3_arr[i, startind:] = result[i, 3, :]
-        y4_arr[i, startind:] = result[i, 4, :]
-        y5_arr[i, startind:] = result[i, 5, :]
-        y6_arr[i, startind:] = result[i, 6, :]
-        y7_arr[i, startind:] = result[i, 7, :]
-        y8_arr[i, startind:] = result[i, 8, :]
-        y9_arr[i, startind:] = result[i, 9, :]
+    # Local parameters: scalars and per-node arrays in any combination, packed
+    # into one (N, n_params) table in kernel units (see paramtable.py)
+    node_params = pack_local_params(params, N)
+    
+    # Time-varying parameters (see schedules.py)
+    sched_ids, sched_offsets, sched_t, sched_v = prepare_schedules(params.get("schedules"), N, n_steps, dt)
+    sched_t0 = params.get("schedule_t0", 0.0) / dt  # Run start on the schedule timeline (steps)
+    
+    return {
+        "ys": ys,
+        "N": N,
+        "n_steps": n_steps,
+        "startind": startind,
+        "max_delay": max_global_delay,
+        "dt_s": dt_s,
+        "node_params": node_params,
+        "edges": edges,
+        "groups": groups,
+        "schedules": (sched_ids, sched_offsets, sched_t, sched_v, sched_t0),
+    }
+
+
+def fresh_seed():
+    """Seed from OS entropy, for runs without a seed."""
+    return int(np.random.SeedSequence().generate_state(1)[0] >> 1)
+
+
+def kernel_seed(params):
+    """
+    Seed of the kernel noise stream of a run: where a continued run (or a burn-in,
+    see burnin.py) left it (``rng_state``), else ``seed``, else fresh entropy.
     
-    return_arrays = (y0_arr, y1_arr, y2_arr, y3_arr, y4_arr,
-                    y5_arr, y6_arr, y7_arr, y8_arr, y9_arr)
+    Every run seeds the random state of its thread with it right before the
+    kernel, so the noise of a run does not depend on other runs, also when
+    several models are integrated concurrently in a thread pool.
     
-    # Return time vector and all state variables (including initial conditions)
-    return (t,) + return_arrays
+    :param params: Parameter dictionary of the model
+    :type params: dict
+    :rtype: int
+    """
+    seed = params.get("rng_state")
+    if seed is None:
+        seed = params.get("seed")
+    return fresh_seed() if seed is None else int(seed)
+
+
+def _integrate_groups(groups, seed, kernel_args):
+    """
+    Integrate independent node groups as separate problems in parallel threads
+    (the kernel releases the GIL) and assemble the results of the full network.
+    
+    Every group gets its slice of all per-node inputs and its own edge arrays; the
+    sensor projection is linear, so the sensor signals of the groups are summed.
+    The random stream of group ``i`` is seeded with ``seed + i``, so results are
+    reproducible for a given number of groups (but differ from a run integrated
+    in one piece).
+    
+    :param groups: Node indices and edge arrays per group (PreparedConnectome.partition)
+    :type groups: list
+    :param seed: Seed of the run (see kernel_seed)
+    :type seed: int
+    :param kernel_args: Arguments of ``_integrate_wendling_unified`` for the full network
+    :type kernel_args: tuple
+    :return: tail, bold, bold_state, sensors, events, event_state as returned by the kernel
+    :rtype: tuple
+    """
+    (ys, record, n_steps, dt_s, N, node_params, _, _, _, _, _, K_gl, max_delay,
+     bold_state, bold_every, bold_phase, bold_scale, leadfield, sensor_every, sensor_phase,
+     detect_events, event_settings, event_state,
+     sched_ids, sched_offsets, sched_t, sched_v, sched_t0) = kernel_args
+    
+    def run_group(i):
+        nodes, edges = groups[i]
+        _seed_kernel_rng(seed + i)  # random state of this thread
+        group_ys = ys[:, nodes]
+        result = _integrate_wendling_unified(
+            group_ys, record, n_steps, dt_s, len(nodes), node_params[nodes],
+            *edges, K_gl, max_delay,
+            bold_state[:, nodes], bold_every, bold_phase, bold_scale,
+            np.ascontiguousarray(leadfield[:, nodes]), sensor_every, sensor_phase,
+            detect_events, event_settings, event_state[nodes],
+            sched_ids, sched_offsets, sched_t, np.ascontiguousarray(sched_v[nodes]), sched_t0
+        )
+        return group_ys, result
+    
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        results = list(pool.map(run_group, range(len(groups))))
+    
+    tail = np.empty((10, N, max_delay + 1), dtype=np.float64)
+    bold = hemo = sensors = None
+    events = []
+    detector = np.empty_like(event_state)
+    for (nodes, _), (group_ys, (g_tail, g_bold, g_hemo, g_sensors, g_events, g_detector)) in zip(groups, results):
+        if bold is None:
+            bold = np.empty((N, g_bold.shape[1]), dtype=np.float64)
+            hemo = np.empty((4, N), dtype=np.float64)
+            sensors = np.zeros_like(g_sensors)
+        if record:
+            ys[:, nodes] = group_ys
+        tail[:, nodes] = g_tail
+        bold[nodes] = g_bold
+        hemo[:, nodes] = g_hemo
+        sensors += g_sensors
+        g_events[:, 0] = nodes[g_events[:, 0].astype(np.int64)]  # local to network node index
+        events.append(g_events)
+        detector[nodes] = g_detector
+    return tail, bold, hemo, sensors, np.concatenate(events), detector
+
+
+def _streamed_output(data, every, phase, n_steps, dt, state=None):
+    """
+    Describe an output that was sampled inside the kernel every `every` steps.
+    
+    :param data: Sampled output (channels, samples)
+    :type data: numpy.ndarray
+    :param every: Sampling interval in steps
+    :type every: int
+    :param phase: Steps since the last sample at the start of the run
+    :type phase: int
+    :param n_steps: Number of integrated steps
+    :type n_steps: int
+    :param dt: Integration time step (ms)
+    :type dt: float
+    :param state: State of the output model to continue the next chunk with, defaults to None
+    :type state: numpy.ndarray, optional
+    :return: Sample times relative to the start of the run (``t``), ``data``, ``phase`` at the end
+        of the run, ``sampling_dt``, ``duration`` and ``state``
+    :rtype: dict
+    """
+    return {
+        "t": (every - phase + every * np.arange(data.shape[1])) * dt,
+        "data": data,
+        "phase": (phase + n_steps) % every,
+        "sampling_dt": every * dt,
+        "duration": n_steps * dt,
+        "state": state,
+    }
 
 
 # ==================== Unified Euler-Maruyama Integration ====================
 # Direct computation without intermediate function calls
 
+# Balloon-Windkessel constants (Friston 2003, same values as neurolib's BOLD model)
+BOLD_RHO = 0.34  # Capillary resting net oxygen extraction
+BOLD_ALPHA = 0.32  # Grubb's vessel stiffness exponent
+BOLD_V0 = 0.02  # Resting blood volume fraction
+BOLD_K1 = 7 * BOLD_RHO
+BOLD_K2 = 2.0
+BOLD_K3 = 2 * BOLD_RHO - 0.2
+BOLD_GAMMA = 0.41  # Rate constant for autoregulatory feedback by blood flow (1/s)
+BOLD_K = 0.65  # Vasodilatory signal decay (1/s)
+BOLD_TAU = 0.98  # Transit time (s)
+BOLD_EPS = 1e-120  # Keeps F positive
+
+# Number of v_pyr samples projected to sensor space at once
+SENSOR_BLOCK = 256
+
 @njit(cache=True, fastmath=True)
 def _sigm_fast(v, e0, v0, r):
     """Fast sigmoid for numba."""
@@ -220,101 +459,463 @@ def _sigm_fast(v, e0, v0, r):
 
 
 @njit(cache=True, fastmath=True)
-def _integrate_wendling_unified(y0_arr, n_steps, dt, N,
-                                 A, a, B, b, G, g,
-                                 C, C1, C2, C3, C4, C5, C6, C7,
-                                 e0, v0, r, p_mean, p_sigma,
-                                 Cmat, K_gl, Dmat_ndt, max_delay):
+def _project_block(leadfield, block, n_cols, sensors, offset):
+    """
+    sensors[:, offset:offset + n_cols] = leadfield @ block[:, :n_cols].
+    Plain loops instead of np.dot, which would link BLAS into the kernel and
+    add several seconds of compilation; the inner loop is contiguous.
+    """
+    for c in range(leadfield.shape[0]):
+        for node in range(leadfield.shape[1]):
+            w = leadfield[c, node]
+            for s in range(n_cols):
+                sensors[c, offset + s] += w * block[node, s]
+
+
+@njit(cache=True, fastmath=True)
+def _bold_step(hemo, node, z, dt):
+    """
+    One Euler step of the Balloon-Windkessel model for a single node.
+    Same equations and constants as neurolib's ``integrateBOLD_numba``
+    (Friston 2000, 2003).
+    
+    hemo: Hemodynamic state (4, N): X, F, Q, V (updated in place)
+    
+    Returns the BOLD signal after the step.
+    """
+    X = hemo[0, node]
+    F = hemo[1, node]
+    Q = hemo[2, node]
+    V = hemo[3, node]
+    X_new = X + dt * (z - BOLD_K * X - BOLD_GAMMA * (F - 1.0))
+    Q_new = Q + dt / BOLD_TAU * (F / BOLD_RHO * (1.0 - (1.0 - BOLD_RHO) ** (1.0 / F)) - Q * V ** (1.0 / BOLD_ALPHA - 1.0))
+    V_new = V + dt / BOLD_TAU * (F - V ** (1.0 / BOLD_ALPHA))
+    F_new = max(F + dt * X_new, BOLD_EPS)
+    hemo[0, node] = X_new
+    hemo[1, node] = F_new
+    hemo[2, node] = Q_new
+    hemo[3, node] = V_new
+    return BOLD_V0 * (BOLD_K1 * (1.0 - Q_new) + BOLD_K2 * (1.0 - Q_new / V_new) + BOLD_K3 * (1.0 - V_new))
+
+
+@njit(cache=True)
+def _seed_kernel_rng(seed):
+    """Seed the random state of the calling thread used by the kernels."""
+    np.random.seed(seed)
+
+
+@njit(cache=True)
+def _branch_kernel_rng():
+    """
+    Draw a seed from the random stream of the calling thread and reseed the
+    stream with it: the stream continues from a state described by one integer
+    (numba's generator state cannot be read back exactly from Python).
+    """
+    seed = np.random.randint(0, 2**31 - 1)
+    np.random.seed(seed)
+    return seed
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _integrate_wendling_unified(ys, record, n_steps, dt, N, params_table,
+                                 bucket_ptr, bucket_delay, edge_tgt, edge_src, edge_w, K_gl, max_delay,
+                                 bold_state, bold_every, bold_phase, bold_scale,
+                                 leadfield, sensor_every, sensor_phase,
+                                 detect, event_settings, event_state,
+                                 sched_ids, sched_offsets, sched_t, sched_v, sched_t0):
     """
     Unified Euler-Maruyama integration for Wendling model.
     Handles both single node (N=1) and whole-brain network (N>1).
-    Supports node-specific parameters (A, B, G, p_mean are arrays of length N).
+    Every local parameter can be node-specific (one row of params_table per node).
+    
+    Delayed states are read from a ring buffer of length max_delay + 2, so the
+    full trajectory only needs to be stored when `record` is True.
     
     Units: dt in seconds, a/b/g in 1/s (not 1/ms).
     
     Args:
-        y0_arr: Initial conditions (N, 10)
+        ys: State array (10, N, T). The first max_delay + 1 columns hold the
+            initial conditions (history); if `record`, steps are written to
+            the following n_steps columns
+        record: Store the trajectory in ys
         N: Number of nodes
-        A, B, G, p_mean: Arrays of length N (node-specific parameters)
-        Cmat: Connectivity matrix (N, N) - set to zeros for single node
+        params_table: Local parameters (N, n_params) in kernel units, columns
+            as in paramtable.LOCAL_PARAMS
+        bucket_ptr: Connections with delay bucket_delay[k] (steps) are
+            bucket_ptr[k]:bucket_ptr[k + 1]
+        edge_tgt, edge_src, edge_w: Target, source and normalised weight of
+            every connection (see connectome.PreparedConnectome)
         K_gl: Global coupling strength - set to 0 for single node
         max_delay: Maximum delay steps - set to 0 for single node
+        bold_state: Balloon-Windkessel state (4, N): X, F, Q, V
+        bold_every: BOLD sampling interval in steps, 0 disables BOLD
+        bold_phase: Steps since the last BOLD sample (continued runs)
+        bold_scale: BOLD input is max(v_pyr, 0) * bold_scale
+        leadfield: Lead-field matrix (channels, N) applied to v_pyr
+        sensor_every: Sensor sampling interval in steps, 0 disables sensors
+        sensor_phase: Steps since the last sensor sample (continued runs)
+        detect: Run the spike / seizure detector (events.py) on v_pyr
+        event_settings: Detector settings, event_state: detector state (N, 9)
+        sched_ids: Scheduled parameters (columns of params_table)
+        sched_offsets: Knots of schedule s are sched_offsets[s]:sched_offsets[s + 1]
+        sched_t: Knot times in steps, sched_v: knot values (N, n_knots)
+        sched_t0: Time of the first step on the schedule timeline (steps)
     
     Returns:
-        ys: State trajectories (N, 10, n_steps)
+        tail: Last max_delay + 1 states (10, N, max_delay + 1)
+        bold: BOLD signal sampled every bold_every steps (N, n_samples)
+        bold_state: Final Balloon-Windkessel state (4, N)
+        sensors: Sensor signals leadfield @ v_pyr (channels, n_samples)
+        events: Detected events (n_events, 5): node, onset step, offset step, peak, type
+        event_state: Final detector state (N, 9)
     """
-    # Allocate arrays with delay buffer
-    total_steps = n_steps + max_delay
-    ys = np.zeros((N, 10, total_steps), dtype=np.float64)
-    
-    # Initialize
-    for node in range(N):
+    startind = max_delay + 1
+    # Reads reach back max_delay + 1 steps; one more slot is being written.
+    # Time slice major: a step reads slice prev and writes slice cur, both contiguous.
+    L = max_delay + 2
+    ring = np.zeros((L, 10, N), dtype=np.float64)
+    # Firing rate S(v_pyr) of every stored state, computed once when the state is
+    # written (with the parameters of the source node) and read by the coupling.
+    # Time slices are contiguous: all connections with the same delay read one slice.
+    sig_ring = np.zeros((L, N), dtype=np.float64)
+    for h in range(startind):
         for i in range(10):
-            ys[node, i, :max_delay] = y0_arr[node, i]
+            for node in range(N):
+                ring[h % L, i, node] = ys[i, node, h]
+        for node in range(N):
+            sig_ring[h % L, node] = _sigm_fast(
+                ys[1, node, h] - ys[2, node, h] - ys[3, node, h],
+                params_table[node, P_e0], params_table[node, P_v0], params_table[node, P_r]
+            )
+    
+    # Balloon-Windkessel state
+    do_bold = bold_every > 0
+    n_bold = (bold_phase + n_steps) // bold_every if do_bold else 0
+    bold = np.zeros((N, n_bold), dtype=np.float64)
+    hemo = bold_state.copy()
+    bold_now = np.zeros(N, dtype=np.float64)
+    i_bold = 0
+    
+    # Sensor projection: v_pyr samples are collected in blocks and projected
+    # one block at a time, the source signals are never stored
+    do_sensors = sensor_every > 0
+    n_sensors = (sensor_phase + n_steps) // sensor_every if do_sensors else 0
+    sensors = np.zeros((leadfield.shape[0], n_sensors), dtype=np.float64)
+    block = np.zeros((N, SENSOR_BLOCK if do_sensors else 0), dtype=np.float64)
+    i_block = 0
+    i_sensor = 0
+    
+    # Event detector: raw events grow as needed, the state is updated every step
+    events = np.empty((EVENT_BLOCK if detect else 0, N_EVENT_FIELDS), dtype=np.float64)
+    n_events = 0
+    detector = event_state.copy()
+    
+    # Current node parameters; scheduled columns are updated every step
+    node_params = params_table.copy()
+    coupling = np.zeros(N, dtype=np.float64)
+    n_buckets = len(bucket_delay)
+    n_sched = len(sched_ids)
+    knot = sched_offsets[:-1].copy()  # current knot of each schedule
     
     # Time integration
     for k in range(n_steps):
-        idx = max_delay + k
+        idx = startind + k
+        cur = idx % L
+        prev = (idx - 1) % L
+        
+        # Piecewise-linear interpolation of the scheduled parameters
+        t_k = sched_t0 + k
+        for s in range(n_sched):
+            last = sched_offsets[s + 1] - 1
+            p = knot[s]
+            while p < last and sched_t[p + 1] <= t_k:
+                p += 1
+            knot[s] = p
+            col = sched_ids[s]
+            if p == last or t_k <= sched_t[p]:
+                # outside the schedule: hold the first / last value
+                for node in range(N):
+                    node_params[node, col] = sched_v[node, p]
+            else:
+                w = (t_k - sched_t[p]) / (sched_t[p + 1] - sched_t[p])
+                for node in range(N):
+                    node_params[node, col] = sched_v[node, p] + w * (sched_v[node, p + 1] - sched_v[node, p])
+        
+        # Delayed coupling (weighted sum of S(v_pyr) of the sources), one delay
+        # bucket at a time: every bucket reads a single time slice of sig_ring.
+        # Without connections (or K_gl == 0) there are no buckets and coupling stays 0.
+        if n_buckets > 0:
+            coupling[:] = 0.0
+            for bucket in range(n_buckets):
+                delay_slot = prev - bucket_delay[bucket]
+                if delay_slot < 0:
+                    delay_slot += L
+                for e in range(bucket_ptr[bucket], bucket_ptr[bucket + 1]):
+                    coupling[edge_tgt[e]] += edge_w[e] * sig_ring[delay_slot, edge_src[e]]
         
         for node in range(N):
-            # Get node-specific parameters (A, B, G, p_mean are already arrays)
-            A_node = A[node]
-            B_node = B[node]
-            G_node = G[node]
-            p_mean_node = p_mean[node]
+            # Get node-specific parameters
+            A = node_params[node, P_A]
+            B = node_params[node, P_B]
+            G = node_params[node, P_G]
+            a = node_params[node, P_a]
+            b = node_params[node, P_b]
+            g = node_params[node, P_g]
+            C1 = node_params[node, P_C1]
+            C2 = node_params[node, P_C2]
+            C3 = node_params[node, P_C3]
+            C4 = node_params[node, P_C4]
+            C5 = node_params[node, P_C5]
+            C6 = node_params[node, P_C6]
+            C7 = node_params[node, P_C7]
+            e0 = node_params[node, P_e0]
+            v0 = node_params[node, P_v0]
+            r = node_params[node, P_r]
             
             # Current state
-            y0_ = ys[node, 0, idx-1]
-            y1 = ys[node, 1, idx-1]
-            y2 = ys[node, 2, idx-1]
-            y3 = ys[node, 3, idx-1]
-            y4 = ys[node, 4, idx-1]
-            y5 = ys[node, 5, idx-1]
-            y6 = ys[node, 6, idx-1]
-            y7 = ys[node, 7, idx-1]
-            y8 = ys[node, 8, idx-1]
-            y9 = ys[node, 9, idx-1]
+            y0_ = ring[prev, 0, node]
+            y1 = ring[prev, 1, node]
+            y2 = ring[prev, 2, node]
+            y3 = ring[prev, 3, node]
+            y4 = ring[prev, 4, node]
+            y5 = ring[prev, 5, node]
+            y6 = ring[prev, 6, node]
+            y7 = ring[prev, 7, node]
+            y8 = ring[prev, 8, node]
+            y9 = ring[prev, 9, node]
             
             # Noise (use node-specific p_mean)
             xi_t = np.random.normal(0.0, 1.0)
-            p_t = p_mean_node + p_sigma * xi_t * np.sqrt(dt) #Euler–Maruyama（with sqrt(dt))decreases the amplitude of output. \
+            p_t = node_params[node, P_p_mean] + node_params[node, P_p_sigma] * xi_t * np.sqrt(dt) #Euler–Maruyama（with sqrt(dt))decreases the amplitude of output. \
             # if you want exact amplitude (larger) as in some papers, you can remove sqrt(dt).            
             # Coupling input
-            coupling_input = 0.0
-            for j in range(N):
-                if Cmat[node, j] > 0:
-                    delay_idx = idx - 1 - Dmat_ndt[node, j]
-                    if delay_idx >= 0:
-                        v_j = ys[j, 1, delay_idx] - ys[j, 2, delay_idx] - ys[j, 3, delay_idx]
-                        coupling_input += K_gl * Cmat[node, j] * _sigm_fast(v_j, e0, v0, r)
+            coupling_input = K_gl * coupling[node]
             
-            # Derivatives (use node-specific A, B, G)
+            # Derivatives
             dy0 = y5
-            dy5 = A_node * a * (_sigm_fast(y1 - y2 - y3, e0, v0, r) + coupling_input) - 2.0 * a * y5 - a * a * y0_
+            dy5 = A * a * (sig_ring[prev, node] + coupling_input) - 2.0 * a * y5 - a * a * y0_
             
             dy1 = y6
-            dy6 = A_node * a * (C2 * _sigm_fast(C1 * y0_, e0, v0, r) + p_t) - 2.0 * a * y6 - a * a * y1
+            dy6 = A * a * (C2 * _sigm_fast(C1 * y0_, e0, v0, r) + p_t) - 2.0 * a * y6 - a * a * y1
             
             dy2 = y7
-            dy7 = B_node * b * (C4 * _sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y7 - b * b * y2
+            dy7 = B * b * (C4 * _sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y7 - b * b * y2
             
             dy3 = y8
-            dy8 = G_node * g * (C7 * _sigm_fast((C5 * y0_ - C6 * y4), e0, v0, r)) - 2.0 * g * y8 - g * g * y3
+            dy8 = G * g * (C7 * _sigm_fast((C5 * y0_ - C6 * y4), e0, v0, r)) - 2.0 * g * y8 - g * g * y3
             
             dy4 = y9
-            dy9 = B_node * b * (_sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y9 - b * b * y4
+            dy9 = B * b * (_sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y9 - b * b * y4
             
             # Euler update
-            ys[node, 0, idx] = y0_ + dt * dy0
-            ys[node, 1, idx] = y1 + dt * dy1
-            ys[node, 2, idx] = y2 + dt * dy2
-            ys[node, 3, idx] = y3 + dt * dy3
-            ys[node, 4, idx] = y4 + dt * dy4
-            ys[node, 5, idx] = y5 + dt * dy5
-            ys[node, 6, idx] = y6 + dt * dy6
-            ys[node, 7, idx] = y7 + dt * dy7
-            ys[node, 8, idx] = y8 + dt * dy8
-            ys[node, 9, idx] = y9 + dt * dy9
-    
-    # Return without delay buffer
-    return ys[:, :, max_delay:]
+            ring[cur, 0, node] = y0_ + dt * dy0
+            ring[cur, 1, node] = y1 + dt * dy1
+            ring[cur, 2, node] = y2 + dt * dy2
+            ring[cur, 3, node] = y3 + dt * dy3
+            ring[cur, 4, node] = y4 + dt * dy4
+            ring[cur, 5, node] = y5 + dt * dy5
+            ring[cur, 6, node] = y6 + dt * dy6
+            ring[cur, 7, node] = y7 + dt * dy7
+            ring[cur, 8, node] = y8 + dt * dy8
+            ring[cur, 9, node] = y9 + dt * dy9
+            # slot cur is never read by the coupling of this step (delays >= 0)
+            sig_ring[cur, node] = _sigm_fast(ring[cur, 1, node] - ring[cur, 2, node] - ring[cur, 3, node], e0, v0, r)
+            
+            if record:
+                for i in range(10):
+                    ys[i, node, idx] = ring[cur, i, node]
+            
+            # Hemodynamics driven by the (transformed) pyramidal output
+            if do_bold:
+                v_pyr = ring[cur, 1, node] - ring[cur, 2, node] - ring[cur, 3, node]
+                bold_now[node] = _bold_step(hemo, node, max(v_pyr, 0.0) * bold_scale, dt)
+            
+            if detect:
+                events, n_events = _detect_step(
+                    detector, event_settings, node,
+                    ring[cur, 1, node] - ring[cur, 2, node] - ring[cur, 3, node], k, events, n_events
+                )
+        
+        if do_bold and (bold_phase + k + 1) % bold_every == 0:
+            for node in range(N):
+                bold[node, i_bold] = bold_now[node]
+            i_bold += 1
+        
+        if do_sensors and (sensor_phase + k + 1) % sensor_every == 0:
+            for node in range(N):
+                block[node, i_block] = ring[cur, 1, node] - ring[cur, 2, node] - ring[cur, 3, node]
+            i_block += 1
+            if i_block == SENSOR_BLOCK:
+                _project_block(leadfield, block, SENSOR_BLOCK, sensors, i_sensor)
+                i_sensor += SENSOR_BLOCK
+                i_block = 0
+    
+    if i_block > 0:
+        _project_block(leadfield, block, i_block, sensors, i_sensor)
+    
+    # Last startind states (initial conditions of a continued run)
+    tail = np.empty((10, N, startind), dtype=np.float64)
+    for h in range(startind):
+        for i in range(10):
+            for node in range(N):
+                tail[i, node, h] = ring[(n_steps + h) % L, i, node]
+    
+    return tail, bold, hemo, sensors, events[:n_events], detector
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _integrate_wendling_ensemble(ys, n_trials, n_steps, sample_every, seed, dt, N, params_table,
+                                  bucket_ptr, bucket_delay, edge_tgt, edge_src, edge_w, K_gl, max_delay,
+                                  sched_ids, sched_offsets, sched_t, sched_v, sched_t0):
+    """
+    Euler-Maruyama integration of n_trials independent noise realisations.
+    Same equations as _integrate_wendling_unified. Trials are the innermost
+    (contiguous) dimension of the ring buffers: parameter schedules and the
+    delay-bucketed coupling are evaluated once per step for all trials.
+    
+    Args:
+        ys: Initial conditions (10, N, max_delay + 1), shared by all trials
+        n_trials: Number of trials (independent noise streams)
+        sample_every: v_pyr is stored every sample_every steps
+        seed: Seed of numba's random generator, negative to continue the current stream
+        (other arguments as in _integrate_wendling_unified)
+    
+    Returns:
+        v_pyr: Pyramidal output y1 - y2 - y3 (n_trials, N, n_steps // sample_every)
+    """
+    if seed >= 0:
+        np.random.seed(seed)
+    
+    startind = max_delay + 1
+    L = max_delay + 2
+    ring = np.zeros((L, 10, N, n_trials), dtype=np.float64)
+    # Sigmoid of v_pyr, computed once when a state is written and read by all
+    # delayed couplings (time slices contiguous, as in _integrate_wendling_unified)
+    sig_ring = np.zeros((L, N, n_trials), dtype=np.float64)
+    for h in range(startind):
+        for i in range(10):
+            for node in range(N):
+                for tr in range(n_trials):
+                    ring[h % L, i, node, tr] = ys[i, node, h]
+        for node in range(N):
+            sig_v = _sigm_fast(
+                ys[1, node, h] - ys[2, node, h] - ys[3, node, h],
+                params_table[node, P_e0], params_table[node, P_v0], params_table[node, P_r]
+            )
+            for tr in range(n_trials):
+                sig_ring[h % L, node, tr] = sig_v
+    
+    v_pyr = np.zeros((n_trials, N, n_steps // sample_every), dtype=np.float64)
+    i_sample = 0
+    
+    node_params = params_table.copy()
+    n_sched = len(sched_ids)
+    knot = sched_offsets[:-1].copy()
+    sqrt_dt = np.sqrt(dt)
+    coupling = np.zeros((N, n_trials), dtype=np.float64)
+    xi = np.zeros(n_trials, dtype=np.float64)
+    
+    for k in range(n_steps):
+        idx = startind + k
+        cur = idx % L
+        prev = (idx - 1) % L
+        
+        # Scheduled parameters, shared by all trials
+        t_k = sched_t0 + k
+        for s in range(n_sched):
+            last = sched_offsets[s + 1] - 1
+            p = knot[s]
+            while p < last and sched_t[p + 1] <= t_k:
+                p += 1
+            knot[s] = p
+            col = sched_ids[s]
+            if p == last or t_k <= sched_t[p]:
+                for node in range(N):
+                    node_params[node, col] = sched_v[node, p]
+            else:
+                w = (t_k - sched_t[p]) / (sched_t[p + 1] - sched_t[p])
+                for node in range(N):
+                    node_params[node, col] = sched_v[node, p] + w * (sched_v[node, p + 1] - sched_v[node, p])
+        
+        # Delayed coupling of all trials, one delay bucket (time slice) at a time
+        coupling[:, :] = 0.0
+        for bucket in range(len(bucket_delay)):
+            delay_slot = prev - bucket_delay[bucket]
+            if delay_slot < 0:
+                delay_slot += L
+            for e in range(bucket_ptr[bucket], bucket_ptr[bucket + 1]):
+                w_j = edge_w[e]
+                j = edge_src[e]
+                node = edge_tgt[e]
+                for tr in range(n_trials):
+                    coupling[node, tr] += w_j * sig_ring[delay_slot, j, tr]
+        
+        for node in range(N):
+            A = node_params[node, P_A]
+            B = node_params[node, P_B]
+            G = node_params[node, P_G]
+            a = node_params[node, P_a]
+            b = node_params[node, P_b]
+            g = node_params[node, P_g]
+            C1 = node_params[node, P_C1]
+            C2 = node_params[node, P_C2]
+            C3 = node_params[node, P_C3]
+            C4 = node_params[node, P_C4]
+            C5 = node_params[node, P_C5]
+            C6 = node_params[node, P_C6]
+            C7 = node_params[node, P_C7]
+            e0 = node_params[node, P_e0]
+            v0 = node_params[node, P_v0]
+            r = node_params[node, P_r]
+            p_mean_node = node_params[node, P_p_mean]
+            noise_scale = node_params[node, P_p_sigma] * sqrt_dt
+            
+            for tr in range(n_trials):
+                xi[tr] = np.random.normal(0.0, 1.0)
+            
+            for tr in range(n_trials):
+                y0_ = ring[prev, 0, node, tr]
+                y1 = ring[prev, 1, node, tr]
+                y2 = ring[prev, 2, node, tr]
+                y3 = ring[prev, 3, node, tr]
+                y4 = ring[prev, 4, node, tr]
+                y5 = ring[prev, 5, node, tr]
+                y6 = ring[prev, 6, node, tr]
+                y7 = ring[prev, 7, node, tr]
+                y8 = ring[prev, 8, node, tr]
+                y9 = ring[prev, 9, node, tr]
+                
+                p_t = p_mean_node + noise_scale * xi[tr]
+                
+                dy5 = A * a * (sig_ring[prev, node, tr] + K_gl * coupling[node, tr]) - 2.0 * a * y5 - a * a * y0_
+                dy6 = A * a * (C2 * _sigm_fast(C1 * y0_, e0, v0, r) + p_t) - 2.0 * a * y6 - a * a * y1
+                dy7 = B * b * (C4 * _sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y7 - b * b * y2
+                dy8 = G * g * (C7 * _sigm_fast((C5 * y0_ - C6 * y4), e0, v0, r)) - 2.0 * g * y8 - g * g * y3
+                dy9 = B * b * (_sigm_fast(C3 * y0_, e0, v0, r)) - 2.0 * b * y9 - b * b * y4
+                
+                ring[cur, 0, node, tr] = y0_ + dt * y5
+                ring[cur, 1, node, tr] = y1 + dt * y6
+                ring[cur, 2, node, tr] = y2 + dt * y7
+                ring[cur, 3, node, tr] = y3 + dt * y8
+                ring[cur, 4, node, tr] = y4 + dt * y9
+                ring[cur, 5, node, tr] = y5 + dt * dy5
+                ring[cur, 6, node, tr] = y6 + dt * dy6
+                ring[cur, 7, node, tr] = y7 + dt * dy7
+                ring[cur, 8, node, tr] = y8 + dt * dy8
+                ring[cur, 9, node, tr] = y9 + dt * dy9
+            
+        # Sigmoid of the new v_pyr (after all nodes read the previous step)
+        for node in range(N):
+            for tr in range(n_trials):
+                sig_ring[cur, node, tr] = _sigm_fast(
+                    ring[cur, 1, node, tr] - ring[cur, 2, node, tr] - ring[cur, 3, node, tr],
+                    node_params[node, P_e0], node_params[node, P_v0], node_params[node, P_r]
+                )
+        
+        if (k + 1) % sample_every == 0:
+            for node in range(N):
+                for tr in range(n_trials):
+                    v_pyr[tr, node, i_sample] = ring[cur, 1, node, tr] - ring[cur, 2, node, tr] - ring[cur, 3, node, tr]
+            i_sample += 1
+    
+    return v_pyr
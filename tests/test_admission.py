@@ -0,0 +1,45 @@
+"""Admission control of runs (resources.py)."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+from neurolib_wendling.models.wendling.resources import admit, estimate_resources
+
+
+def _model(**params):
+    model = WendlingModel(Cmat=np.ones((4, 4)), Dmat=np.zeros((4, 4)), seed=0)
+    model.params.update(**params)
+    return model
+
+
+def test_streaming_run_drops_state_outputs():
+    model = _model(duration=200.0, fused_bold=True, bold_sampling_dt=100.0)
+    model.run()
+    assert "y1" in model.outputs
+
+    model.params["duration"] = 20000.0
+    streaming = estimate_resources(dict(model.params, record_states=False), calibrate=False)["peak_bytes"]
+    model.params["memory_limit"] = streaming + 1
+    assert admit(model.params) == {"params": {"record_states": False}, "chunksize": None}
+    model.run(continue_run=True)
+    assert "y1" not in model.outputs
+    assert model.outputs["BOLD"]["BOLD"].shape == (4, 200)
+    assert model.params["record_states"]
+
+
+def test_decimation_uses_divisors_of_step_count():
+    model = _model(duration=1e6)
+    full = estimate_resources(model.params, calibrate=False)["peak_bytes"]
+    model.params["memory_limit"] = full // 20
+    decision = admit(model.params)
+    n_steps = 10**7
+    every = int(round(decision["params"]["sampling_dt"] / model.params["dt"]))
+    assert n_steps % every == 0 and n_steps % decision["chunksize"] == 0
+
+
+def test_prime_step_count_is_refused_with_reason():
+    model = _model(duration=999983 * 0.1)
+    model.params["memory_limit"] = estimate_resources(model.params, calibrate=False)["peak_bytes"] // 20
+    with pytest.raises(MemoryError, match="999983 steps"):
+        admit(model.params)
@@ -0,0 +1,19 @@
+"""Feature pipeline and fitting loss (analysis.py)."""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import FitLoss, SignalFeatures, WendlingModel
+
+
+def test_fitness_transient_does_not_persist():
+    rng = np.random.default_rng(0)
+    model = WendlingModel(Cmat=rng.random((4, 4)), Dmat=np.zeros((4, 4)), seed=0)
+    model.params.update(duration=1000.0, sampling_dt=1.0)
+    model.run()
+    features = SignalFeatures(dt=1.0, nperseg=128, transient=100.0)
+    target = rng.random((4, 4))
+    loss = FitLoss({"fc": target + target.T})
+
+    loss.fitness(model, features, transient=500.0)
+    assert features.skip == 100
+    assert loss.fitness(model, features) == loss.fitness(model, SignalFeatures(dt=1.0, nperseg=128, transient=100.0))
@@ -0,0 +1,45 @@
+"""Fused BOLD (params['fused_bold']) against neurolib's post-hoc BOLD."""
+
+import numpy as np
+from neurolib.models.bold.timeIntegration import simulateBOLD
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+N = 5
+
+
+def _model(**params):
+    rng = np.random.default_rng(0)
+    model = WendlingModel(Cmat=rng.random((N, N)), Dmat=rng.random((N, N)) * 50, seed=1)
+    model.params.update(dict(duration=6000.0, fused_bold=True, bold_sampling_dt=2000.0), **params)
+    return model
+
+
+def test_fused_bold_matches_simulate_bold_of_the_stored_output():
+    model = _model()
+    model.run()
+    every = int(round(model.params["bold_sampling_dt"] / model.params["dt"]))
+    bold_input = model.boldInputTransform(model.get_output_signal())
+    ones = np.ones(N)
+    reference, *_ = simulateBOLD(bold_input, model.params["dt"] * 1e-3, 10000 * ones, X=ones.copy(), F=ones.copy(), Q=ones.copy(), V=ones.copy())
+    np.testing.assert_allclose(model.BOLD.BOLD, reference[:, every - 1::every], rtol=1e-10, atol=1e-14)
+    np.testing.assert_allclose(model.BOLD.t_BOLD, [2000.0, 4000.0, 6000.0])
+
+
+def test_post_hoc_bold_uses_the_fused_input():
+    fused = _model()
+    fused.run()
+    post_hoc = _model(fused_bold=False)
+    post_hoc.run(bold=True)
+    # neurolib samples at t = dt, 2000 + dt, ...: one step after the fused samples at 2000, 4000, ...
+    np.testing.assert_allclose(post_hoc.BOLD.BOLD[:, 1:], fused.BOLD.BOLD[:, :-1], rtol=1e-3)
+
+
+def test_chunked_bold_continues_the_one_piece_run():
+    # noise-free: chunks carry the noise stream on, but not bit-identically to one run
+    one_piece = _model(p_sigma=0.0)
+    one_piece.run()
+    chunked = _model(p_sigma=0.0, record_states=False)
+    chunked.run(chunkwise=True, chunksize=15000, append=True)
+    np.testing.assert_array_equal(chunked.BOLD.t_BOLD, one_piece.BOLD.t_BOLD)
+    np.testing.assert_array_equal(chunked.BOLD.BOLD, one_piece.BOLD.BOLD)
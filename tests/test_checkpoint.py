@@ -0,0 +1,61 @@
+"""Checkpoints and forks against continued runs of the same model."""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import WendlingModel
+from neurolib_wendling.models.wendling.checkpoint import Checkpoint
+
+rng = np.random.default_rng(0)
+CMAT = rng.random((3, 3))
+np.fill_diagonal(CMAT, 0.0)
+DMAT = rng.random((3, 3)) * 20
+
+PULSES = [
+    {"schedules": {"p_mean": ([0, 50, 50, 80, 80], [90, 90, 300, 300, 90])}},
+    {"schedules": {"p_mean": ([0, 120, 120, 130, 130], [90, 90, 400, 400, 90])}},
+]
+
+
+def _model(**params):
+    model = WendlingModel(Cmat=CMAT, Dmat=DMAT, seed=4)
+    model.params.update(duration=200.0, **params)
+    return model
+
+
+def _continuation(schedules=None, **params):
+    """v_pyr of a second run continuing a first one."""
+    model = _model(**params)
+    model.run(continue_run=True)  # neurolib takes over the last state after a continued run
+    if schedules is not None:
+        model.params["schedules"] = schedules
+    model.run(continue_run=True)
+    return model.get_output_signal()
+
+
+def test_saved_checkpoint_continues_exactly(tmp_path):
+    warm = _model()
+    warm.run()
+    warm.checkpoint().save(tmp_path / "warm.npz")
+
+    model = _model()
+    model.restore(Checkpoint.load(tmp_path / "warm.npz"))
+    model.run(continue_run=True)
+    np.testing.assert_array_equal(model.get_output_signal(), _continuation())
+
+
+def test_fork_without_changes_is_the_continuation():
+    model = _model()
+    model.run()
+    res = model.fork([{}])
+    assert res["v_pyr"].shape == (1, 1, 3, 2000)
+    np.testing.assert_allclose(res["v_pyr"][0, 0], _continuation(), rtol=0, atol=1e-11)
+
+
+def test_fork_of_pulses_matches_scheduled_continuations():
+    # noise-free: the variants of a fork draw from one shared noise stream
+    model = _model(p_sigma=0.0)
+    model.run()
+    res = model.fork(PULSES)
+    for v_pyr, pulse in zip(res["v_pyr"][:, 0], PULSES):
+        np.testing.assert_allclose(v_pyr, _continuation(p_sigma=0.0, **pulse), rtol=0, atol=1e-11)
+    assert np.abs(res["v_pyr"][0] - res["v_pyr"][1]).max() > 1.0
@@ -0,0 +1,40 @@
+"""Model clones (WendlingModel.clone / clones)."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+
+def _template():
+    rng = np.random.default_rng(0)
+    model = WendlingModel(Cmat=rng.random((5, 5)), Dmat=rng.random((5, 5)) * 50, seed=0, heterogeneity=0.1)
+    model.params.duration = 100.0
+    return model
+
+
+def test_clone_equals_constructed_model():
+    rng = np.random.default_rng(0)
+    Cmat, Dmat = rng.random((5, 5)), rng.random((5, 5)) * 50
+    template = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=0)
+    template.params.duration = 100.0
+    model = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=7)
+    model.params.duration = 100.0
+    clone = template.clone(seed=7)
+    model.run()
+    clone.run()
+    np.testing.assert_array_equal(clone.get_output_signal(), model.get_output_signal())
+
+
+def test_in_place_writes_do_not_reach_clones():
+    template = _template()
+    clone = template.clone(seed=1)
+    B = clone.params["B"].copy()
+    with pytest.raises(ValueError):
+        template.params["B"][3] = 30.0
+    with pytest.raises(ValueError):
+        clone.params["Cmat"][0, 1] = 3.0
+    template.params["B"] = np.full(5, 30.0)
+    np.testing.assert_array_equal(clone.params["B"], B)
+    template.run()
+    clone.run()
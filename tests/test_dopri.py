@@ -0,0 +1,49 @@
+"""Adaptive dopri5 engine against fine-step Euler, and the runs it refuses."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+
+def _model(Cmat=None, Dmat=None, **params):
+    model = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=0)
+    model.params.update(dict(p_sigma=0.0, duration=300.0), **params)
+    return model
+
+
+def _v_pyr(**params):
+    model = _model(**params)
+    model.run()
+    return model.get_output_signal()[0]
+
+
+def test_dopri5_agrees_with_fine_step_euler():
+    dopri = _v_pyr(integration_method="dopri5")
+    errors = []
+    for dt in (0.01, 0.001):
+        every = int(round(0.1 / dt))
+        euler = _v_pyr(dt=dt)[every - 1::every]
+        errors.append(np.sqrt(np.mean((euler - dopri) ** 2)) / np.std(dopri))
+    # first order convergence of Euler towards the dopri5 solution
+    assert errors[1] < 5e-4
+    assert 8 < errors[0] / errors[1] < 12
+
+
+@pytest.mark.parametrize(
+    "params, match",
+    [
+        (dict(p_sigma=2.0), "p_sigma = 0"),
+        (dict(schedules={"B": ([0.0, 100.0], [20.0, 30.0])}), "Schedules"),
+        (dict(fused_bold=True), "Fused BOLD"),
+    ],
+)
+def test_dopri5_refuses(params, match):
+    with pytest.raises(ValueError, match=match):
+        _model(integration_method="dopri5", **params).run()
+
+
+def test_dopri5_refuses_delays():
+    model = _model(Cmat=np.array([[0.0, 1.0], [1.0, 0.0]]), Dmat=np.ones((2, 2)) * 10, integration_method="dopri5")
+    with pytest.raises(ValueError, match="delay-free"):
+        model.run()
@@ -0,0 +1,29 @@
+"""Accuracy of the multirate engine (see benchmarks/multirate_accuracy.py)."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+from neurolib_wendling.models.wendling.STANDARD_PARAMETERS import WENDLING_STANDARD_PARAMS
+
+
+def _v_pyr(type_name, **params):
+    model = WendlingModel(seed=0)
+    model.params.update(WENDLING_STANDARD_PARAMS[type_name]["params"])
+    model.params.update(dict(p_sigma=0.0, duration=500.0, dt=0.1), **params)
+    model.run()
+    return model.get_output_signal()[0]
+
+
+@pytest.mark.parametrize("type_name", list(WENDLING_STANDARD_PARAMS))
+def test_multirate_error_bound(type_name):
+    ref = _v_pyr(type_name, integration_method="dopri5", dopri_rtol=1e-10, dopri_atol=1e-10)
+
+    def error(v, every=1):
+        return np.sqrt(np.mean((v - ref[every - 1::every]) ** 2)) / np.std(ref)
+
+    multirate = error(_v_pyr(type_name, integration_method="multirate", multirate_substeps=5))
+    # Euler with the same number of coupling evaluations
+    euler = error(_v_pyr(type_name, dt=0.5), every=5)
+    assert multirate < 0.005
+    assert multirate < euler
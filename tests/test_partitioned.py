@@ -0,0 +1,31 @@
+"""Partitioned integration against the unpartitioned run."""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import WendlingModel
+from neurolib_wendling.models.wendling.connectome import get_prepared_connectome
+from neurolib_wendling.models.wendling.partitioned import partition_nodes
+
+# module level data only: the spawned partition workers import this module
+rng = np.random.default_rng(0)
+CMAT = rng.random((8, 8)) * (rng.random((8, 8)) < 0.5)
+np.fill_diagonal(CMAT, 0.0)
+DMAT = 20.0 + rng.random((8, 8)) * 40
+
+
+def _v_pyr(**params):
+    model = WendlingModel(Cmat=CMAT, Dmat=DMAT, seed=0)
+    model.params.update(duration=300.0, p_sigma=0.0, **params)
+    model.run()
+    return model.get_output_signal()
+
+
+def test_partition_nodes_balanced():
+    model = WendlingModel(Cmat=CMAT, Dmat=DMAT, seed=0)
+    part = partition_nodes(get_prepared_connectome(model.params), 3)
+    assert sorted(np.bincount(part)) == [2, 3, 3]
+
+
+def test_partitioned_run_equals_unpartitioned_without_noise():
+    # equal up to rounding: the parts sum the coupling in a different order
+    np.testing.assert_allclose(_v_pyr(partitions=2), _v_pyr(), rtol=0, atol=1e-12)
@@ -0,0 +1,22 @@
+"""Phases recorded by the integration profiler for the different engines."""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+
+def _profiled_run(**params):
+    model = WendlingModel(Cmat=np.array([[0.0, 1.0], [1.0, 0.0]]), Dmat=np.ones((2, 2)) * 10, seed=0)
+    model.params.update(duration=100.0, **params)
+    profiler = model.enable_profiling()
+    model.run()
+    assert len(profiler.reports) == 1
+    return list(profiler.last["phases"])
+
+
+def test_unified_engine_phases():
+    assert _profiled_run() == ["prepare", "compile", "kernel", "copy"]
+
+
+def test_multirate_engine_compiles_in_kernel_phase():
+    assert _profiled_run(integration_method="multirate") == ["prepare", "kernel", "copy"]
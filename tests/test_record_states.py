@@ -0,0 +1,37 @@
+"""Runs without recorded state trajectories (params['record_states'] = False)."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+
+def test_unrecorded_run_drops_previous_outputs():
+    model = WendlingModel(Cmat=np.ones((3, 3)), Dmat=np.zeros((3, 3)), seed=0)
+    model.params.duration = 200.0
+    model.run()
+    assert "y1" in model.outputs
+
+    model.params.update(record_states=False, duration=500.0)
+    model.run(continue_run=True)
+    assert "y1" not in model.outputs and "t" not in model.outputs
+    with pytest.raises(ValueError):
+        model.get_output_signal()
+    assert model.state["y1"].shape[0] == 3
+
+
+def test_unrecorded_tail_equals_end_of_recorded_run():
+    rng = np.random.default_rng(0)
+    Cmat, Dmat = rng.random((4, 4)), rng.random((4, 4)) * 60
+
+    recorded = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=2)
+    recorded.params.duration = 300.0
+    recorded.run()
+    tail = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=2)
+    tail.params.update(duration=300.0, record_states=False)
+    tail.run()
+
+    n = tail.startindt
+    assert n > 1
+    for i in range(10):
+        np.testing.assert_array_equal(tail.state[f"y{i}"], recorded[f"y{i}"][:, -n:])
@@ -0,0 +1,41 @@
+"""Regression tests of WendlingResult.from_model (outputs vs. the integration buffer)."""
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+
+def _network_model(**params):
+    N = 4
+    rng = np.random.default_rng(0)
+    Cmat = rng.random((N, N))
+    Dmat = rng.random((N, N)) * 50
+    model = WendlingModel(Cmat=Cmat, Dmat=Dmat, seed=0)
+    model.params.update(duration=200.0, **params)
+    return model
+
+
+def test_result_matches_outputs():
+    model = _network_model()
+    model.run()
+    for i in range(10):
+        np.testing.assert_array_equal(model.result.states[i], model[f"y{i}"])
+    np.testing.assert_allclose(model.get_output_signal(), model.y1 - model.y2 - model.y3)
+
+
+def test_result_matches_decimated_outputs():
+    model = _network_model(sampling_dt=1.0)
+    model.run()
+    assert model.y1.shape[1] == 200
+    for i in range(10):
+        np.testing.assert_array_equal(model.result.states[i], model[f"y{i}"])
+    np.testing.assert_allclose(model.get_output_signal(), model.y1 - model.y2 - model.y3)
+
+
+def test_output_signal_is_a_writable_copy():
+    model = _network_model()
+    model.run()
+    v = model.get_output_signal()
+    v -= v.mean(axis=1, keepdims=True)
+    assert not model.result.v_pyr.flags.writeable
+    np.testing.assert_allclose(model.result.v_pyr, model.y1 - model.y2 - model.y3)
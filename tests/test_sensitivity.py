@@ -0,0 +1,53 @@
+"""Sensitivities against central finite differences and a seeded run()."""
+
+import numpy as np
+import pytest
+
+from neurolib_wendling.models.wendling import WendlingModel
+
+rng = np.random.default_rng(0)
+CMAT = rng.random((3, 3))
+np.fill_diagonal(CMAT, 0.0)
+DMAT = rng.random((3, 3)) * 20
+TARGET = rng.standard_normal((3, 200))
+
+
+def _model(**params):
+    model = WendlingModel(Cmat=CMAT, Dmat=DMAT, seed=5)
+    model.params.update(duration=200.0, **params)
+    return model
+
+
+def _loss(**params):
+    return _model(**params).sensitivities(wrt=["K_gl"], sampling_dt=1.0, target=TARGET)["loss"]
+
+
+@pytest.fixture(scope="module")
+def grad():
+    return _model().sensitivities(wrt=["B", "G", "a", "K_gl"], sampling_dt=1.0, target=TARGET)["grad"]
+
+
+@pytest.mark.parametrize("name", ["B", "G", "a"])
+def test_local_gradient_matches_finite_differences(grad, name):
+    value = np.full(3, float(_model().params[name]))
+    for node in range(3):
+        h = 1e-6 * value[node]
+        plus, minus = value.copy(), value.copy()
+        plus[node] += h
+        minus[node] -= h
+        fd = (_loss(**{name: plus}) - _loss(**{name: minus})) / (2 * h)
+        np.testing.assert_allclose(grad[name][node], fd, rtol=1e-5)
+
+
+def test_coupling_gradient_matches_finite_differences(grad):
+    K_gl = _model().params["K_gl"]
+    h = 1e-6 * K_gl
+    fd = (_loss(K_gl=K_gl + h) - _loss(K_gl=K_gl - h)) / (2 * h)
+    np.testing.assert_allclose(grad["K_gl"], fd, rtol=1e-5)
+
+
+def test_v_pyr_equals_seeded_run():
+    model = _model()
+    model.run()
+    np.testing.assert_allclose(_model().sensitivities(wrt=["B"])["v_pyr"], model.get_output_signal(), rtol=0,
+                               atol=1e-12)
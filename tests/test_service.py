@@ -0,0 +1,60 @@
+"""Round trip through a SimulationServer with one worker on a temporary Unix socket."""
+
+import asyncio
+
+import numpy as np
+
+from neurolib_wendling.models.wendling import WendlingModel
+from neurolib_wendling.models.wendling.service import SimulationClient, SimulationServer, _batch_key, merge_chunks
+
+rng = np.random.default_rng(0)
+CMAT = rng.random((3, 3))
+DMAT = rng.random((3, 3)) * 40
+
+
+def _local_v_pyr(**params):
+    model = WendlingModel(Cmat=CMAT, Dmat=DMAT, seed=3)
+    model.params.update(params)
+    model.run()
+    return model.get_output_signal()
+
+
+def test_batch_key():
+    spec = {"model": {"Cmat": CMAT, "Dmat": DMAT}, "params": {"duration": 100.0}}
+    assert _batch_key(spec) is not None
+    assert _batch_key(spec) == _batch_key(dict(spec))
+    assert _batch_key(dict(spec, chunk_duration=50.0)) is None
+    assert _batch_key(dict(spec, outputs=["y0"])) is None
+    assert _batch_key(dict(spec, model={"Cmat": CMAT, "Dmat": DMAT, "seed": 3})) is None
+    assert _batch_key(dict(spec, params={"duration": 100.0, "rng_state": 12345})) is None
+
+
+def test_server_round_trip(tmp_path):
+    path = str(tmp_path / "wendling.sock")
+    model_args = dict(Cmat=CMAT, Dmat=DMAT, seed=3)
+
+    async def session():
+        async with SimulationServer(path=path, n_workers=1, batch_window=0.2):
+            async with SimulationClient(path=path) as client:
+                solo = await client.run(params={"duration": 200.0}, **model_args)
+
+                # seeded jobs submitted together are not batched: each gets its seed's stream
+                jobs = [await client.submit(params={"duration": 200.0}, **model_args) for _ in range(2)]
+                twins = [await client.result(job) for job in jobs]
+
+                params = {"duration": 200.0, "p_sigma": 0.0}
+                whole = await client.run(params=params, **model_args)
+                job = await client.submit(params=params, chunk_duration=70.0, **model_args)
+                chunks = [chunk async for chunk in client.stream(job)]
+                return solo, twins, whole, chunks
+
+    solo, twins, whole, chunks = asyncio.run(session())
+
+    np.testing.assert_allclose(solo["v_pyr"], _local_v_pyr(duration=200.0), rtol=1e-12, atol=1e-12)
+    for twin in twins:
+        np.testing.assert_array_equal(twin["v_pyr"], solo["v_pyr"])
+
+    assert len(chunks) == 3
+    merged = merge_chunks(chunks)
+    np.testing.assert_allclose(merged["t"], whole["t"])
+    np.testing.assert_array_equal(merged["v_pyr"], whole["v_pyr"])